@@ -1,161 +1,195 @@
-from flask import Flask, request, send_file, render_template, redirect, url_for, session
+from flask import Flask, request, send_file, render_template, redirect, url_for, session, jsonify, Response
+import io
+import multiprocessing
 import os
-from data_processing import process_data
-from llm_feedback import generate_feedback
-from chart_generator import generate_charts
-from pdf_generator import generate_pdf
-import json
+from report_pipeline import run_report_job
+from job_queue import JobQueue, DONE, FAILED
+from report_store import ReportStore
+from cohort_index import CohortIndex
+from web_common import UPLOAD_FOLDER, COHORT_GROUPS, ordinal, preview_stats
+import metrics
 import uuid
 
 app = Flask(__name__)
+app.add_template_filter(ordinal)
 # Set the secret key from environment variable (required for session management)
 app.secret_key = os.getenv('SECRET_KEY', 'your-default-secret-key-for-dev')  # Fallback for local dev
 
-# Ensure uploads and reports directories exist
-UPLOAD_FOLDER = 'uploads'
-REPORTS_FOLDER = 'reports'
-for folder in [UPLOAD_FOLDER, REPORTS_FOLDER]:
-    if not os.path.exists(folder):
-        os.makedirs(folder)
+# Background report generation
+jobs = JobQueue(
+    run_report_job,
+    db_path=os.getenv('JOB_DB_PATH', 'jobs.db'),
+    workers=int(os.getenv('REPORT_WORKERS', '4')),
+    mode=os.getenv('REPORT_WORKER_MODE', 'thread')
+)
+# Resume jobs left queued or orphaned by a previous run. Under GUNICORN_PRELOAD the
+# master imports this module before forking, so each worker starts its own pool in
+# gunicorn.conf.py's post_fork instead. Spawned chart and report workers re-import
+# `python app.py` as their main module and must not start a pool of their own.
+if os.getenv('GUNICORN_PRELOAD', '0') != '1' and multiprocessing.parent_process() is None:
+    jobs.start()
 
-def serialize_processed_data(processed_data):
-    """Convert tuple keys to strings for session storage"""
-    serialized = processed_data.copy()
-    
-    # Convert chapter_metrics tuple keys to strings
-    if 'chapter_metrics' in serialized:
-        chapter_metrics_str = {}
-        for (subject, chapter), metrics in serialized['chapter_metrics'].items():
-            key = f"{subject}|{chapter}"
-            chapter_metrics_str[key] = metrics
-        serialized['chapter_metrics'] = chapter_metrics_str
-    
-    # Convert concept_metrics tuple keys to strings
-    if 'concept_metrics' in serialized:
-        concept_metrics_str = {}
-        for (subject, concept), metrics in serialized['concept_metrics'].items():
-            key = f"{subject}|{concept}"
-            concept_metrics_str[key] = metrics
-        serialized['concept_metrics'] = concept_metrics_str
-    
-    return serialized
+# Finished reports live server-side; the session only carries the report id
+reports = ReportStore.from_env()
 
-def deserialize_processed_data(serialized_data):
-    """Convert string keys back to tuples"""
-    processed_data = serialized_data.copy()
-    
-    # Convert chapter_metrics string keys back to tuples
-    if 'chapter_metrics' in processed_data:
-        chapter_metrics_tuples = {}
-        for key, metrics in processed_data['chapter_metrics'].items():
-            subject, chapter = key.split('|', 1)
-            chapter_metrics_tuples[(subject, chapter)] = metrics
-        processed_data['chapter_metrics'] = chapter_metrics_tuples
-    
-    # Convert concept_metrics string keys back to tuples
-    if 'concept_metrics' in processed_data:
-        concept_metrics_tuples = {}
-        for key, metrics in processed_data['concept_metrics'].items():
-            subject, concept = key.split('|', 1)
-            concept_metrics_tuples[(subject, concept)] = metrics
-        processed_data['concept_metrics'] = concept_metrics_tuples
-    
-    return processed_data
+# Aggregates across every student processed so far (None when disabled)
+cohort = CohortIndex.from_env()
+
+def wants_json():
+    return request.accept_mimetypes.best == 'application/json'
+
+def current_job():
+    # Jobs share their id with the report they produce
+    report_id = session.get('report_id')
+    return jobs.get(report_id) if report_id else None
 
 @app.route('/', methods=['GET', 'POST'])
 def upload_file():
     if request.method == 'POST':
-        file = request.files['file']
+        file = request.files.get('file')
         if file and file.filename.endswith('.json'):
             # Generate unique session ID for this report
             report_id = str(uuid.uuid4())
-            session['current_report_id'] = report_id
+            session['report_id'] = report_id
             
             filepath = os.path.join(UPLOAD_FOLDER, f"{report_id}_{file.filename}")
             file.save(filepath)
-            
-            try:
-                # Process the uploaded JSON file
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Handle both list and dict formats
-                    if isinstance(data, list):
-                        data = data[0]  # Take first element if it's a list
-                    elif not isinstance(data, dict):
-                        raise ValueError("Invalid JSON structure")
-                
-                processed_data = process_data(data)
-                feedback = generate_feedback(processed_data)
-                chart_paths = generate_charts(processed_data)
-                
-                # Generate PDF with unique filename
-                pdf_filename = f"student_feedback_report_{report_id}.pdf"
-                pdf_path = os.path.join(REPORTS_FOLDER, pdf_filename)
-                generate_pdf(feedback, chart_paths, pdf_path)
-                
-                # Serialize processed_data for session storage
-                serialized_processed_data = serialize_processed_data(processed_data)
-                
-                # Store report info in session
-                session['report_data'] = {
-                    'pdf_path': pdf_path,
-                    'filename': file.filename,
-                    'processed_data': serialized_processed_data,
-                    'feedback_preview': feedback[:500] + "..." if len(feedback) > 500 else feedback
-                }
-                
-                # Clean up uploaded file
-                os.remove(filepath)
-                
-                return redirect(url_for('preview_report'))
-                
-            except Exception as e:
-                # Clean up on error
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                return render_template('index.html', error=f"Error processing file: {str(e)}")
+            metrics.inc('uploads_total')
+            metrics.inc('upload_bytes_total', os.path.getsize(filepath))
+
+            # Queue the pipeline; the preview page polls until the report is ready
+            job_id = jobs.submit({
+                'report_id': report_id,
+                'upload_path': filepath,
+                'filename': file.filename
+            }, job_id=report_id)
+
+            if wants_json():
+                return jsonify({
+                    'job_id': job_id,
+                    'status_url': url_for('job_status', job_id=job_id),
+                    'result_url': url_for('job_result', job_id=job_id)
+                }), 202
+            return redirect(url_for('preview_report'))
         else:
+            metrics.inc('uploads_rejected_total')
             return render_template('index.html', error="Invalid file format. Please upload a JSON file.")
     
     return render_template('index.html')
 
+@app.route('/status/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify({'job_id': job_id, 'status': job['status'], 'error': job['error']})
+
+@app.route('/result/<job_id>')
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['status'] == FAILED:
+        return jsonify({'job_id': job_id, 'status': job['status'], 'error': job['error']}), 500
+    if job['status'] != DONE:
+        return jsonify({'job_id': job_id, 'status': job['status']}), 202
+
+    report = reports.get(job['result']['report_id'])
+    if report is None:
+        return jsonify({'error': 'Report expired'}), 404
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'filename': report['filename'],
+        'feedback_preview': report['feedback_preview'],
+        'download_url': url_for('download_report')
+    })
+
+@app.route('/cohort/<kind>')
+def cohort_rankings(kind):
+    if cohort is None:
+        return jsonify({'error': 'Cohort index disabled'}), 404
+    if kind not in COHORT_GROUPS:
+        return jsonify({'error': 'Unknown group kind'}), 404
+    weakest = request.args.get('order', 'weakest') != 'strongest'
+    return jsonify({
+        'students': cohort.student_count(),
+        'rankings': cohort.rankings(
+            COHORT_GROUPS[kind],
+            subject=request.args.get('subject'),
+            limit=request.args.get('limit', 10, type=int),
+            weakest=weakest,
+            min_students=request.args.get('min_students', 1, type=int)
+        )
+    })
+
+@app.route('/cohort/compare/<job_id>')
+def cohort_compare(job_id):
+    if cohort is None:
+        return jsonify({'error': 'Cohort index disabled'}), 404
+    job = jobs.get(job_id)
+    if job is None or job['status'] != DONE:
+        return jsonify({'error': 'Unknown or unfinished job'}), 404
+    processed_data = reports.load_processed_data(job['result']['report_id'])
+    if processed_data is None:
+        return jsonify({'error': 'Report expired'}), 404
+    return jsonify({'students': cohort.student_count(), 'comparisons': cohort.compare(processed_data)})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Counters live in this process only; each gunicorn worker reports its own
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/preview')
 def preview_report():
-    if 'report_data' not in session:
+    job = current_job()
+    if job is None:
         return redirect(url_for('upload_file'))
-    
-    report_data = session['report_data']
-    # Deserialize the processed_data
-    processed_data = deserialize_processed_data(report_data['processed_data'])
+    if job['status'] == FAILED:
+        return render_template('index.html', error=f"Error processing file: {job['error']}")
+    if job['status'] != DONE:
+        return render_template('processing.html', job_id=job['id'])
+
+    report_data = reports.get(job['result']['report_id'])
+    if report_data is None:
+        return redirect(url_for('new_report'))
+    # Load the processed_data from the report store
+    processed_data = reports.load_processed_data(report_data['id'])
     
     # Calculate some key metrics for preview
-    overall = processed_data['overall']
-    subjects = processed_data['subjects']
-    
-    # Calculate preview statistics
-    preview_stats = {
-        'overall_accuracy': overall['accuracy'],
-        'total_marks': f"{overall['marks_scored']}/{overall['total_marks']}",
-        'questions_attempted': f"{overall['attempted']}/{overall['total_questions']}",
-        'time_efficiency': round((overall['time_taken'] / overall['total_time']) * 100, 1) if overall['total_time'] > 0 else 0,
-        'subjects_count': len(subjects),
-        'strongest_subject': max(subjects.items(), key=lambda x: x[1]['accuracy'])[0] if subjects else 'N/A',
-        'weakest_subject': min(subjects.items(), key=lambda x: x[1]['accuracy'])[0] if subjects else 'N/A'
-    }
+    stats = preview_stats(processed_data)
     
+    # Where this student stands against everyone processed so far
+    cohort_comparison = None
+    if cohort is not None:
+        cohort_comparison = {
+            'students': cohort.student_count(),
+            'weakest': cohort.compare(processed_data)[:5]
+        }
+
     return render_template('preview.html', 
                          report_data=report_data, 
-                         preview_stats=preview_stats)
+                         preview_stats=stats,
+                         cohort_comparison=cohort_comparison)
 
 @app.route('/download')
 def download_report():
-    if 'report_data' not in session:
+    job = current_job()
+    if job is None:
         return redirect(url_for('upload_file'))
-    
-    report_data = session['report_data']
+    if job['status'] != DONE:
+        return redirect(url_for('preview_report'))
+
+    report_data = reports.get(job['result']['report_id'])
+    if report_data is None:
+        return redirect(url_for('new_report'))
+    # PDFs live in the report store; reports queued by older versions point at a file
+    pdf = reports.load_pdf(report_data['id'])
+    if pdf is not None:
+        return send_file(io.BytesIO(pdf), mimetype='application/pdf', as_attachment=True, download_name='student_feedback_report.pdf')
     pdf_path = report_data['pdf_path']
     
-    if os.path.exists(pdf_path):
+    if pdf_path and os.path.exists(pdf_path):
         return send_file(pdf_path, as_attachment=True, download_name='student_feedback_report.pdf')
     else:
         return redirect(url_for('upload_file'))
@@ -163,13 +197,9 @@ def download_report():
 @app.route('/new-report')
 def new_report():
     # Clean up old report files
-    if 'report_data' in session:
-        old_pdf_path = session['report_data'].get('pdf_path')
-        if old_pdf_path and os.path.exists(old_pdf_path):
-            try:
-                os.remove(old_pdf_path)
-            except:
-                pass  # Ignore errors if file is already deleted
+    job = current_job()
+    if job is not None and job['status'] == DONE:
+        reports.delete(job['result']['report_id'])
     
     # Clear session
     session.clear()
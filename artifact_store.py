@@ -0,0 +1,190 @@
+import os
+import pickle
+import sqlite3
+import time
+
+ATTEMPT = 'attempt'
+PROCESSED_DATA = 'process_data'
+FEEDBACK = 'feedback'
+CHARTS = 'charts'
+PDF = 'pdf'
+STAGES = (ATTEMPT, PROCESSED_DATA, FEEDBACK, CHARTS, PDF)
+
+_SCHEMA = (
+    # One row per distinct stage output, keyed by a hash of everything it was computed from
+    """
+    CREATE TABLE IF NOT EXISTS artifacts (
+        stage TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (stage, key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS report_manifests (
+        report_id TEXT PRIMARY KEY,
+        filename TEXT,
+        updated_at REAL NOT NULL
+    )
+    """,
+    # Which artifact each report used for each stage
+    """
+    CREATE TABLE IF NOT EXISTS report_artifacts (
+        report_id TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        key TEXT NOT NULL,
+        PRIMARY KEY (report_id, stage)
+    )
+    """,
+)
+
+class ArtifactStore:
+    """
+    Content-addressed outputs of the report pipeline stages, persisted in SQLite.
+
+    Every stage output (the raw attempt, processed data, feedback text, chart
+    images and the PDF) is stored under a key hashed from its inputs and the
+    code version that produced it, and each report records the keys it used.
+    Regenerating a report recomputes only the stages whose key changed; see
+    report_pipeline.build_report and regenerate.py.
+
+    Args:
+        db_path (str): Path to the SQLite database.
+    """
+
+    def __init__(self, db_path='artifacts.db'):
+        self.db_path = db_path
+        conn = self._connect()
+        with conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        conn.close()
+
+    @classmethod
+    def from_env(cls):
+        """Store at ARTIFACT_DB_PATH (default artifacts.db), or None when ARTIFACT_DB_PATH is set empty."""
+        db_path = os.getenv('ARTIFACT_DB_PATH', 'artifacts.db')
+        return cls(db_path) if db_path else None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def get(self, stage, key):
+        """Return the stored output of a stage for this key, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM artifacts WHERE stage = ? AND key = ?", (stage, key)).fetchone()
+        finally:
+            conn.close()
+        return pickle.loads(row['value']) if row is not None else None
+
+    def put(self, stage, key, value):
+        """Store a stage output; an existing artifact with the same key is kept."""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO artifacts (stage, key, value, size, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (stage, key, blob, len(blob), time.time())
+                )
+        finally:
+            conn.close()
+
+    def record(self, report_id, keys, filename=None):
+        """
+        Record the artifact keys a report was built from.
+
+        Args:
+            report_id (str): The report.
+            keys (dict): Stage -> artifact key; stages not given keep their earlier key.
+            filename (str, optional): Original upload name, kept for regeneration.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO report_manifests (report_id, filename, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (report_id) DO UPDATE SET "
+                    "filename = COALESCE(excluded.filename, filename), updated_at = excluded.updated_at",
+                    (report_id, filename, time.time())
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO report_artifacts (report_id, stage, key) VALUES (?, ?, ?)",
+                    [(report_id, stage, key) for stage, key in keys.items()]
+                )
+        finally:
+            conn.close()
+
+    def manifest(self, report_id):
+        """
+        Returns:
+            dict or None: {'report_id', 'filename', 'keys': {stage: key}}, or None for an unknown report.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT report_id, filename FROM report_manifests WHERE report_id = ?", (report_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            keys = dict(conn.execute(
+                "SELECT stage, key FROM report_artifacts WHERE report_id = ?", (report_id,)
+            ).fetchall())
+        finally:
+            conn.close()
+        return {'report_id': row['report_id'], 'filename': row['filename'], 'keys': keys}
+
+    def report_ids(self):
+        """Every report with a manifest, oldest first."""
+        conn = self._connect()
+        try:
+            return [row['report_id'] for row in conn.execute("SELECT report_id FROM report_manifests ORDER BY updated_at")]
+        finally:
+            conn.close()
+
+    def forget(self, report_id):
+        """Drop a report's manifest; its artifacts go on the next prune()."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM report_artifacts WHERE report_id = ?", (report_id,))
+                conn.execute("DELETE FROM report_manifests WHERE report_id = ?", (report_id,))
+        finally:
+            conn.close()
+
+    def prune(self, min_age=0):
+        """
+        Delete artifacts no report refers to any more. Returns (artifacts, bytes) removed.
+
+        Args:
+            min_age (float): Keep artifacts stored less than this many seconds ago, so
+                the outputs of a report still being built (not yet recorded) survive.
+        """
+        unreferenced = (
+            "FROM artifacts WHERE created_at <= ? AND NOT EXISTS (SELECT 1 FROM report_artifacts r "
+            "WHERE r.stage = artifacts.stage AND r.key = artifacts.key)"
+        )
+        cutoff = time.time() - min_age
+        conn = self._connect()
+        try:
+            with conn:
+                count, size = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) {unreferenced}", (cutoff,)).fetchone()
+                conn.execute(f"DELETE {unreferenced}", (cutoff,))
+        finally:
+            conn.close()
+        return count, size
+
+    def stats(self):
+        """Artifact count and total bytes per stage."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT stage, COUNT(*) AS n, SUM(size) AS bytes FROM artifacts GROUP BY stage").fetchall()
+        finally:
+            conn.close()
+        return {row['stage']: {'artifacts': row['n'], 'bytes': row['bytes']} for row in rows}
@@ -0,0 +1,220 @@
+# ASGI deployment of the web front end: the same routes and templates as app.py,
+# but report jobs run as tasks on the server's event loop. The Gemini call is
+# awaited and the processing, chart, PDF and store work goes to a bounded thread
+# pool, so one process keeps hundreds of uploads in flight. Needs the optional
+# quart and hypercorn packages (requirements-asgi.txt):
+#
+#     hypercorn asgi_app:app --bind 0.0.0.0:8000
+import asyncio
+import io
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from quart import Quart, request, send_file, render_template, redirect, url_for, session, jsonify, Response
+from report_pipeline import run_report_job_async
+from job_queue import JobQueue, DONE, FAILED
+from report_store import ReportStore
+from cohort_index import CohortIndex
+from llm_client import AsyncFeedbackClient
+from llm_feedback import FeedbackBatcher
+from web_common import UPLOAD_FOLDER, COHORT_GROUPS, ordinal, preview_stats
+import metrics
+
+app = Quart(__name__)
+app.add_template_filter(ordinal)
+app.secret_key = os.getenv('SECRET_KEY', 'your-default-secret-key-for-dev')
+
+# Report jobs in flight at once; most of them are just waiting on Gemini
+ASGI_MAX_JOBS = int(os.getenv('ASGI_MAX_JOBS', '256'))
+# Threads for the CPU-bound stages (processing, charts, PDF) and store writes
+ASGI_CPU_WORKERS = int(os.getenv('ASGI_CPU_WORKERS', os.getenv('REPORT_WORKERS', '4')))
+
+cpu_pool = None
+feedback = None
+
+async def run_job(payload):
+    return await run_report_job_async(payload, feedback.generate, executor=cpu_pool)
+
+jobs = JobQueue(run_job, db_path=os.getenv('JOB_DB_PATH', 'jobs.db'), workers=ASGI_MAX_JOBS, mode='async')
+reports = ReportStore.from_env()
+cohort = CohortIndex.from_env()
+
+@app.before_serving
+async def start_workers():
+    global cpu_pool, feedback
+    cpu_pool = ThreadPoolExecutor(max_workers=ASGI_CPU_WORKERS, thread_name_prefix='report-cpu')
+    # One client for the whole process, so GEMINI_CONCURRENCY and GEMINI_RPM hold across all uploads
+    feedback = FeedbackBatcher(AsyncFeedbackClient())
+    # Captures this loop; jobs left over from a previous run are requeued onto it
+    jobs.start()
+
+@app.after_serving
+async def stop_workers():
+    jobs.shutdown()
+    cpu_pool.shutdown(wait=False)
+
+def wants_json():
+    return request.accept_mimetypes.best == 'application/json'
+
+async def current_job():
+    # Jobs share their id with the report they produce
+    report_id = session.get('report_id')
+    return await asyncio.to_thread(jobs.get, report_id) if report_id else None
+
+@app.route('/', methods=['GET', 'POST'])
+async def upload_file():
+    if request.method == 'POST':
+        file = (await request.files).get('file')
+        if file and file.filename.endswith('.json'):
+            report_id = str(uuid.uuid4())
+            session['report_id'] = report_id
+
+            filepath = os.path.join(UPLOAD_FOLDER, f"{report_id}_{file.filename}")
+            await file.save(filepath)
+            metrics.inc('uploads_total')
+            metrics.inc('upload_bytes_total', os.path.getsize(filepath))
+
+            # Queue the pipeline; the preview page polls until the report is ready
+            job_id = await asyncio.to_thread(jobs.submit, {
+                'report_id': report_id,
+                'upload_path': filepath,
+                'filename': file.filename
+            }, job_id=report_id)
+
+            if wants_json():
+                return jsonify({
+                    'job_id': job_id,
+                    'status_url': url_for('job_status', job_id=job_id),
+                    'result_url': url_for('job_result', job_id=job_id)
+                }), 202
+            return redirect(url_for('preview_report'))
+        else:
+            metrics.inc('uploads_rejected_total')
+            return await render_template('index.html', error="Invalid file format. Please upload a JSON file.")
+
+    return await render_template('index.html')
+
+@app.route('/status/<job_id>')
+async def job_status(job_id):
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify({'job_id': job_id, 'status': job['status'], 'error': job['error']})
+
+@app.route('/result/<job_id>')
+async def job_result(job_id):
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['status'] == FAILED:
+        return jsonify({'job_id': job_id, 'status': job['status'], 'error': job['error']}), 500
+    if job['status'] != DONE:
+        return jsonify({'job_id': job_id, 'status': job['status']}), 202
+
+    report = await asyncio.to_thread(reports.get, job['result']['report_id'])
+    if report is None:
+        return jsonify({'error': 'Report expired'}), 404
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'filename': report['filename'],
+        'feedback_preview': report['feedback_preview'],
+        'download_url': url_for('download_report')
+    })
+
+@app.route('/cohort/<kind>')
+async def cohort_rankings(kind):
+    if cohort is None:
+        return jsonify({'error': 'Cohort index disabled'}), 404
+    if kind not in COHORT_GROUPS:
+        return jsonify({'error': 'Unknown group kind'}), 404
+    options = {
+        'subject': request.args.get('subject'),
+        'limit': request.args.get('limit', 10, type=int),
+        'weakest': request.args.get('order', 'weakest') != 'strongest',
+        'min_students': request.args.get('min_students', 1, type=int)
+    }
+    students, rankings = await asyncio.to_thread(
+        lambda: (cohort.student_count(), cohort.rankings(COHORT_GROUPS[kind], **options))
+    )
+    return jsonify({'students': students, 'rankings': rankings})
+
+@app.route('/cohort/compare/<job_id>')
+async def cohort_compare(job_id):
+    if cohort is None:
+        return jsonify({'error': 'Cohort index disabled'}), 404
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None or job['status'] != DONE:
+        return jsonify({'error': 'Unknown or unfinished job'}), 404
+    processed_data = await asyncio.to_thread(reports.load_processed_data, job['result']['report_id'])
+    if processed_data is None:
+        return jsonify({'error': 'Report expired'}), 404
+    students, comparisons = await asyncio.to_thread(lambda: (cohort.student_count(), cohort.compare(processed_data)))
+    return jsonify({'students': students, 'comparisons': comparisons})
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    # Counters live in this process only; each server worker reports its own
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/preview')
+async def preview_report():
+    job = await current_job()
+    if job is None:
+        return redirect(url_for('upload_file'))
+    if job['status'] == FAILED:
+        return await render_template('index.html', error=f"Error processing file: {job['error']}")
+    if job['status'] != DONE:
+        return await render_template('processing.html', job_id=job['id'])
+
+    report_data = await asyncio.to_thread(reports.get, job['result']['report_id'])
+    if report_data is None:
+        return redirect(url_for('new_report'))
+    processed_data = await asyncio.to_thread(reports.load_processed_data, report_data['id'])
+
+    # Where this student stands against everyone processed so far
+    cohort_comparison = None
+    if cohort is not None:
+        students, weakest = await asyncio.to_thread(lambda: (cohort.student_count(), cohort.compare(processed_data)[:5]))
+        cohort_comparison = {'students': students, 'weakest': weakest}
+
+    return await render_template('preview.html',
+                                 report_data=report_data,
+                                 preview_stats=preview_stats(processed_data),
+                                 cohort_comparison=cohort_comparison)
+
+@app.route('/download')
+async def download_report():
+    job = await current_job()
+    if job is None:
+        return redirect(url_for('upload_file'))
+    if job['status'] != DONE:
+        return redirect(url_for('preview_report'))
+
+    report_data = await asyncio.to_thread(reports.get, job['result']['report_id'])
+    if report_data is None:
+        return redirect(url_for('new_report'))
+    # Streamed in chunks; conditional=True answers Range requests with 206 partial content
+    pdf = await asyncio.to_thread(reports.load_pdf, report_data['id'])
+    if pdf is not None:
+        return await send_file(io.BytesIO(pdf), mimetype='application/pdf', as_attachment=True,
+                               attachment_filename='student_feedback_report.pdf', conditional=True)
+    pdf_path = report_data['pdf_path']
+
+    if pdf_path and os.path.exists(pdf_path):
+        return await send_file(pdf_path, mimetype='application/pdf', as_attachment=True,
+                               attachment_filename='student_feedback_report.pdf', conditional=True)
+    else:
+        return redirect(url_for('upload_file'))
+
+@app.route('/new-report')
+async def new_report():
+    job = await current_job()
+    if job is not None and job['status'] == DONE:
+        await asyncio.to_thread(reports.delete, job['result']['report_id'])
+
+    session.clear()
+    return redirect(url_for('upload_file'))
+
+if __name__ == '__main__':
+    app.run(debug=True)
@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from report_pipeline import build_report
+from json_stream import iter_json_items
+from llm_client import AsyncFeedbackClient
+from llm_feedback import FeedbackBatcher
+from cohort_index import CohortIndex, attempt_key
+from artifact_store import ArtifactStore
+from report_workers import ReportWorkerPool, shared_pool
+
+def iter_attempt_files(input_path):
+    """Yield the JSON files to read: the input itself or every .json file in a directory."""
+    if os.path.isdir(input_path):
+        for name in sorted(os.listdir(input_path)):
+            if name.endswith('.json'):
+                yield os.path.join(input_path, name)
+    else:
+        yield input_path
+
+def iter_attempts(input_path):
+    """
+    Yield (source, index, attempt, error) for every student attempt under input_path.
+
+    Files may hold a single attempt object or a JSON array of attempts. Each file
+    is decoded incrementally, so memory stays flat however large the export is.
+    Items that are not objects come back with attempt None and an error message.
+    A file that cannot be read or decoded yields one such entry, at the index
+    where decoding stopped, and the remaining files are still read.
+    """
+    for filepath in iter_attempt_files(input_path):
+        count = 0
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                for attempt in iter_json_items(f):
+                    if isinstance(attempt, dict):
+                        yield filepath, count, attempt, None
+                    else:
+                        yield filepath, count, None, f"Invalid JSON structure: item {count} is not an object"
+                    count += 1
+        except (OSError, ValueError) as e:
+            # JSONDecodeError and UnicodeDecodeError are ValueErrors; the rest of this file is unreadable
+            yield filepath, count, None, f"Invalid JSON in {filepath}: {e}"
+
+def attempt_id(attempt, source, index):
+    """Stable, filename-safe identifier for an attempt."""
+    raw = attempt.get('_id', {})
+    raw = raw.get('$oid') if isinstance(raw, dict) else raw
+    if not raw:
+        raw = f"{os.path.splitext(os.path.basename(source))[0]}_{index}"
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(raw))
+
+def unique_id(student_id, seen):
+    """
+    student_id, or student_id_2, student_id_3, ... if it is already in `seen`.
+
+    Attempts exported twice (or distinct attempts sharing an _id) would otherwise
+    overwrite each other's PDF and report manifest entry. The returned id is added
+    to `seen`.
+    """
+    candidate, n = student_id, 1
+    while candidate in seen:
+        n += 1
+        candidate = f"{student_id}_{n}"
+    seen.add(candidate)
+    return candidate
+
+class FeedbackLoop:
+    """
+    Runs an AsyncFeedbackClient on a background event loop shared by the report threads.
+
+    Args:
+        batch_size (int, optional): Students packed into one Gemini request
+            (FEEDBACK_BATCH_SIZE by default; 1 sends one request per student).
+    """
+
+    def __init__(self, batch_size=None):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='batch-feedback', daemon=True)
+        self._thread.start()
+        self.client, self.batcher = asyncio.run_coroutine_threadsafe(self._make_client(batch_size), self.loop).result()
+
+    async def _make_client(self, batch_size):
+        client = AsyncFeedbackClient()
+        return client, FeedbackBatcher(client, batch_size=batch_size)
+
+    def generate_feedback(self, processed_data):
+        """Blocking call for report threads; the Gemini call itself runs on the shared loop."""
+        return asyncio.run_coroutine_threadsafe(self.batcher.generate(processed_data), self.loop).result()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+def _run_one(student_id, source, index, attempt, output_dir, feedback_fn, cohort=None, artifacts=None, renderer=None):
+    pdf_path = os.path.join(output_dir, f"student_feedback_report_{student_id}.pdf")
+    start = time.perf_counter()
+    entry = {'student_id': student_id, 'source': source, 'index': index, 'pdf_path': pdf_path}
+    stages = {}
+    try:
+        processed_data, _ = build_report(
+            attempt, pdf_path, feedback_fn=feedback_fn, artifacts=artifacts, report_id=student_id,
+            filename=source, stages=stages, renderer=renderer
+        )
+        if cohort is not None:
+            cohort.add(attempt_key(attempt), processed_data)
+    except Exception as e:
+        entry.update(status='failed', error=str(e))
+    else:
+        entry.update(status='done', accuracy=processed_data['overall']['accuracy'])
+        if artifacts is not None:
+            entry['stages'] = stages
+    entry['seconds'] = round(time.perf_counter() - start, 3)
+    return entry
+
+def run_batch(input_path, output_dir, workers=4, feedback_batch=None, render_workers=None):
+    """
+    Generate one PDF per student plus a manifest.json in output_dir.
+
+    Files or items that cannot be decoded are recorded as failed entries and
+    the run carries on. Every finished entry is also appended to
+    manifest.jsonl as it completes, and manifest.json is written even if the
+    run is interrupted ('complete' is then false). An attempt whose id was
+    already used earlier in the run gets an `_2`, `_3`, ... suffix, so each
+    attempt keeps its own PDF and manifest entry.
+
+    Attempts are streamed from input_path and at most 2 * workers are in flight
+    at any time, so memory stays bounded for large cohorts. Gemini calls go
+    through one AsyncFeedbackClient, so the GEMINI_CONCURRENCY and GEMINI_RPM
+    limits apply to the whole batch. With feedback_batch > 1, several students'
+    feedback is requested in one Gemini call. Each student is also added to the
+    cohort index at COHORT_DB_PATH, and stage outputs are kept in the artifact
+    store at ARTIFACT_DB_PATH, so running the same input again only redoes the
+    stages whose inputs or code version changed. With render_workers (or
+    REPORT_POOL_WORKERS), charts and PDFs are built by a pool of warm worker
+    processes; report threads then wait on the pool when its queue is full.
+
+    Args:
+        input_path (str): JSON file (object or array) or directory of JSON files.
+        output_dir (str): Directory for the PDFs and manifest.
+        workers (int): Number of reports generated concurrently.
+        feedback_batch (int, optional): Students per Gemini request; FEEDBACK_BATCH_SIZE
+            by default. Batches only fill when at least this many workers are running.
+        render_workers (int, optional): Processes in a ReportWorkerPool for charts and PDFs
+            (0 renders them in the report threads); the shared REPORT_POOL_WORKERS pool, if
+            any, by default.
+
+    Returns:
+        dict: The manifest, including per-student entries and throughput.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    entries = []
+    start = time.perf_counter()
+    # One line per finished student, flushed as it completes, so a crash still leaves a record
+    log = open(os.path.join(output_dir, 'manifest.jsonl'), 'w', encoding='utf-8')
+
+    def record(entry):
+        entries.append(entry)
+        log.write(json.dumps(entry) + '\n')
+        log.flush()
+
+    cohort = CohortIndex.from_env()
+    artifacts = ArtifactStore.from_env()
+    if render_workers is None:
+        renderer = shared_pool()
+    else:
+        renderer = ReportWorkerPool(workers=render_workers) if render_workers > 0 else None
+    feedback = FeedbackLoop(batch_size=feedback_batch)
+    complete = False
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-report') as executor:
+            in_flight = set()
+            # Ids are assigned in input order, so reruns suffix the same duplicates
+            seen = set()
+            for source, index, attempt, error in iter_attempts(input_path):
+                if error is not None:
+                    stem = os.path.splitext(os.path.basename(source))[0]
+                    record({'student_id': unique_id(f"{stem}_{index}", seen), 'source': source, 'index': index, 'pdf_path': None,
+                            'status': 'failed', 'error': error, 'seconds': 0.0})
+                    continue
+                if len(in_flight) >= 2 * workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        record(f.result())
+                student_id = unique_id(attempt_id(attempt, source, index), seen)
+                in_flight.add(executor.submit(
+                    _run_one, student_id, source, index, attempt, output_dir, feedback.generate_feedback,
+                    cohort, artifacts, renderer
+                ))
+            for f in wait(in_flight).done:
+                record(f.result())
+        complete = True
+    finally:
+        feedback.close()
+        if render_workers and renderer is not None:
+            renderer.close()
+        log.close()
+        # Written even when the run is interrupted, covering the students finished so far
+        manifest = _write_manifest(output_dir, input_path, entries, time.perf_counter() - start, complete)
+    return manifest
+
+def _write_manifest(output_dir, input_path, entries, elapsed, complete):
+    entries.sort(key=lambda e: (e['source'], e['index']))
+    manifest = {
+        'input': input_path,
+        'complete': complete,
+        'students': len(entries),
+        'succeeded': sum(1 for e in entries if e['status'] == 'done'),
+        'failed': sum(1 for e in entries if e['status'] == 'failed'),
+        'elapsed_seconds': round(elapsed, 3),
+        'students_per_minute': round(len(entries) / elapsed * 60, 2) if elapsed > 0 else 0,
+        'reports': entries
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate feedback reports for a cohort of student attempts.")
+    parser.add_argument('input', help="JSON file (object or array of attempts) or a directory of JSON files")
+    parser.add_argument('-o', '--output-dir', default=os.path.join('reports', 'batch'), help="Where to write PDFs and manifest.json")
+    parser.add_argument('-w', '--workers', type=int, default=int(os.getenv('REPORT_WORKERS', '4')), help="Reports generated concurrently")
+    parser.add_argument('-b', '--feedback-batch', type=int, default=None,
+                        help="Students per Gemini request (default FEEDBACK_BATCH_SIZE; keep it at or below --workers)")
+    parser.add_argument('-r', '--render-workers', type=int, default=None,
+                        help="Warm worker processes for charts and PDFs (default REPORT_POOL_WORKERS; 0 renders in-thread)")
+    args = parser.parse_args(argv)
+
+    manifest = run_batch(args.input, args.output_dir, workers=args.workers, feedback_batch=args.feedback_batch,
+                         render_workers=args.render_workers)
+    print(f"Processed {manifest['students']} students ({manifest['succeeded']} ok, {manifest['failed']} failed) "
+          f"in {manifest['elapsed_seconds']:.1f}s - {manifest['students_per_minute']:.1f} students/min")
+    print(f"Manifest: {os.path.join(args.output_dir, 'manifest.json')}")
+    return 0 if manifest['failed'] == 0 else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
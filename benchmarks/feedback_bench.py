@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import llm_feedback  # noqa: E402
+import metrics  # noqa: E402
+from data_processing import process_data  # noqa: E402
+from llm_client import AsyncFeedbackClient  # noqa: E402
+from llm_feedback import FeedbackBatcher  # noqa: E402
+from benchmarks.stubs import StubModel  # noqa: E402
+from benchmarks.synthetic import make_cohort  # noqa: E402
+
+async def run_feedback(cohort, batch_size, latency, report_latency, rpm, concurrency):
+    """Generate feedback for every student through one client and batcher, as batch.py does."""
+    model = StubModel(latency=latency, report_latency=report_latency)
+    client = AsyncFeedbackClient(model=model, concurrency=concurrency, requests_per_minute=rpm,
+                                 max_retries=0, native_async=True)
+    batcher = FeedbackBatcher(client, batch_size=batch_size, max_wait=0.05)
+    metrics.drain()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(batcher.generate(data) for data in cohort), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    counters = metrics.drain()['counters']
+    return {
+        'batch_size': batch_size,
+        'model_calls': model.calls,
+        'failed': sum(1 for r in results if isinstance(r, BaseException)),
+        'fallback_batches': counters.get(('feedback_batches_total', (('result', 'fallback'),)), 0),
+        'prompt_tokens': counters.get(('prompt_tokens_total', ()), 0),
+        'seconds': round(elapsed, 3),
+        'students_per_minute': round(len(cohort) / elapsed * 60, 2) if elapsed > 0 else 0
+    }
+
+def run_benchmark(cohort=40, batch_sizes=(1, 4, 8), latency=1.0, report_latency=0.2, rpm=60,
+                  concurrency=4, questions=30, seed=0):
+    """
+    Compare feedback throughput at several batch sizes against a stub model.
+
+    The stub answers each call after `latency` plus `report_latency` per
+    student, and the client is held to `rpm` requests per minute, so the run
+    shows how much per-request overhead and quota batching saves.
+    """
+    llm_feedback.feedback_cache = None  # Every student should cost a (stubbed) LLM call
+    students = [process_data(a) for a in make_cohort(cohort, seed=seed, questions_per_subject=questions)]
+    runs = [
+        asyncio.run(run_feedback(students, size, latency, report_latency, rpm, concurrency))
+        for size in batch_sizes
+    ]
+    return {
+        'config': {
+            'cohort': cohort,
+            'latency': latency,
+            'report_latency': report_latency,
+            'requests_per_minute': rpm,
+            'concurrency': concurrency,
+            'questions_per_subject': questions,
+            'python': platform.python_version(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'runs': runs
+    }
+
+def print_results(results):
+    print(f"{'batch':>6}{'calls':>8}{'fallback':>10}{'tokens':>10}{'seconds':>10}{'students/min':>14}")
+    for run in results['runs']:
+        print(f"{run['batch_size']:>6}{run['model_calls']:>8}{run['fallback_batches']:>10}"
+              f"{run['prompt_tokens']:>10}{run['seconds']:>10.2f}{run['students_per_minute']:>14.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark multi-student feedback batching against a stub model.")
+    parser.add_argument('--cohort', type=int, default=40, help="Synthetic students")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8], help="Students per request to compare")
+    parser.add_argument('--latency', type=float, default=1.0, help="Stub seconds per request")
+    parser.add_argument('--report-latency', type=float, default=0.2, help="Stub seconds per report generated")
+    parser.add_argument('--rpm', type=float, default=60, help="Requests per minute allowed by the client")
+    parser.add_argument('--concurrency', type=int, default=4, help="Requests in flight")
+    parser.add_argument('--questions', type=int, default=30, help="Questions per subject")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_path', help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(
+        cohort=args.cohort, batch_sizes=args.batch_sizes, latency=args.latency,
+        report_latency=args.report_latency, rpm=args.rpm, concurrency=args.concurrency,
+        questions=args.questions, seed=args.seed
+    )
+    print_results(results)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,171 @@
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import llm_feedback  # noqa: E402
+import chart_generator  # noqa: E402
+from data_processing import process_data  # noqa: E402
+from llm_feedback import generate_feedback  # noqa: E402
+from chart_generator import generate_charts  # noqa: E402
+from pdf_generator import generate_pdf  # noqa: E402
+from benchmarks.stubs import StubModel  # noqa: E402
+from benchmarks.synthetic import make_cohort  # noqa: E402
+
+STAGES = ['process_data', 'generate_feedback', 'generate_charts', 'generate_pdf', 'total']
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize(values):
+    return {
+        'n': len(values),
+        'mean': round(statistics.fmean(values), 6),
+        'min': round(min(values), 6),
+        'p50': round(percentile(values, 50), 6),
+        'p90': round(percentile(values, 90), 6),
+        'p95': round(percentile(values, 95), 6),
+        'p99': round(percentile(values, 99), 6),
+        'max': round(max(values), 6)
+    }
+
+def run_report(attempt, pdf_path, parallel_charts, timings, chart_timings, peaks=None, prompt_tokens=None):
+    """Run every stage for one attempt, recording per-stage seconds (and tracemalloc peaks and prompt sizes if given)."""
+    def stage(name, fn):
+        if peaks is not None:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = fn()
+        timings.setdefault(name, []).append(time.perf_counter() - start)
+        if peaks is not None:
+            peaks[name] = max(peaks.get(name, 0), tracemalloc.get_traced_memory()[1] - base)
+        return result
+
+    start = time.perf_counter()
+    processed_data = stage('process_data', lambda: process_data(attempt))
+    feedback = stage('generate_feedback', lambda: generate_feedback(processed_data))
+    per_chart = {}
+    charts = stage('generate_charts', lambda: generate_charts(processed_data, parallel=parallel_charts, timings=per_chart))
+    stage('generate_pdf', lambda: generate_pdf(feedback, charts, pdf_path))
+    timings.setdefault('total', []).append(time.perf_counter() - start)
+    for name, elapsed in per_chart.items():
+        chart_timings.setdefault(name, []).append(elapsed)
+    if prompt_tokens is not None:
+        prompt_stats = {}
+        llm_feedback.build_prompt(processed_data, stats=prompt_stats)
+        prompt_tokens.append(prompt_stats['tokens'])
+
+def run_benchmark(cohort=10, questions=30, concepts=2, concept_pool=20, chapters=8,
+                  llm_latency=0.0, parallel_charts=True, warmup=1, seed=0, chart_cache=False):
+    """
+    Time each pipeline stage over a synthetic cohort with a stubbed Gemini model.
+
+    Returns:
+        dict: Configuration, per-stage and per-chart latency percentiles, peak
+        memory per stage and throughput.
+    """
+    llm_feedback.model = StubModel(latency=llm_latency)
+    llm_feedback.feedback_cache = None  # Every report should pay for the (stubbed) LLM call
+    if not chart_cache:
+        chart_generator.chart_cache = None  # Time cold renders unless the chart cache is being measured
+    elif chart_generator.chart_cache is not None:
+        chart_generator.chart_cache.clear()
+
+    attempt_options = dict(
+        questions_per_subject=questions, chapters_per_subject=chapters,
+        concepts_per_subject=concept_pool, concepts_per_question=concepts
+    )
+    timings, chart_timings, peaks, prompt_tokens = {}, {}, {}, []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'report.pdf')
+        # Warm-up runs start the chart pool and import the heavy libraries
+        for attempt in make_cohort(warmup, seed=seed + 10 ** 6, **attempt_options):
+            run_report(attempt, pdf_path, parallel_charts, {}, {})
+
+        start = time.perf_counter()
+        for attempt in make_cohort(cohort, seed=seed, **attempt_options):
+            run_report(attempt, pdf_path, parallel_charts, timings, chart_timings, prompt_tokens=prompt_tokens)
+        elapsed = time.perf_counter() - start
+
+        # Separate traced pass so tracemalloc overhead does not skew the latencies.
+        # Charts rendered in pool workers are not visible to tracemalloc.
+        tracemalloc.start()
+        try:
+            for attempt in make_cohort(1, seed=seed, **attempt_options):
+                run_report(attempt, pdf_path, parallel_charts, {}, {}, peaks)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'config': {
+            'cohort': cohort,
+            'questions_per_subject': questions,
+            'concepts_per_question': concepts,
+            'concepts_per_subject': concept_pool,
+            'chapters_per_subject': chapters,
+            'llm_latency': llm_latency,
+            'parallel_charts': parallel_charts,
+            'chart_cache': chart_cache,
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'stages': {name: summarize(timings[name]) for name in STAGES},
+        'charts': {name: summarize(values) for name, values in chart_timings.items()},
+        'peak_memory_bytes': {name: peaks.get(name, 0) for name in STAGES if name != 'total'},
+        'prompt_tokens': summarize(prompt_tokens),
+        'reports_per_minute': round(cohort / elapsed * 60, 2) if elapsed > 0 else 0
+    }
+
+def print_results(results):
+    print(f"{'stage':<50}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (seconds)")
+    for name, stats in list(results['stages'].items()) + [(f"  chart: {n}", s) for n, s in results['charts'].items()]:
+        print(f"{name:<50}{stats['p50']:>9.4f}{stats['p90']:>9.4f}{stats['p99']:>9.4f}{stats['max']:>9.4f}")
+    print("peak memory: " + ', '.join(f"{name}={size / 1024 / 1024:.1f}MB" for name, size in results['peak_memory_bytes'].items()))
+    tokens = results['prompt_tokens']
+    print(f"prompt tokens (estimated): p50={tokens['p50']:.0f} max={tokens['max']:.0f} (budget {llm_feedback.PROMPT_TOKEN_BUDGET or 'none'})")
+    print(f"throughput: {results['reports_per_minute']:.1f} reports/min")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the report pipeline on synthetic attempts.")
+    parser.add_argument('--cohort', type=int, default=10, help="Synthetic students to time")
+    parser.add_argument('--questions', type=int, default=30, help="Questions per subject")
+    parser.add_argument('--concepts', type=int, default=2, help="Concepts tagged per question")
+    parser.add_argument('--concept-pool', type=int, default=20, help="Distinct concepts per subject")
+    parser.add_argument('--chapters', type=int, default=8, help="Distinct chapters per subject")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Simulated Gemini latency in seconds")
+    parser.add_argument('--sequential-charts', action='store_true', help="Render charts in-process, one by one")
+    parser.add_argument('--chart-cache', action='store_true', help="Keep the rendered chart cache on (CHART_CACHE settings)")
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_path', help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(
+        cohort=args.cohort, questions=args.questions, concepts=args.concepts,
+        concept_pool=args.concept_pool, chapters=args.chapters, llm_latency=args.llm_latency,
+        parallel_charts=not args.sequential_charts, warmup=args.warmup, seed=args.seed,
+        chart_cache=args.chart_cache
+    )
+    print_results(results)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
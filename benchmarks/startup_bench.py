@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure_import(module, runs):
+    """Import module in fresh interpreters and return wall times plus the slowest imports of the last run."""
+    timings = []
+    stderr = ''
+    for _ in range(runs):
+        code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+        stderr = result.stderr
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    modules = []
+    for line in stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)', line)
+        if match and len(match.group(3)) <= 3:  # top-level imports and their direct children
+            modules.append((match.group(4), int(match.group(2)) / 1e6))
+    modules.sort(key=lambda m: m[1], reverse=True)
+    return timings, modules
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold import time of the web app.")
+    parser.add_argument('--module', default='app', help="Module to import (default: app)")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', dest='json_path', help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    timings, modules = measure_import(args.module, args.runs)
+    results = {
+        'module': args.module,
+        'runs': args.runs,
+        'median_seconds': round(statistics.median(timings), 4),
+        'min_seconds': round(min(timings), 4),
+        'max_seconds': round(max(timings), 4),
+        'slowest_imports': [{'module': name, 'seconds': round(sec, 4)} for name, sec in modules[:10]]
+    }
+
+    print(f"import {args.module}: median {results['median_seconds']:.3f}s "
+          f"(min {results['min_seconds']:.3f}s, max {results['max_seconds']:.3f}s over {args.runs} runs)")
+    for entry in results['slowest_imports']:
+        print(f"  {entry['seconds']:.3f}s  {entry['module']}")
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,65 @@
+import asyncio
+import re
+import time
+
+STUB_FEEDBACK = """## Introduction
+You did well in **Physics** and have room to grow in *Mathematics*.
+
+## Performance Breakdown
+- Overall accuracy is steady across difficulty levels.
+- Chapter-level results show a few clear weak spots.
+
+## Time vs Accuracy Insights
+- Correct answers took less time on average than incorrect ones.
+
+## Actionable Suggestions
+1. Revisit the weakest chapters with timed practice.
+2. Review incorrect answers before attempting new papers.
+"""
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+# Student headings of a batched prompt (llm_feedback.BATCH_STUDENT_TEMPLATE)
+_BATCH_STUDENT = re.compile(r'^\*\*Test Data for Student (\d+):\*\*$', re.MULTILINE)
+
+class StubModel:
+    """
+    Stand-in for GenerativeModel that returns canned feedback after a fixed delay.
+
+    Batched prompts are answered with one `=== REPORT n ===` section per student.
+
+    Args:
+        latency (float): Seconds each call takes, to mimic Gemini round trips.
+        text (str): Feedback returned for every prompt (or every student of a batch).
+        report_latency (float): Extra seconds per report generated, since a
+            batched answer takes longer to produce than a single one.
+    """
+
+    def __init__(self, latency=0.0, text=STUB_FEEDBACK, report_latency=0.0):
+        self.latency = latency
+        self.text = text
+        self.report_latency = report_latency
+        self.calls = 0
+
+    def _answer(self, prompt):
+        students = _BATCH_STUDENT.findall(prompt)
+        if not students:
+            return self.latency + self.report_latency, self.text
+        text = ''.join(f"=== REPORT {n} ===\n{self.text}\n" for n in students)
+        return self.latency + self.report_latency * len(students), text
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        delay, text = self._answer(prompt)
+        if delay:
+            time.sleep(delay)
+        return StubResponse(text)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        delay, text = self._answer(prompt)
+        if delay:
+            await asyncio.sleep(delay)
+        return StubResponse(text)
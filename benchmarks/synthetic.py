@@ -0,0 +1,87 @@
+import random
+
+SUBJECTS = [
+    ("607018ee404ae53194e73d92", "Physics"),
+    ("607018ee404ae53194e73d90", "Chemistry"),
+    ("607018ee404ae53194e73d91", "Mathematics"),
+]
+LEVELS = ['easy', 'medium', 'tough']
+
+def make_attempt(questions_per_subject=30, chapters_per_subject=8, concepts_per_subject=20,
+                 concepts_per_question=2, seed=None, attempt_id=None):
+    """
+    Build one synthetic attempt in the schema process_data reads.
+
+    Args:
+        questions_per_subject (int): Questions in each subject's section.
+        chapters_per_subject (int): Distinct chapters per subject.
+        concepts_per_subject (int): Size of each subject's concept pool.
+        concepts_per_question (int): Concepts tagged on every question (concept fan-out).
+        seed (int, optional): Seed for reproducible attempts.
+        attempt_id (str, optional): Value for the attempt's _id.$oid.
+
+    Returns:
+        dict: A single student attempt.
+    """
+    rng = random.Random(seed)
+    sections, subjects = [], []
+    total_attempted = total_correct = total_time = 0
+
+    for subject_id, name in SUBJECTS:
+        questions = []
+        attempted = correct = time_taken = 0
+        for q in range(questions_per_subject):
+            concepts = rng.sample(range(concepts_per_subject), min(concepts_per_question, concepts_per_subject))
+            question = {
+                'questionId': {
+                    'chapters': [{'title': f"{name} Chapter {rng.randrange(chapters_per_subject) + 1}"}],
+                    'level': rng.choice(LEVELS),
+                    'concepts': [{'title': f"{name} Concept {c + 1}"} for c in concepts]
+                },
+                'timeTaken': rng.randint(5, 300)
+            }
+            outcome = rng.random()
+            is_correct = rng.random() < 0.6
+            if outcome < 0.6:
+                question['markedOptions'] = [{'isCorrect': is_correct}]
+            elif outcome < 0.8:
+                question['inputValue'] = {'value': rng.randint(0, 100), 'isCorrect': is_correct}
+            else:
+                question['markedOptions'] = []
+                is_correct = False
+            if outcome < 0.8:
+                attempted += 1
+                correct += int(is_correct)
+            time_taken += question['timeTaken']
+            questions.append(question)
+
+        sections.append({'sectionId': {'title': f"{name} Single Correct"}, 'questions': questions})
+        subjects.append({
+            'subjectId': {'$oid': subject_id},
+            'totalMarkScored': correct * 4 - (attempted - correct),
+            'totalAttempted': attempted,
+            'totalCorrect': correct,
+            'accuracy': correct / attempted * 100 if attempted else 0,
+            'totalTimeTaken': time_taken
+        })
+        total_attempted += attempted
+        total_correct += correct
+        total_time += time_taken
+
+    total_questions = questions_per_subject * len(SUBJECTS)
+    return {
+        '_id': {'$oid': attempt_id or f"synthetic{rng.randrange(10 ** 12):012d}"},
+        'test': {'totalMarks': total_questions * 4, 'totalQuestions': total_questions, 'totalTime': 180},
+        'totalMarkScored': sum(s['totalMarkScored'] for s in subjects),
+        'totalAttempted': total_attempted,
+        'totalCorrect': total_correct,
+        'accuracy': total_correct / total_attempted * 100 if total_attempted else 0,
+        'totalTimeTaken': total_time,
+        'subjects': subjects,
+        'sections': sections
+    }
+
+def make_cohort(size, seed=0, **attempt_options):
+    """Yield size synthetic attempts with reproducible, distinct seeds."""
+    for i in range(size):
+        yield make_attempt(seed=seed + i, attempt_id=f"synthetic{seed + i:06d}", **attempt_options)
@@ -0,0 +1,209 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+def content_key(*parts):
+    """Hash the given strings into a stable cache key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def _size(value):
+    """Bytes counted against max_bytes; values other than bytes/str are not sized."""
+    return len(value) if isinstance(value, (bytes, str)) else 0
+
+class LRUCache:
+    """
+    In-process cache with least-recently-used eviction.
+
+    Args:
+        max_entries (int): Maximum number of entries kept.
+        ttl (float, optional): Seconds an entry stays valid; None keeps entries until evicted.
+        max_bytes (int, optional): Maximum total size of bytes/str values; None for no limit.
+    """
+
+    def __init__(self, max_entries=256, ttl=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.time() - entry[1] > self.ttl:
+                del self._entries[key]
+                self._bytes -= _size(entry[0])
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                self._bytes -= _size(old[0])
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            self._bytes += _size(value)
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes and len(self._entries) > 1):
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= _size(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+class SQLiteCache:
+    """
+    On-disk cache backed by SQLite, shared by every process using the same file.
+
+    Args:
+        db_path (str): Path to the SQLite database.
+        max_entries (int): Maximum number of entries kept; least recently used go first.
+        ttl (float, optional): Seconds an entry stays valid; None keeps entries until evicted.
+        max_bytes (int, optional): Maximum total size of stored values; None for no limit.
+    """
+
+    def __init__(self, db_path='cache.db', max_entries=10000, ttl=None, max_bytes=None):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            with conn:
+                if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                    conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    row = None
+                elif row is not None:
+                    conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        finally:
+            conn.close()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                evicted = conn.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+                if self.max_bytes is not None:
+                    # Drop least recently used entries beyond the byte budget, always keeping the newest
+                    evicted += conn.execute(
+                        "DELETE FROM cache WHERE key IN (SELECT key FROM ("
+                        "SELECT key, SUM(LENGTH(value)) OVER (ORDER BY accessed_at DESC, key) AS running FROM cache"
+                        ") WHERE running > ? AND key != ?)",
+                        (self.max_bytes, key)
+                    ).rowcount
+        finally:
+            conn.close()
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM cache")
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache").fetchone()
+        finally:
+            conn.close()
+        return {
+            'backend': 'sqlite',
+            'entries': entries,
+            'bytes': size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+def cache_from_env(prefix, default_backend='memory', default_path='cache.db', default_size=256, default_max_bytes=None):
+    """
+    Build a cache from <PREFIX>_CACHE, <PREFIX>_CACHE_PATH, <PREFIX>_CACHE_SIZE,
+    <PREFIX>_CACHE_TTL and <PREFIX>_CACHE_MAX_BYTES.
+
+    Returns:
+        LRUCache, SQLiteCache or None when the backend is 'none'.
+    """
+    backend = os.getenv(f'{prefix}_CACHE', default_backend).lower()
+    size = int(os.getenv(f'{prefix}_CACHE_SIZE', str(default_size)))
+    ttl = os.getenv(f'{prefix}_CACHE_TTL')
+    ttl = float(ttl) if ttl else None
+    max_bytes = os.getenv(f'{prefix}_CACHE_MAX_BYTES', str(default_max_bytes or ''))
+    max_bytes = int(max_bytes) if max_bytes else None
+    if backend == 'none':
+        return None
+    if backend == 'sqlite':
+        return SQLiteCache(os.getenv(f'{prefix}_CACHE_PATH', default_path), max_entries=size, ttl=ttl, max_bytes=max_bytes)
+    if backend == 'memory':
+        return LRUCache(max_entries=size, ttl=ttl, max_bytes=max_bytes)
+    raise ValueError(f"Unknown cache backend for {prefix}_CACHE: {backend}")
@@ -1,80 +1,81 @@
-import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
 import os
+import io
+import json
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from collections import defaultdict
+from cache import cache_from_env, content_key
+from question_store import QuestionStore, time_outcomes
+import metrics
 
-def generate_charts(processed_data):
-    """
-    Generate charts for the report using Plotly.
+# Timings are written when METRICS_LOG=1
+logger = metrics.logger.getChild('charts')
 
-    Args:
-        processed_data (dict): Processed data containing performance metrics.
+# Color scheme for consistency
+colors = {
+    'correct': '#2ecc71',  # Green
+    'incorrect': '#e74c3c',  # Red
+    'unattempted': '#95a5a6',  # Grey
+    'low': '#e74c3c',  # Red for <40%
+    'medium': '#f1c40f',  # Yellow for 40-70%
+    'high': '#2ecc71',  # Green for >70%
+}
 
-    Returns:
-        dict: Dictionary of chart names to their file paths.
+# Helper function to determine performance color based on percentage
+def get_performance_color(value):
+    if value < 40:
+        return colors['low']
+    elif value <= 70:
+        return colors['medium']
+    else:
+        return colors['high']
+
+def _frame(rows, columns):
     """
-    # Create a directory for saving charts if it doesn't exist
-    if not os.path.exists('charts'):
-        os.makedirs('charts')
-
-    # Initialize dictionary to store chart file paths
-    chart_paths = {}
-
-    # Color scheme for consistency
-    colors = {
-        'correct': '#2ecc71',  # Green
-        'incorrect': '#e74c3c',  # Red
-        'unattempted': '#95a5a6',  # Grey
-        'low': '#e74c3c',  # Red for <40%
-        'medium': '#f1c40f',  # Yellow for 40-70%
-        'high': '#2ecc71',  # Green for >70%
-    }
-
-    # Helper function to determine performance color based on percentage
-    def get_performance_color(value):
-        if value < 40:
-            return colors['low']
-        elif value <= 70:
-            return colors['medium']
-        else:
-            return colors['high']
+    DataFrame with these columns even when rows is empty. Plotly raises on a
+    frame without the named columns, so an attempt with no subjects or questions
+    gets empty axes, as with the reportlab backend, instead of failing the report.
+    """
+    import pandas as pd
+    return pd.DataFrame(list(rows), columns=columns)
 
-    # --- Chart 1: Subject-wise Accuracy Bar Chart (Updated from Original) ---
+# --- Chart 1: Subject-wise Accuracy Bar Chart (Updated from Original) ---
+def subject_accuracy_chart(processed_data):
+    import plotly.express as px
     subjects = list(processed_data['subjects'].keys())
     accuracies = [processed_data['subjects'][sub]['accuracy'] for sub in subjects]
-    subject_accuracy_fig = px.bar(
-        x=subjects, y=accuracies,
+    return px.bar(
+        _frame(zip(subjects, accuracies, accuracies), ['x', 'y', 'color']), x='x', y='y',
         title="Subject-Wise Accuracy",
         labels={'x': 'Subject', 'y': 'Accuracy (%)'},
-        color=accuracies,
+        color='color',
         color_continuous_scale=[colors['low'], colors['medium'], colors['high']]
     )
-    subject_accuracy_path = 'charts/subject_accuracy.png'
-    subject_accuracy_fig.write_image(subject_accuracy_path)
-    chart_paths['Subject-Wise Accuracy'] = subject_accuracy_path
 
-    # --- Chart 2: Difficulty-wise Attempt Distribution Pie Chart (Updated from Original) ---
+# --- Chart 2: Difficulty-wise Attempt Distribution Pie Chart (Updated from Original) ---
+def difficulty_distribution_chart(processed_data):
+    import plotly.express as px
     difficulties = list(processed_data['difficulty_metrics'].keys())
     attempted_counts = [processed_data['difficulty_metrics'][d]['attempted'] for d in difficulties]
-    difficulty_distribution_fig = px.pie(
+    return px.pie(
         names=difficulties,
         values=attempted_counts,
         title="Difficulty-Wise Attempt Distribution",
         color_discrete_sequence=px.colors.qualitative.Pastel
     )
-    difficulty_distribution_path = 'charts/difficulty_distribution.png'
-    difficulty_distribution_fig.write_image(difficulty_distribution_path)
-    chart_paths['Difficulty-Wise Attempt Distribution'] = difficulty_distribution_path
 
-    # --- Chart 3: Overall Attempt Status Pie Chart (Correct, Incorrect, Unattempted) ---
+# --- Chart 3: Overall Attempt Status Pie Chart (Correct, Incorrect, Unattempted) ---
+def attempt_status_chart(processed_data):
+    import plotly.express as px
     overall = processed_data['overall']
     total_questions = overall['total_questions']
     correct = overall['correct']
     attempted = overall['attempted']
     incorrect = attempted - correct
     unattempted = total_questions - attempted
-    attempt_status_fig = px.pie(
+    return px.pie(
         names=['Correct', 'Incorrect', 'Unattempted'],
         values=[correct, incorrect, unattempted],
         title="Overall Attempt Status Distribution",
@@ -84,69 +85,67 @@ def generate_charts(processed_data):
             'Unattempted': colors['unattempted']
         }
     )
-    attempt_status_path = 'charts/attempt_status_distribution.png'
-    attempt_status_fig.write_image(attempt_status_path)
-    chart_paths['Overall Attempt Status Distribution'] = attempt_status_path
 
-    # --- Chart 4: Subject-wise Marks Scored Bar Chart ---
+# --- Chart 4: Subject-wise Marks Scored Bar Chart ---
+def subject_marks_chart(processed_data):
+    import plotly.express as px
+    subjects = list(processed_data['subjects'].keys())
     marks = [processed_data['subjects'][sub]['marks_scored'] for sub in subjects]
-    marks_fig = px.bar(
-        x=subjects, y=marks,
+    return px.bar(
+        _frame(zip(subjects, marks, marks), ['x', 'y', 'color']), x='x', y='y',
         title="Subject-Wise Marks Scored",
         labels={'x': 'Subject', 'y': 'Marks Scored'},
-        color=marks,
+        color='color',
         color_continuous_scale=[colors['low'], colors['medium'], colors['high']]
     )
-    marks_path = 'charts/subject_marks.png'
-    marks_fig.write_image(marks_path)
-    chart_paths['Subject-Wise Marks Scored'] = marks_path
 
-    # --- Chart 5: Time Distribution Across Subjects (Pie Chart) ---
+# --- Chart 5: Time Distribution Across Subjects (Pie Chart) ---
+def time_distribution_chart(processed_data):
+    import plotly.express as px
+    subjects = list(processed_data['subjects'].keys())
     time_taken = [processed_data['subjects'][sub]['time_taken'] / 60 for sub in subjects]  # Convert to minutes
-    time_dist_fig = px.pie(
+    return px.pie(
         names=subjects,
         values=time_taken,
         title="Time Distribution Across Subjects (Minutes)",
         color_discrete_sequence=px.colors.qualitative.Pastel
     )
-    time_dist_path = 'charts/time_distribution.png'
-    time_dist_fig.write_image(time_dist_path)
-    chart_paths['Time Distribution Across Subjects'] = time_dist_path
-
-    # --- Chart 6: Difficulty-wise Accuracy Bar Chart ---
-    difficulty_data = pd.DataFrame([
-        {'Difficulty': diff, 'Accuracy': metrics['accuracy']}
-        for diff, metrics in processed_data['difficulty_metrics'].items()
-    ])
-    diff_accuracy_fig = px.bar(
+
+# --- Chart 6: Difficulty-wise Accuracy Bar Chart ---
+def difficulty_accuracy_chart(processed_data):
+    import plotly.express as px
+    difficulty_data = _frame(
+        ((diff, metrics['accuracy']) for diff, metrics in processed_data['difficulty_metrics'].items()),
+        ['Difficulty', 'Accuracy']
+    )
+    return px.bar(
         difficulty_data, x='Difficulty', y='Accuracy',
         title="Difficulty-Wise Accuracy",
         color='Accuracy',
         color_continuous_scale=[colors['low'], colors['medium'], colors['high']]
     )
-    diff_accuracy_path = 'charts/difficulty_accuracy.png'
-    diff_accuracy_fig.write_image(diff_accuracy_path)
-    chart_paths['Difficulty-Wise Accuracy'] = diff_accuracy_path
-
-    # --- Chart 7: Chapter-wise Accuracy Bar Chart ---
-    chapter_data = pd.DataFrame([
-        {'Subject': sub, 'Chapter': chap, 'Accuracy': metrics['accuracy']}
-        for (sub, chap), metrics in processed_data['chapter_metrics'].items()
-    ])
-    chapter_fig = px.bar(
+
+# --- Chart 7: Chapter-wise Accuracy Bar Chart ---
+def chapter_accuracy_chart(processed_data):
+    import plotly.express as px
+    chapter_data = _frame(
+        ((sub, chap, metrics['accuracy']) for (sub, chap), metrics in processed_data['chapter_metrics'].items()),
+        ['Subject', 'Chapter', 'Accuracy']
+    )
+    return px.bar(
         chapter_data, x='Chapter', y='Accuracy', color='Subject',
         title="Chapter-Wise Accuracy",
         barmode='group'
     )
-    chapter_path = 'charts/chapter_accuracy.png'
-    chapter_fig.write_image(chapter_path)
-    chart_paths['Chapter-Wise Accuracy'] = chapter_path
-
-   # --- Chart 8: Concept-wise Accuracy Scatter Plot (Vertical) ---
-    concept_data = pd.DataFrame([
-        {'Subject': sub, 'Concept': concept, 'Accuracy': metrics['accuracy'], 'Attempted': metrics['attempted']}
-        for (sub, concept), metrics in processed_data['concept_metrics'].items()
-    ])
+
+# --- Chart 8: Concept-wise Accuracy Scatter Plot (Vertical) ---
+def concept_accuracy_chart(processed_data):
+    import plotly.express as px
+    concept_data = _frame(
+        ((sub, concept, metrics['accuracy'], metrics['attempted'])
+         for (sub, concept), metrics in processed_data['concept_metrics'].items()),
+        ['Subject', 'Concept', 'Accuracy', 'Attempted']
+    )
     concept_fig = px.scatter(
         concept_data, x='Accuracy', y='Concept', color='Subject', size='Attempted',
         title="Concept-Wise Accuracy Breakdown"
@@ -159,36 +158,179 @@ def generate_charts(processed_data):
         yaxis=dict(tickangle=0),
         margin=dict(l=150, r=50, t=50, b=50)  # Adjust left margin for long concept names
     )
-    concept_path = 'charts/concept_accuracy.png'
-    concept_fig.write_image(concept_path)
-    chart_paths['Concept-Wise Accuracy'] = concept_path
+    return concept_fig
 
-    # --- Chart 9: Time vs Performance Scatter Plot (Subject-wise) ---
+# --- Chart 9: Time vs Performance Scatter Plot (Subject-wise) ---
+def time_vs_performance_chart(processed_data):
+    import plotly.express as px
+    import pandas as pd
+    subjects = list(processed_data['subjects'].keys())
     subject_df = pd.DataFrame({
         'Subject': subjects,
         'Marks Scored': [processed_data['subjects'][sub]['marks_scored'] for sub in subjects],
         'Time Taken (min)': [processed_data['subjects'][sub]['time_taken'] / 60 for sub in subjects],
-        'Accuracy': accuracies
+        'Accuracy': [processed_data['subjects'][sub]['accuracy'] for sub in subjects]
     })
-    time_performance_fig = px.scatter(
+    return px.scatter(
         subject_df, x='Time Taken (min)', y='Marks Scored', color='Subject', size='Accuracy',
         title="Time vs Performance Across Subjects"
     )
-    time_performance_path = 'charts/time_vs_performance.png'
-    time_performance_fig.write_image(time_performance_path)
-    chart_paths['Time vs Performance'] = time_performance_path
 
-    # --- Chart 10: Time per Question Scatter Plot ---
-    questions_df = pd.DataFrame(processed_data['questions_data'])
+# --- Chart 10: Time per Question Scatter Plot ---
+def time_per_question_chart(processed_data):
+    import plotly.express as px
+    import pandas as pd
+    questions = processed_data['questions_data']
+    # Reports pickled before QuestionStore still carry a list of dicts
+    questions_df = questions.to_frame() if isinstance(questions, QuestionStore) else pd.DataFrame(questions)
     questions_df['Question Number'] = range(1, len(questions_df) + 1)
-    time_per_question_fig = px.scatter(
+    return px.scatter(
         questions_df, x='Question Number', y='time_taken', color='correct',
         title="Time per Question",
         color_discrete_map={True: colors['correct'], False: colors['incorrect']},
         labels={'time_taken': 'Time Taken (sec)'}
     )
-    time_per_question_path = 'charts/time_per_question.png'
-    time_per_question_fig.write_image(time_per_question_path)
-    chart_paths['Time per Question'] = time_per_question_path
 
-    return chart_paths
\ No newline at end of file
+# Report charts in page order: (title, chart key, figure builder)
+CHARTS = [
+    ('Subject-Wise Accuracy', 'subject_accuracy', subject_accuracy_chart),
+    ('Difficulty-Wise Attempt Distribution', 'difficulty_distribution', difficulty_distribution_chart),
+    ('Overall Attempt Status Distribution', 'attempt_status_distribution', attempt_status_chart),
+    ('Subject-Wise Marks Scored', 'subject_marks', subject_marks_chart),
+    ('Time Distribution Across Subjects', 'time_distribution', time_distribution_chart),
+    ('Difficulty-Wise Accuracy', 'difficulty_accuracy', difficulty_accuracy_chart),
+    ('Chapter-Wise Accuracy', 'chapter_accuracy', chapter_accuracy_chart),
+    ('Concept-Wise Accuracy', 'concept_accuracy', concept_accuracy_chart),
+    ('Time vs Performance', 'time_vs_performance', time_vs_performance_chart),
+    ('Time per Question', 'time_per_question', time_per_question_chart),
+]
+
+# The parts of processed_data each chart reads. A chart's cache key is a hash of
+# these, so keep them in step with the builders above.
+CHART_INPUTS = {
+    'subject_accuracy': lambda d: [(sub, m['accuracy']) for sub, m in d['subjects'].items()],
+    'difficulty_distribution': lambda d: [(diff, m['attempted']) for diff, m in d['difficulty_metrics'].items()],
+    'attempt_status_distribution': lambda d: [d['overall']['total_questions'], d['overall']['correct'], d['overall']['attempted']],
+    'subject_marks': lambda d: [(sub, m['marks_scored']) for sub, m in d['subjects'].items()],
+    'time_distribution': lambda d: [(sub, m['time_taken']) for sub, m in d['subjects'].items()],
+    'difficulty_accuracy': lambda d: [(diff, m['accuracy']) for diff, m in d['difficulty_metrics'].items()],
+    'chapter_accuracy': lambda d: [(sub, chap, m['accuracy']) for (sub, chap), m in d['chapter_metrics'].items()],
+    'concept_accuracy': lambda d: [(sub, concept, m['accuracy'], m['attempted']) for (sub, concept), m in d['concept_metrics'].items()],
+    'time_vs_performance': lambda d: [(sub, m['marks_scored'], m['time_taken'], m['accuracy']) for sub, m in d['subjects'].items()],
+    'time_per_question': lambda d: time_outcomes(d['questions_data']),
+}
+
+# Bump when chart styling or export settings change, so cached images are not reused
+CHART_LAYOUT_VERSION = '1'
+
+# Rendered PNGs keyed by chart input fingerprint; identical inputs skip Kaleido
+chart_cache = cache_from_env('CHART', default_path='chart_cache.db', default_size=512, default_max_bytes=64 * 1024 * 1024)
+
+def chart_fingerprint(key, processed_data):
+    """Cache key for one chart: a hash of its input series, layout version and export format."""
+    inputs = json.dumps(CHART_INPUTS[key](processed_data), default=str, separators=(',', ':'))
+    return content_key('chart', CHART_LAYOUT_VERSION, key, 'png', inputs)
+
+# Render pool shared by every report generated in this process
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+def _init_renderer():
+    """Pool initializer: start this worker's Kaleido renderer once so later exports reuse it."""
+    import plotly.graph_objects as go
+    go.Figure().to_image(format='png', width=10, height=10)
+
+def _render_chart(index, processed_data):
+    """Build one chart and export it to PNG. Returns (png_bytes, elapsed_seconds)."""
+    start = time.perf_counter()
+    fig = CHARTS[index][2](processed_data)
+    png = fig.to_image(format='png')
+    return png, time.perf_counter() - start
+
+def _get_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            workers = int(os.getenv('CHART_WORKERS', '0')) or min(len(CHARTS), os.cpu_count() or 1)
+            # Spawned, not forked: this is called from job threads while sqlite handles and Kaleido are live
+            _render_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_renderer
+            )
+    return _render_pool
+
+def generate_charts(processed_data, parallel=None, timings=None):
+    """
+    Generate charts for the report using Plotly.
+
+    Charts are built and exported concurrently on a process pool whose workers
+    each keep a warm Kaleido renderer. Set CHARTS_SEQUENTIAL=1 (or pass
+    parallel=False) to render them one by one in this process for debugging.
+    Inside a pool worker (REPORT_WORKER_MODE=process) charts are always rendered
+    in-process: the job pool already spreads reports over the CPUs, and pools
+    forked from a pool worker do not shut down cleanly.
+    Images are kept in memory, so concurrent reports never share files, and
+    cached by a fingerprint of each chart's inputs (CHART_CACHE*), so only
+    charts whose data changed are re-rendered.
+
+    CHART_BACKEND=reportlab draws the same charts as native ReportLab vector
+    graphics instead (see vector_charts), skipping Plotly and Kaleido entirely.
+
+    Args:
+        processed_data (dict): Processed data containing performance metrics.
+        parallel (bool, optional): Override the CHARTS_SEQUENTIAL setting.
+        timings (dict, optional): Filled with chart names to render time in seconds.
+
+    Returns:
+        dict: Dictionary of chart names to in-memory PNG buffers (io.BytesIO), or
+        to ReportLab Drawings with the reportlab backend.
+    """
+    backend = os.getenv('CHART_BACKEND', 'plotly').lower()
+    if backend == 'reportlab':
+        from vector_charts import generate_drawings
+        return generate_drawings(processed_data, CHARTS, timings=timings)
+    if backend != 'plotly':
+        raise ValueError(f"Unknown CHART_BACKEND: {backend}")
+
+    if parallel is None:
+        parallel = os.getenv('CHARTS_SEQUENTIAL', '0') != '1' and multiprocessing.parent_process() is None
+
+    # Charts whose inputs were rendered before come straight from the cache
+    rendered = {}
+    chart_timings = {}
+    pending = []
+    for i, (name, key, _) in enumerate(CHARTS):
+        cache_key = chart_fingerprint(key, processed_data) if chart_cache is not None else None
+        png = chart_cache.get(cache_key) if cache_key is not None else None
+        if chart_cache is not None:
+            metrics.inc('chart_cache_requests_total', result='miss' if png is None else 'hit')
+        if png is not None:
+            rendered[name] = png
+            chart_timings[name] = 0.0
+        else:
+            pending.append((i, name, cache_key))
+
+    if parallel and len(pending) > 1:
+        pool = _get_render_pool()
+        futures = [(name, cache_key, pool.submit(_render_chart, i, processed_data)) for i, name, cache_key in pending]
+        results = [(name, cache_key, future.result()) for name, cache_key, future in futures]
+    else:
+        results = [(name, cache_key, _render_chart(i, processed_data)) for i, name, cache_key in pending]
+    for name, cache_key, (png, elapsed) in results:
+        rendered[name] = png
+        chart_timings[name] = elapsed
+        if cache_key is not None:
+            chart_cache.set(cache_key, png)
+
+    # Initialize dictionary to store chart images, in page order
+    chart_images = {name: io.BytesIO(rendered[name]) for name, _, _ in CHARTS}
+
+    slowest = max(chart_timings, key=chart_timings.get)
+    logger.info(
+        "Rendered %d charts (%s), %d from cache; slowest: %s %.3fs; %s",
+        len(pending), 'parallel' if parallel else 'sequential', len(CHARTS) - len(pending), slowest,
+        chart_timings[slowest], ', '.join(f"{name}={elapsed:.3f}s" for name, elapsed in chart_timings.items())
+    )
+    if timings is not None:
+        timings.update(chart_timings)
+
+    return chart_images
@@ -0,0 +1,262 @@
+import json
+import os
+import sqlite3
+import time
+from cache import content_key
+
+CHAPTER = 'chapter'
+CONCEPT = 'concept'
+KINDS = (CHAPTER, CONCEPT)
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS students (
+        id TEXT PRIMARY KEY,
+        added_at REAL NOT NULL
+    )
+    """,
+    # One row per student and group; the accuracy index answers percentile queries
+    """
+    CREATE TABLE IF NOT EXISTS student_groups (
+        kind TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        name TEXT NOT NULL,
+        student_id TEXT NOT NULL,
+        attempted INTEGER NOT NULL,
+        correct INTEGER NOT NULL,
+        time_taken REAL NOT NULL,
+        accuracy REAL NOT NULL,
+        PRIMARY KEY (kind, subject, name, student_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS student_groups_accuracy ON student_groups (kind, subject, name, accuracy)",
+    "CREATE INDEX IF NOT EXISTS student_groups_student ON student_groups (student_id)",
+    # Running sums across the cohort, updated as each student is added
+    """
+    CREATE TABLE IF NOT EXISTS group_totals (
+        kind TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        name TEXT NOT NULL,
+        students INTEGER NOT NULL,
+        attempted INTEGER NOT NULL,
+        correct INTEGER NOT NULL,
+        time_taken REAL NOT NULL,
+        PRIMARY KEY (kind, subject, name)
+    )
+    """,
+)
+
+def _group_rows(processed_data):
+    """Yield (kind, subject, name, attempted, correct, time_taken, accuracy) from a process_data result."""
+    for kind, key in ((CHAPTER, 'chapter_metrics'), (CONCEPT, 'concept_metrics')):
+        for (subject, name), m in processed_data.get(key, {}).items():
+            if m['attempted'] > 0:
+                yield kind, subject, name, m['attempted'], m['correct'], m['avg_time'] * m['attempted'], m['accuracy']
+
+def attempt_key(data):
+    """
+    Cohort id for an uploaded attempt: its '_id', or a hash of its content when the
+    export has none. Uploading the same attempt again then replaces its earlier entry.
+    """
+    if isinstance(data, list):
+        data = data[0] if data else {}
+    raw = data.get('_id') if isinstance(data, dict) else None
+    raw = raw.get('$oid') if isinstance(raw, dict) else raw
+    if raw:
+        return str(raw)
+    return content_key('attempt', json.dumps(data, sort_keys=True, separators=(',', ':')))
+
+class CohortIndex:
+    """
+    Persistent per-(subject, chapter) and per-(subject, concept) aggregates across students.
+
+    Each processed attempt is folded in once with add(), keyed by attempt_key().
+    Cohort totals are kept as running sums, and per-student accuracies are
+    indexed so percentiles and rankings are answered without reprocessing any
+    upload.
+
+    Args:
+        db_path (str): Path to the SQLite database.
+    """
+
+    def __init__(self, db_path='cohort.db'):
+        self.db_path = db_path
+        conn = self._connect()
+        with conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        conn.close()
+
+    @classmethod
+    def from_env(cls):
+        """Index at COHORT_DB_PATH (default cohort.db), or None when COHORT_DB_PATH is set empty."""
+        db_path = os.getenv('COHORT_DB_PATH', 'cohort.db')
+        return cls(db_path) if db_path else None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def add(self, student_id, processed_data):
+        """
+        Fold one student's chapter and concept metrics into the cohort.
+
+        Adding the same student_id again replaces their earlier contribution.
+        """
+        rows = list(_group_rows(processed_data))
+        conn = self._connect()
+        try:
+            with conn:
+                self._remove(conn, student_id)
+                conn.execute("INSERT INTO students (id, added_at) VALUES (?, ?)", (student_id, time.time()))
+                conn.executemany(
+                    "INSERT INTO student_groups (kind, subject, name, student_id, attempted, correct, time_taken, accuracy) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(kind, subject, name, student_id, attempted, correct, time_taken, accuracy)
+                     for kind, subject, name, attempted, correct, time_taken, accuracy in rows]
+                )
+                conn.executemany(
+                    "INSERT INTO group_totals (kind, subject, name, students, attempted, correct, time_taken) "
+                    "VALUES (?, ?, ?, 1, ?, ?, ?) "
+                    "ON CONFLICT (kind, subject, name) DO UPDATE SET "
+                    "students = students + 1, attempted = attempted + excluded.attempted, "
+                    "correct = correct + excluded.correct, time_taken = time_taken + excluded.time_taken",
+                    [(kind, subject, name, attempted, correct, time_taken)
+                     for kind, subject, name, attempted, correct, time_taken, _ in rows]
+                )
+        finally:
+            conn.close()
+
+    def remove(self, student_id):
+        """Take a student's contribution back out of the cohort."""
+        conn = self._connect()
+        try:
+            with conn:
+                self._remove(conn, student_id)
+        finally:
+            conn.close()
+
+    def _remove(self, conn, student_id):
+        old = conn.execute(
+            "SELECT kind, subject, name, attempted, correct, time_taken FROM student_groups WHERE student_id = ?",
+            (student_id,)
+        ).fetchall()
+        conn.executemany(
+            "UPDATE group_totals SET students = students - 1, attempted = attempted - ?, "
+            "correct = correct - ?, time_taken = time_taken - ? WHERE kind = ? AND subject = ? AND name = ?",
+            [(r['attempted'], r['correct'], r['time_taken'], r['kind'], r['subject'], r['name']) for r in old]
+        )
+        conn.execute("DELETE FROM group_totals WHERE students <= 0")
+        conn.execute("DELETE FROM student_groups WHERE student_id = ?", (student_id,))
+        conn.execute("DELETE FROM students WHERE id = ?", (student_id,))
+
+    def student_count(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+        finally:
+            conn.close()
+
+    def rankings(self, kind, subject=None, limit=10, weakest=True, min_students=1):
+        """
+        Rank chapters or concepts by cohort accuracy.
+
+        Args:
+            kind (str): 'chapter' or 'concept'.
+            subject (str, optional): Only rank groups of this subject.
+            limit (int): Number of groups returned.
+            weakest (bool): Lowest accuracy first; False puts the strongest first.
+            min_students (int): Skip groups attempted by fewer students.
+
+        Returns:
+            list: Dicts with subject, name, students, attempted, correct, accuracy and avg_time.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Invalid cohort group kind: {kind}")
+        query = (
+            "SELECT subject, name, students, attempted, correct, time_taken, "
+            "100.0 * correct / attempted AS accuracy FROM group_totals "
+            "WHERE kind = ? AND students >= ? AND attempted > 0"
+        )
+        params = [kind, min_students]
+        if subject is not None:
+            query += " AND subject = ?"
+            params.append(subject)
+        query += f" ORDER BY accuracy {'ASC' if weakest else 'DESC'}, attempted DESC LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        return [{
+            'subject': row['subject'],
+            'name': row['name'],
+            'students': row['students'],
+            'attempted': row['attempted'],
+            'correct': row['correct'],
+            'accuracy': row['accuracy'],
+            'avg_time': row['time_taken'] / row['attempted']
+        } for row in rows]
+
+    def percentile(self, kind, subject, name, accuracy):
+        """
+        Percentile rank of an accuracy among the cohort's students for one group.
+
+        Ties count half, so a cohort where everyone scores the same puts each
+        student at the 50th percentile. Returns None for a group nobody attempted.
+        """
+        conn = self._connect()
+        try:
+            return self._percentile(conn, kind, subject, name, accuracy)
+        finally:
+            conn.close()
+
+    def _percentile(self, conn, kind, subject, name, accuracy):
+        row = conn.execute(
+            "SELECT COUNT(*) AS total, "
+            "COALESCE(SUM(accuracy < ?), 0) AS below, COALESCE(SUM(accuracy = ?), 0) AS equal "
+            "FROM student_groups WHERE kind = ? AND subject = ? AND name = ?",
+            (accuracy, accuracy, kind, subject, name)
+        ).fetchone()
+        if not row['total']:
+            return None
+        return 100.0 * (row['below'] + 0.5 * row['equal']) / row['total']
+
+    def compare(self, processed_data):
+        """
+        Compare one student's chapters and concepts with the cohort.
+
+        Returns:
+            list: One dict per attempted group with kind, subject, name, the
+            student's accuracy, the cohort accuracy, the student's percentile and
+            the number of students in the cohort for that group; weakest
+            percentile first.
+        """
+        rows = list(_group_rows(processed_data))
+        conn = self._connect()
+        try:
+            comparisons = []
+            for kind, subject, name, _, _, _, accuracy in rows:
+                totals = conn.execute(
+                    "SELECT students, attempted, correct FROM group_totals WHERE kind = ? AND subject = ? AND name = ?",
+                    (kind, subject, name)
+                ).fetchone()
+                if totals is None or not totals['attempted']:
+                    continue
+                comparisons.append({
+                    'kind': kind,
+                    'subject': subject,
+                    'name': name,
+                    'accuracy': accuracy,
+                    'cohort_accuracy': 100.0 * totals['correct'] / totals['attempted'],
+                    'percentile': self._percentile(conn, kind, subject, name, accuracy),
+                    'students': totals['students']
+                })
+        finally:
+            conn.close()
+        comparisons.sort(key=lambda c: (c['percentile'], c['accuracy']))
+        return comparisons
@@ -1,28 +1,148 @@
+import os
 from collections import defaultdict
+from question_store import QuestionStore
+from subject_registry import default_registry
 
-def get_subject_from_title(title):
-    title_lower = title.lower()
-    if any(keyword in title_lower for keyword in ['physics', 'phys']):
-        return 'Physics'
-    elif any(keyword in title_lower for keyword in ['chemistry', 'chem']):
-        return 'Chemistry'
-    elif any(keyword in title_lower for keyword in ['mathematics', 'math', 'maths']):
-        return 'Mathematics'
-    return 'Unknown'
-
-def process_data(data, subject_map=None):
-    if subject_map is None:
-        subject_map = {
-            "607018ee404ae53194e73d92": "Physics",
-            "607018ee404ae53194e73d90": "Chemistry",
-            "607018ee404ae53194e73d91": "Mathematics"
+# Bump when process_data's output changes, so stored processed data is recomputed
+PROCESSING_VERSION = '2'
+
+def get_subject_from_title(title, registry=None):
+    return (registry or default_registry()).classify(title)
+
+def get_question_outcome(question):
+    """Return (attempted, correct) for a single question entry."""
+    marked_options = question.get('markedOptions', [])
+    input_value = question.get('inputValue', {})
+    if marked_options:
+        attempted = len(marked_options) > 0
+        correct = any(opt.get('isCorrect', False) for opt in marked_options) if attempted else False
+    elif input_value:
+        attempted = input_value.get('value') is not None
+        correct = input_value.get('isCorrect', False) if attempted else False
+    else:
+        attempted = False
+        correct = False
+    return attempted, correct
+
+def calculate_metrics(perf_dict):
+    metrics = {}
+    for key, perf in perf_dict.items():
+        attempted = perf['attempted']
+        if attempted > 0:
+            accuracy = (perf['correct'] / attempted) * 100
+            avg_time = perf['time_taken'] / attempted
+        else:
+            accuracy = 0
+            avg_time = 0
+        metrics[key] = {
+            'attempted': attempted,
+            'correct': perf['correct'],
+            'accuracy': accuracy,
+            'avg_time': avg_time
         }
+    return metrics
+
+def process_questions_columnar(sections, registry=None):
+    """
+    Columnar variant of the per-question aggregation in process_data.
+
+    Sections and questions are flattened into typed arrays in a single pass, with
+    chapter, difficulty and concept keys interned to integer codes. Metrics are
+    then computed with grouped NumPy reductions (bincount over the codes). Groups
+    keep first-attempted order, so the result matches the loop path exactly.
+
+    Args:
+        sections (list): The attempt's 'sections' list.
+        registry (SubjectRegistry, optional): Classifies section titles; the
+            default registry when omitted.
+
+    Returns:
+        tuple: (chapter_metrics, difficulty_metrics, concept_metrics,
+            avg_time_correct, avg_time_incorrect, questions_data)
+    """
+    import numpy as np
+
+    classify = (registry or default_registry()).classify
+    chapter_ids, difficulty_ids, concept_ids = {}, {}, {}
+    chapter_codes, difficulty_codes, concept_codes, concept_rows = [], [], [], []
+    questions_data = QuestionStore()
+
+    for section in sections:
+        subject = classify(section.get('sectionId', {}).get('title', ''))
+        for question in section.get('questions', []):
+            q_data = question.get('questionId', {})
+            chapter = q_data.get('chapters', [{}])[0].get('title', 'Unknown')
+            difficulty = q_data.get('level', 'Unknown')
+            concepts = [c.get('title', 'Unknown') for c in q_data.get('concepts', [])]
+            time_taken = question.get('timeTaken', 0)
+            attempted, correct = get_question_outcome(question)
+
+            row = questions_data.append(subject, chapter, difficulty, concepts, attempted, correct, time_taken)
+            chapter_codes.append(chapter_ids.setdefault((subject, chapter), len(chapter_ids)))
+            difficulty_codes.append(difficulty_ids.setdefault(difficulty, len(difficulty_ids)))
+            for concept in concepts:
+                concept_codes.append(concept_ids.setdefault((subject, concept), len(concept_ids)))
+                concept_rows.append(row)
+
+    # The store's typed arrays are the value columns; no second copy is built
+    columns = questions_data.columns()
+    attempted_arr = columns['attempted']
+    correct_arr = columns['correct'] & attempted_arr
+    time_arr = columns['time_taken']
+    concept_rows = np.array(concept_rows, dtype=np.intp)
+
+    def grouped_metrics(ids, codes, rows=None):
+        codes = np.array(codes, dtype=np.intp)
+        mask = attempted_arr if rows is None else attempted_arr[rows]
+        correct = correct_arr if rows is None else correct_arr[rows]
+        times = time_arr if rows is None else time_arr[rows]
+        codes, correct, times = codes[mask], correct[mask], times[mask]
+
+        attempted_sum = np.bincount(codes, minlength=len(ids))
+        correct_sum = np.bincount(codes, weights=correct, minlength=len(ids))
+        time_sum = np.bincount(codes, weights=times, minlength=len(ids))
+        # Order groups by their first attempted question, as the loop path does
+        unique_codes, first_seen = np.unique(codes, return_index=True)
+        ordered = unique_codes[np.argsort(first_seen, kind='stable')]
+
+        keys = list(ids)
+        metrics = {}
+        for code in ordered.tolist():
+            attempted = int(attempted_sum[code])
+            correct = int(correct_sum[code])
+            metrics[keys[code]] = {
+                'attempted': attempted,
+                'correct': correct,
+                'accuracy': (correct / attempted) * 100,
+                'avg_time': float(time_sum[code]) / attempted
+            }
+        return metrics
+
+    chapter_metrics = grouped_metrics(chapter_ids, chapter_codes)
+    difficulty_metrics = grouped_metrics(difficulty_ids, difficulty_codes)
+    concept_metrics = grouped_metrics(concept_ids, concept_codes, concept_rows)
+
+    correct_times = time_arr[correct_arr]
+    incorrect_times = time_arr[attempted_arr & ~correct_arr]
+    avg_time_correct = float(correct_times.sum()) / len(correct_times) if len(correct_times) else 0
+    avg_time_incorrect = float(incorrect_times.sum()) / len(incorrect_times) if len(incorrect_times) else 0
+
+    return chapter_metrics, difficulty_metrics, concept_metrics, avg_time_correct, avg_time_incorrect, questions_data
+
+def process_data(data, subject_map=None, columnar=None, registry=None):
+    if registry is None:
+        registry = default_registry()
+    # An explicit ObjectId -> name dict still overrides the registry's ids
+    subject_name = subject_map.get if subject_map is not None else registry.name_for_id
 
     if isinstance(data, list):
         data = data[0] if data else {}
     elif not isinstance(data, dict):
         raise ValueError("Invalid JSON structure: expected a list or dictionary")
 
+    if columnar is None:
+        columnar = os.getenv('COLUMNAR_PROCESSING', '0') == '1'
+
     overall = {
         'marks_scored': data.get('totalMarkScored', 0),
         'total_marks': data.get('test', {}).get('totalMarks', 0),
@@ -34,29 +154,46 @@ def process_data(data, subject_map=None):
         'total_time': data.get('test', {}).get('totalTime', 0) * 60  # Convert minutes to seconds
     }
 
+    subject_entries = data.get('subjects', [])
+    test_id = data.get('test', {}).get('_id', {}).get('$oid')
     subjects = {}
-    for sub in data.get('subjects', []):
+    for sub in subject_entries:
         sub_id = sub.get('subjectId', {}).get('$oid', 'Unknown')
-        sub_name = subject_map.get(sub_id, 'Unknown')
+        sub_name = subject_name(sub_id, 'Unknown')
         subjects[sub_name] = {
             'marks_scored': sub.get('totalMarkScored', 0),
-            'total_marks': 100,  # Hardcoded due to lack of per-question marks
+            'total_marks': registry.total_marks(sub_name, test_id),
             'attempted': sub.get('totalAttempted', 0),
             'correct': sub.get('totalCorrect', 0),
             'accuracy': sub.get('accuracy', 0),
             'time_taken': sub.get('totalTimeTaken', 0)
         }
 
+    sections = data.get('sections', [])
+    if columnar:
+        (chapter_metrics, difficulty_metrics, concept_metrics,
+         avg_time_correct, avg_time_incorrect, questions_data) = process_questions_columnar(sections, registry)
+        return {
+            'overall': overall,
+            'subjects': subjects,
+            'chapter_metrics': chapter_metrics,
+            'difficulty_metrics': difficulty_metrics,
+            'concept_metrics': concept_metrics,
+            'avg_time_correct': avg_time_correct,
+            'avg_time_incorrect': avg_time_incorrect,
+            'questions_data': questions_data
+        }
+
     chapter_performance = defaultdict(lambda: {'attempted': 0, 'correct': 0, 'time_taken': 0})
     difficulty_performance = defaultdict(lambda: {'attempted': 0, 'correct': 0, 'time_taken': 0})
     concept_performance = defaultdict(lambda: {'attempted': 0, 'correct': 0, 'time_taken': 0})
-    questions_data = []
+    questions_data = QuestionStore()
+    classify = registry.classify
 
-    sections = data.get('sections', [])
     for section in sections:
         section_id = section.get('sectionId', {})
         title = section_id.get('title', '')
-        subject = get_subject_from_title(title)
+        subject = classify(title)
         questions = section.get('questions', [])
         for question in questions:
             q_data = question.get('questionId', {})
@@ -65,17 +202,7 @@ def process_data(data, subject_map=None):
             concepts = [c.get('title', 'Unknown') for c in q_data.get('concepts', [])]
             time_taken = question.get('timeTaken', 0)
 
-            marked_options = question.get('markedOptions', [])
-            input_value = question.get('inputValue', {})
-            if marked_options:
-                attempted = len(marked_options) > 0
-                correct = any(opt.get('isCorrect', False) for opt in marked_options) if attempted else False
-            elif input_value:
-                attempted = input_value.get('value') is not None
-                correct = input_value.get('isCorrect', False) if attempted else False
-            else:
-                attempted = False
-                correct = False
+            attempted, correct = get_question_outcome(question)
 
             if attempted:
                 chapter_key = (subject, chapter)
@@ -94,40 +221,15 @@ def process_data(data, subject_map=None):
                         concept_key = (subject, concept)
                         concept_performance[concept_key]['correct'] += 1
 
-            questions_data.append({
-                'subject': subject,
-                'chapter': chapter,
-                'difficulty': difficulty,
-                'concepts': concepts,
-                'attempted': attempted,
-                'correct': correct,
-                'time_taken': time_taken
-            })
-
-    def calculate_metrics(perf_dict):
-        metrics = {}
-        for key, perf in perf_dict.items():
-            attempted = perf['attempted']
-            if attempted > 0:
-                accuracy = (perf['correct'] / attempted) * 100
-                avg_time = perf['time_taken'] / attempted
-            else:
-                accuracy = 0
-                avg_time = 0
-            metrics[key] = {
-                'attempted': attempted,
-                'correct': perf['correct'],
-                'accuracy': accuracy,
-                'avg_time': avg_time
-            }
-        return metrics
+            questions_data.append(subject, chapter, difficulty, concepts, attempted, correct, time_taken)
 
     chapter_metrics = calculate_metrics(chapter_performance)
     difficulty_metrics = calculate_metrics(difficulty_performance)
     concept_metrics = calculate_metrics(concept_performance)
 
-    correct_times = [q['time_taken'] for q in questions_data if q['attempted'] and q['correct']]
-    incorrect_times = [q['time_taken'] for q in questions_data if q['attempted'] and not q['correct']]
+    outcomes = list(zip(questions_data.attempted, questions_data.correct, questions_data.time_taken))
+    correct_times = [t for attempted, correct, t in outcomes if attempted and correct]
+    incorrect_times = [t for attempted, correct, t in outcomes if attempted and not correct]
     avg_time_correct = sum(correct_times) / len(correct_times) if correct_times else 0
     avg_time_incorrect = sum(incorrect_times) / len(incorrect_times) if incorrect_times else 0
 
@@ -0,0 +1,16 @@
+import os
+
+# GUNICORN_PRELOAD=1 imports the app and its heavy dependencies once in the master,
+# so each forked worker starts serving without paying the import cost again.
+preload_app = os.getenv('GUNICORN_PRELOAD', '0') == '1'
+
+def on_starting(server):
+    if preload_app:
+        from report_pipeline import preload
+        preload()
+
+def post_fork(server, worker):
+    if preload_app:
+        # Worker pools and threads do not survive the fork; start this worker's own
+        from app import jobs
+        jobs.start()
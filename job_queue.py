@@ -0,0 +1,251 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import metrics
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _claim_job(db_path, job_id):
+    """Mark a queued job as running; returns its payload, or None if another worker got it first."""
+    conn = _connect(db_path)
+    try:
+        with conn:
+            # Claim the job; another process may already have picked it up after a restart
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, worker_pid = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, os.getpid(), time.time(), job_id, QUEUED)
+            ).rowcount
+        if not claimed:
+            return None
+        return json.loads(conn.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()['payload'])
+    finally:
+        conn.close()
+
+def _finish_job(db_path, job_id, result=None, error=None):
+    """Record a job's result, or its error message when error is given."""
+    conn = _connect(db_path)
+    try:
+        with conn:
+            if error is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                    (FAILED, error, time.time(), job_id)
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, result = ?, updated_at = ? WHERE id = ?",
+                    (DONE, json.dumps(result), time.time(), job_id)
+                )
+    finally:
+        conn.close()
+
+def _execute_job(db_path, handler, job_id):
+    """Run a single job inside a pool worker and record its outcome in the store."""
+    payload = _claim_job(db_path, job_id)
+    if payload is None:
+        return
+    try:
+        result = handler(payload)
+    except Exception as e:
+        _finish_job(db_path, job_id, error=str(e))
+    else:
+        _finish_job(db_path, job_id, result=result)
+
+async def _execute_job_async(db_path, handler, job_id, slots):
+    """Async-mode counterpart of _execute_job; store updates run on the loop's default executor."""
+    loop = asyncio.get_running_loop()
+    async with slots:
+        payload = await loop.run_in_executor(None, _claim_job, db_path, job_id)
+        if payload is None:
+            return
+        try:
+            result = await handler(payload)
+        except Exception as e:
+            await loop.run_in_executor(None, _finish_job, db_path, job_id, None, str(e))
+        else:
+            await loop.run_in_executor(None, _finish_job, db_path, job_id, result)
+
+def _execute_job_in_process(db_path, handler, job_id):
+    """Process-pool entry point: run the job and ship the worker's metrics back to the parent."""
+    _execute_job(db_path, handler, job_id)
+    return metrics.drain()
+
+def _merge_worker_metrics(future):
+    if future.exception() is None:
+        metrics.merge(future.result())
+
+class JobQueue:
+    """
+    Background job queue backed by a local SQLite store.
+
+    Jobs are persisted before they are handed to the worker pool, so queued work
+    survives a restart and is resubmitted by start().
+
+    Args:
+        handler (callable): Module-level function called with each job payload. Its
+            return value must be JSON-serializable. In 'async' mode it is a
+            coroutine function and need not be module-level.
+        db_path (str): Path to the SQLite job store.
+        workers (int): Number of pool workers; in 'async' mode, jobs run concurrently.
+        mode (str): 'thread', 'process' or 'async'. Async jobs run as tasks on the
+            event loop that called start(), for the ASGI front end.
+    """
+
+    def __init__(self, handler, db_path='jobs.db', workers=1, mode='thread'):
+        if mode not in ('thread', 'process', 'async'):
+            raise ValueError(f"Invalid worker mode: {mode}")
+        self.handler = handler
+        self.db_path = db_path
+        self.workers = workers
+        self.mode = mode
+        self._executor = None
+        self._loop = None
+        self._slots = None
+        self._tasks = set()
+
+        conn = _connect(db_path)
+        with conn:
+            conn.execute(_SCHEMA)
+        conn.close()
+
+    def start(self):
+        """Create the worker pool and resubmit jobs left over from a previous run."""
+        if self._executor is not None or self._loop is not None:
+            return
+        if self.mode == 'async':
+            # Must be called from the event loop the jobs should run on
+            self._loop = asyncio.get_running_loop()
+            self._slots = asyncio.Semaphore(self.workers)
+        elif self.mode == 'process':
+            # Forked workers start with a copy of this process's metrics; drop it so merges don't double count
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=metrics.drain)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='report-job')
+
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                # Jobs whose worker died mid-run go back to the queue
+                for row in conn.execute("SELECT id, worker_pid FROM jobs WHERE status = ?", (RUNNING,)).fetchall():
+                    if not _pid_alive(row['worker_pid']):
+                        conn.execute(
+                            "UPDATE jobs SET status = ?, worker_pid = NULL, updated_at = ? WHERE id = ?",
+                            (QUEUED, time.time(), row['id'])
+                        )
+            pending = [row['id'] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+            ).fetchall()]
+        finally:
+            conn.close()
+
+        for job_id in pending:
+            self._dispatch(job_id)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+        if self._loop is not None:
+            # Unfinished async jobs stay 'running' in the store and are requeued by the next start()
+            for task in list(self._tasks):
+                task.cancel()
+            self._loop = None
+
+    def _run_async(self, job_id):
+        task = self._loop.create_task(_execute_job_async(self.db_path, self.handler, job_id, self._slots))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _dispatch(self, job_id):
+        if self.mode == 'async':
+            # submit() may be called from an executor thread rather than the loop itself
+            self._loop.call_soon_threadsafe(self._run_async, job_id)
+        elif self.mode == 'process':
+            future = self._executor.submit(_execute_job_in_process, self.db_path, self.handler, job_id)
+            future.add_done_callback(_merge_worker_metrics)
+        else:
+            self._executor.submit(_execute_job, self.db_path, self.handler, job_id)
+
+    def submit(self, payload, job_id=None):
+        """
+        Persist a new job and hand it to the worker pool.
+
+        Args:
+            payload (dict): JSON-serializable arguments for the handler.
+            job_id (str, optional): Id to use for the job; a new UUID by default.
+
+        Returns:
+            str: The job id.
+        """
+        self.start()
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, QUEUED, json.dumps(payload), now, now)
+                )
+        finally:
+            conn.close()
+        self._dispatch(job_id)
+        return job_id
+
+    def get(self, job_id):
+        """
+        Look up a job.
+
+        Returns:
+            dict or None: {'id', 'status', 'result', 'error'}, or None for an unknown id.
+        """
+        conn = _connect(self.db_path)
+        try:
+            row = conn.execute("SELECT id, status, result, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error']
+        }
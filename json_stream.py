@@ -0,0 +1,99 @@
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+# What may follow a decoded number that could still be part of it (e.g. "-1." of "-1.5e10")
+_NUMBER_TAIL = re.compile(r'[0-9+\-.eE]*\Z')
+
+def iter_json_items(fp, chunk_size=64 * 1024):
+    """
+    Incrementally decode a JSON document, yielding one top-level item at a time.
+
+    A top-level array yields each of its elements; any other document is yielded
+    as a single item. Only the element currently being decoded is kept in memory,
+    so peak memory depends on the largest attempt rather than the file size.
+
+    Args:
+        fp: Text file object opened for reading.
+        chunk_size (int): Initial number of characters to read at once. The read
+            size doubles while an element is incomplete, keeping large elements linear.
+
+    Yields:
+        The decoded items in document order.
+    """
+    buf = ''
+    pos = 0
+    eof = False
+    read_size = chunk_size
+
+    def fill():
+        nonlocal buf, pos, eof, read_size
+        chunk = fp.read(read_size)
+        if not chunk:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf) or not fill():
+                return
+
+    def decode_value():
+        nonlocal pos, read_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Element is incomplete; read a bigger chunk and retry
+                read_size *= 2
+                fill()
+                continue
+            # A number cut at the end of the buffer may continue in the next chunk
+            if (not eof and isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and _NUMBER_TAIL.match(buf, end) and fill()):
+                continue
+            pos = end
+            read_size = chunk_size
+            return value
+
+    skip_whitespace()
+    if pos >= len(buf):
+        raise ValueError("Empty JSON document")
+
+    if buf[pos] != '[':
+        value = decode_value()
+        skip_whitespace()
+        if pos < len(buf):
+            raise ValueError("Extra data after JSON document")
+        yield value
+        return
+
+    pos += 1
+    first = True
+    while True:
+        skip_whitespace()
+        if pos >= len(buf):
+            raise ValueError("Unterminated JSON array")
+        if buf[pos] == ']':
+            pos += 1
+            break
+        if not first:
+            if buf[pos] != ',':
+                raise ValueError(f"Expected ',' or ']' in JSON array, found {buf[pos]!r}")
+            pos += 1
+            skip_whitespace()
+        yield decode_value()
+        first = False
+
+    skip_whitespace()
+    if pos < len(buf):
+        raise ValueError("Extra data after JSON array")
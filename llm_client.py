@@ -0,0 +1,119 @@
+import asyncio
+import os
+import random
+import time
+
+class FeedbackError(Exception):
+    """Raised when feedback could not be generated for a report."""
+
+class TokenBucket:
+    """
+    Asyncio token-bucket rate limiter.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (int): Maximum burst size.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+def is_retryable(error):
+    """Transient failures worth retrying: timeouts, rate limits, connection and server errors."""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return False
+    return isinstance(error, (
+        exceptions.TooManyRequests,
+        exceptions.ResourceExhausted,
+        exceptions.ServiceUnavailable,
+        exceptions.DeadlineExceeded,
+        exceptions.InternalServerError,
+    ))
+
+class AsyncFeedbackClient:
+    """
+    Concurrent Gemini client for batch runs.
+
+    Calls are capped by a semaphore, paced by a token bucket, bounded by a
+    per-call timeout and retried with exponential backoff on transient errors.
+    Defaults come from the GEMINI_* environment variables.
+
+    Args:
+        model: A GenerativeModel (or compatible stub). Defaults to llm_feedback.get_model().
+        concurrency (int): Maximum calls in flight.
+        requests_per_minute (float): Sustained request rate allowed by the quota.
+        max_retries (int): Retries after the first attempt.
+        timeout (float): Seconds before a single call is abandoned.
+        backoff (float): Base delay in seconds; doubles after each failed attempt.
+        native_async (bool): Use generate_content_async. When False the blocking
+            call runs in a thread, which works with the REST transport used for
+            GEMINI_API_ENDPOINT stub servers.
+    """
+
+    def __init__(self, model=None, concurrency=None, requests_per_minute=None, max_retries=None,
+                 timeout=None, backoff=None, native_async=None):
+        if model is None:
+            import llm_feedback
+            model = llm_feedback.get_model()
+        self.model = model
+        self.concurrency = concurrency or int(os.getenv('GEMINI_CONCURRENCY', '4'))
+        self.requests_per_minute = requests_per_minute or float(os.getenv('GEMINI_RPM', '60'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('GEMINI_MAX_RETRIES', '3'))
+        self.timeout = timeout or float(os.getenv('GEMINI_TIMEOUT', '60'))
+        self.backoff = backoff if backoff is not None else float(os.getenv('GEMINI_BACKOFF', '1.0'))
+        self.native_async = native_async if native_async is not None else not os.getenv('GEMINI_API_ENDPOINT')
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._bucket = TokenBucket(self.requests_per_minute / 60, capacity=self.concurrency)
+
+    async def _call(self, prompt):
+        if self.native_async:
+            response = await self.model.generate_content_async(prompt)
+        else:
+            response = await asyncio.to_thread(self.model.generate_content, prompt)
+        return response.text
+
+    async def generate(self, prompt):
+        """
+        Generate text for one prompt.
+
+        Raises:
+            FeedbackError: If the call fails permanently or runs out of retries.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self._bucket.acquire()
+            try:
+                async with self._semaphore:
+                    return await asyncio.wait_for(self._call(prompt), self.timeout)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise FeedbackError(f"Error generating feedback: {e}") from e
+            # Full jitter keeps retries from many workers from lining up
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    async def generate_many(self, prompts):
+        """
+        Generate text for several prompts concurrently.
+
+        Returns:
+            list: Generated text or the FeedbackError for each prompt, in order.
+        """
+        return await asyncio.gather(*(self.generate(prompt) for prompt in prompts), return_exceptions=True)
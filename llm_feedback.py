@@ -1,93 +1,414 @@
-import google.generativeai as genai
+import asyncio
 import os
+import re
 from dotenv import load_dotenv
+from cache import cache_from_env, content_key
+from llm_client import FeedbackError
+import metrics
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel('gemini-1.5-flash')
+MODEL_NAME = 'gemini-1.5-flash'
 
-def generate_feedback(processed_data):
-    """Generate personalized feedback using Gemini API.
+# Created on first use by get_model(); importing google.generativeai is slow
+model = None
+
+def get_model():
+    """Configure the Gemini API and build the shared GenerativeModel on first use."""
+    global model
+    if model is None:
+        import google.generativeai as genai
+
+        # GEMINI_API_ENDPOINT points the REST transport at another server (e.g. a local stub)
+        api_endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        if api_endpoint:
+            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"), transport='rest', client_options={'api_endpoint': api_endpoint})
+        else:
+            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        model = genai.GenerativeModel(MODEL_NAME)
+    return model
+
+# Feedback keyed by a hash of the rendered prompt, so re-uploads skip the Gemini call
+feedback_cache = cache_from_env('FEEDBACK', default_path='feedback_cache.db')
+
+# Rough Gemini tokenizer ratio for English text; good enough for budgeting without an API call
+CHARS_PER_TOKEN = 4
+# Estimated prompt tokens above which chapters and concepts are trimmed (0 = no limit)
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '8000'))
+
+# What each report must cover; shared by single-student and batched prompts
+_REPORT_INSTRUCTIONS = """1. **Introduction**: A warm, motivating, and highly personalized message reflecting the student's specific performance (e.g., strengths in Physics, struggles in Mathematics). Avoid generic phrases.
+2. **Performance Breakdown**: Detailed insights at overall, subject, chapter, difficulty, and concept levels. Highlight key patterns (e.g., strong/weak areas), and where percentiles are given, how the student compares with other students.
+3. **Time vs Accuracy Insights**: Analyze how time management impacts performance, referencing specific metrics.
+4. **Actionable Suggestions**: Provide 2-3 specific, tailored suggestions for improvement based on the data.
+
+Format your response in Markdown with clear headings and bullet points. Ensure the tone is encouraging, professional, and human-like, with specific references to the data."""
+
+PROMPT_TEMPLATE = (
+    "\nYou are an expert academic coach tasked with generating a personalized feedback report for a student "
+    "based on their test performance. Using the data below, create a report that includes:\n\n"
+    + _REPORT_INSTRUCTIONS
+    + "\n\n**Test Data:**\n{context}\n"
+)
+
+BATCH_PROMPT_TEMPLATE = (
+    "\nYou are an expert academic coach tasked with generating personalized feedback reports for {count} students "
+    "based on their test performance. Each student's data is given separately below; treat every student "
+    "independently and never mix data between them. For each student, create a report that includes:\n\n"
+    + _REPORT_INSTRUCTIONS
+    + "\n\nStart each student's report with a line containing only `=== REPORT n ===`, where n is the "
+    "student's number below, and give the reports in order.\n\n{students}"
+)
+BATCH_STUDENT_TEMPLATE = "**Test Data for Student {n}:**\n{context}\n"
+_REPORT_MARKER = re.compile(r'^[ \t]*`?=== REPORT (\d+) ===`?[ \t]*$', re.MULTILINE)
+
+def estimate_tokens(text):
+    """Approximate token count of a prompt (CHARS_PER_TOKEN characters per token)."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+# What the instructions around the context add to every prompt
+_TEMPLATE_TOKENS = estimate_tokens(PROMPT_TEMPLATE.format(context=''))
+
+def _group_block(label, metrics):
+    return (
+        f"- **{label}**:\n"
+        f"  - Attempted: {metrics['attempted']}\n"
+        f"  - Correct: {metrics['correct']}\n"
+        f"  - Accuracy: {metrics['accuracy']:.2f}%\n"
+        f"  - Avg Time per Question: {metrics['avg_time']:.2f} sec\n"
+    )
+
+def _keep_extremes(groups, n):
+    """Indexes of the n weakest and n strongest groups (all of them if that covers every group)."""
+    if 2 * n >= len(groups):
+        return set(range(len(groups)))
+    ranked = sorted(range(len(groups)), key=lambda i: (groups[i][0], -groups[i][1]))
+    return set(ranked[:n] + ranked[-n:] if n else [])
+
+def _section(heading, noun, groups, kept):
+    """Heading plus the kept group blocks in their original order, with a note on what was left out."""
+    parts = [heading]
+    parts.extend(groups[i][2] for i in range(len(groups)) if i in kept)
+    omitted = [groups[i][0] for i in range(len(groups)) if i not in kept]
+    if omitted:
+        parts.append(
+            f"- {len(omitted)} other {noun} omitted for length "
+            f"(accuracy between {min(omitted):.2f}% and {max(omitted):.2f}%)\n"
+        )
+    return parts
+
+def build_context(processed_data, budget=None, stats=None):
+    """Render the test data section of the Gemini prompt for a student.
+
+    Every section is rendered once and joined at the end. When the estimated
+    size of the full prompt exceeds the token budget, the chapter and concept
+    sections keep only their N weakest and N strongest entries, with N as
+    large as still fits, and say how many were left out.
 
     Args:
         processed_data (dict): Processed data containing performance metrics.
+        budget (int, optional): Token budget; PROMPT_TOKEN_BUDGET by default, 0 for none.
+        stats (dict, optional): Filled with 'tokens' (estimated, for the full
+            prompt), 'chapters_omitted' and 'concepts_omitted'.
 
     Returns:
-        str: Markdown-formatted feedback.
+        str: The context text.
     """
-    # Prepare context
-    context = "### Test Performance Data\n\n"
-    
-    # Overall Performance
+    if budget is None:
+        budget = PROMPT_TOKEN_BUDGET
+
     overall = processed_data['overall']
-    context += "#### Overall Performance\n"
-    context += f"- Marks: {overall['marks_scored']} / {overall['total_marks']}\n"
-    context += f"- Questions Attempted: {overall['attempted']} / {overall['total_questions']}\n"
-    context += f"- Correct Answers: {overall['correct']} / {overall['attempted']}\n"
-    context += f"- Accuracy: {overall['accuracy']:.2f}%\n"
-    context += f"- Time Taken: {overall['time_taken']} sec / {overall['total_time']} sec\n\n"
-
-    # Subject-wise Performance
-    context += "#### Subject-wise Performance\n"
+    head = [
+        "### Test Performance Data\n\n",
+        "#### Overall Performance\n",
+        f"- Marks: {overall['marks_scored']} / {overall['total_marks']}\n",
+        f"- Questions Attempted: {overall['attempted']} / {overall['total_questions']}\n",
+        f"- Correct Answers: {overall['correct']} / {overall['attempted']}\n",
+        f"- Accuracy: {overall['accuracy']:.2f}%\n",
+        f"- Time Taken: {overall['time_taken']} sec / {overall['total_time']} sec\n\n",
+        "#### Subject-wise Performance\n"
+    ]
     for sub, metrics in processed_data['subjects'].items():
-        context += f"- **{sub}**:\n"
-        context += f"  - Marks: {metrics['marks_scored']} / {metrics['total_marks']}\n"
-        context += f"  - Attempted: {metrics['attempted']}\n"
-        context += f"  - Correct: {metrics['correct']}\n"
-        context += f"  - Accuracy: {metrics['accuracy']:.2f}%\n"
-        context += f"  - Time Taken: {metrics['time_taken']} sec\n"
-
-    # Chapter-wise Performance
-    context += "#### Chapter-wise Performance\n"
-    for (sub, chap), metrics in processed_data['chapter_metrics'].items():
-        context += f"- **{sub} - {chap}**:\n"
-        context += f"  - Attempted: {metrics['attempted']}\n"
-        context += f"  - Correct: {metrics['correct']}\n"
-        context += f"  - Accuracy: {metrics['accuracy']:.2f}%\n"
-        context += f"  - Avg Time per Question: {metrics['avg_time']:.2f} sec\n"
-
-    # Difficulty-wise Performance
-    context += "#### Difficulty-wise Performance\n"
-    for diff, metrics in processed_data['difficulty_metrics'].items():
-        context += f"- **{diff}**:\n"
-        context += f"  - Attempted: {metrics['attempted']}\n"
-        context += f"  - Correct: {metrics['correct']}\n"
-        context += f"  - Accuracy: {metrics['accuracy']:.2f}%\n"
-        context += f"  - Avg Time per Question: {metrics['avg_time']:.2f} sec\n"
-
-    # Concept-wise Performance
-    context += "#### Concept-wise Performance\n"
-    for (sub, concept), metrics in processed_data['concept_metrics'].items():
-        context += f"- **{sub} - {concept}**:\n"
-        context += f"  - Attempted: {metrics['attempted']}\n"
-        context += f"  - Correct: {metrics['correct']}\n"
-        context += f"  - Accuracy: {metrics['accuracy']:.2f}%\n"
-        context += f"  - Avg Time per Question: {metrics['avg_time']:.2f} sec\n"
-
-    # Time vs Accuracy Insights
-    context += "#### Time vs Accuracy Insights\n"
-    context += f"- Avg Time on Correct Answers: {processed_data['avg_time_correct']:.2f} sec\n"
-    context += f"- Avg Time on Incorrect Answers: {processed_data['avg_time_incorrect']:.2f} sec\n"
-
-    # LLM Prompt
-    prompt = f"""
-You are an expert academic coach tasked with generating a personalized feedback report for a student based on their test performance. Using the data below, create a report that includes:
-
-1. **Introduction**: A warm, motivating, and highly personalized message reflecting the student's specific performance (e.g., strengths in Physics, struggles in Mathematics). Avoid generic phrases.
-2. **Performance Breakdown**: Detailed insights at overall, subject, chapter, difficulty, and concept levels. Highlight key patterns (e.g., strong/weak areas).
-3. **Time vs Accuracy Insights**: Analyze how time management impacts performance, referencing specific metrics.
-4. **Actionable Suggestions**: Provide 2-3 specific, tailored suggestions for improvement based on the data.
+        head.append(
+            f"- **{sub}**:\n"
+            f"  - Marks: {metrics['marks_scored']} / {metrics['total_marks']}\n"
+            f"  - Attempted: {metrics['attempted']}\n"
+            f"  - Correct: {metrics['correct']}\n"
+            f"  - Accuracy: {metrics['accuracy']:.2f}%\n"
+            f"  - Time Taken: {metrics['time_taken']} sec\n"
+        )
+
+    # (accuracy, attempted, rendered block) per chapter and concept; these are what gets trimmed
+    chapter_keys = list(processed_data['chapter_metrics'])
+    chapters = [(m['accuracy'], m['attempted'], _group_block(f"{sub} - {chap}", m))
+                for (sub, chap), m in processed_data['chapter_metrics'].items()]
+    concepts = [(m['accuracy'], m['attempted'], _group_block(f"{sub} - {concept}", m))
+                for (sub, concept), m in processed_data['concept_metrics'].items()]
+
+    difficulty = ["#### Difficulty-wise Performance\n"]
+    difficulty.extend(_group_block(diff, m) for diff, m in processed_data['difficulty_metrics'].items())
+
+    tail = [
+        "#### Time vs Accuracy Insights\n",
+        f"- Avg Time on Correct Answers: {processed_data['avg_time_correct']:.2f} sec\n",
+        f"- Avg Time on Incorrect Answers: {processed_data['avg_time_incorrect']:.2f} sec\n"
+    ]
+
+    def assemble(n):
+        kept_chapters = _keep_extremes(chapters, n)
+        kept_concepts = _keep_extremes(concepts, n)
+        parts = list(head)
+        parts += _section("#### Chapter-wise Performance\n", 'chapters', chapters, kept_chapters)
+        parts += difficulty
+        parts += _section("#### Concept-wise Performance\n", 'concepts', concepts, kept_concepts)
+        parts += tail
+        parts += _standing(processed_data.get('percentiles'), {chapter_keys[i] for i in kept_chapters})
+        context = ''.join(parts)
+        return context, len(chapters) - len(kept_chapters), len(concepts) - len(kept_concepts)
+
+    def prompt_tokens(context):
+        return estimate_tokens(context) + _TEMPLATE_TOKENS
+
+    largest = max(len(chapters), len(concepts))
+    context, chapters_omitted, concepts_omitted = assemble(largest)
+    if budget and prompt_tokens(context) > budget:
+        # Largest N whose prompt fits; at N = 0 only the omission notes remain
+        low, high = 0, largest - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if prompt_tokens(assemble(mid)[0]) <= budget:
+                low = mid
+            else:
+                high = mid - 1
+        context, chapters_omitted, concepts_omitted = assemble(low)
+
+    if stats is not None:
+        stats.update(
+            tokens=prompt_tokens(context),
+            chapters_omitted=chapters_omitted,
+            concepts_omitted=concepts_omitted
+        )
+    return context
+
+def build_prompt(processed_data, budget=None, stats=None):
+    """Render the Gemini prompt for a student's processed data.
+
+    Args:
+        processed_data (dict): Processed data containing performance metrics.
+        budget (int, optional): Token budget for build_context().
+        stats (dict, optional): Filled by build_context().
+
+    Returns:
+        str: The full prompt text.
+    """
+    return PROMPT_TEMPLATE.format(context=build_context(processed_data, budget, stats))
+
+def _standing(percentiles, chapters):
+    """Standing among other students, when enough of them have been seen; only the given chapters are listed."""
+    if not percentiles:
+        return []
+    standing = []
+    if percentiles['overall']:
+        standing.append(f"- Overall Accuracy: ahead of {percentiles['overall']['percentile']:.0f}% of students\n")
+    for sub, position in percentiles['subjects'].items():
+        standing.append(f"- {sub} Accuracy: ahead of {position['percentile']:.0f}% of students\n")
+    for (sub, chap), position in percentiles['chapters'].items():
+        if (sub, chap) in chapters:
+            standing.append(f"- {sub} - {chap}: ahead of {position['percentile']:.0f}% of students\n")
+    for diff, position in percentiles['difficulty'].items():
+        standing.append(f"- {diff} Questions: ahead of {position['percentile']:.0f}% of students\n")
+    if not standing:
+        return []
+    return ["#### Standing Among Other Students\n"] + standing
+
+def _prepare_prompt(processed_data):
+    """Build the context and prompt and report their size to the metrics."""
+    stats = {}
+    context = build_context(processed_data, stats=stats)
+    truncated = stats['chapters_omitted'] or stats['concepts_omitted']
+    metrics.inc('prompts_built_total', truncated='yes' if truncated else 'no')
+    metrics.annotate(prompt_tokens=stats['tokens'], prompt_truncated=bool(truncated))
+    return context, PROMPT_TEMPLATE.format(context=context), stats
+
+def build_batch_prompt(contexts):
+    """One prompt asking for a report per context, each introduced by a `=== REPORT n ===` line."""
+    students = ''.join(BATCH_STUDENT_TEMPLATE.format(n=n, context=context) for n, context in enumerate(contexts, 1))
+    return BATCH_PROMPT_TEMPLATE.format(count=len(contexts), students=students)
+
+def split_batch_response(text, count):
+    """
+    Split a batched response back into per-student reports.
 
-Format your response in Markdown with clear headings and bullet points. Ensure the tone is encouraging, professional, and human-like, with specific references to the data.
+    The markers must run 1..count in order; a skipped, repeated or reordered
+    marker means a report may have swallowed its neighbour, so nothing is
+    trusted.
 
-**Test Data:**
-{context}
-"""
+    Returns:
+        list: `count` Markdown strings (None for an empty report), or None
+        when the response could not be split.
+    """
+    markers = list(_REPORT_MARKER.finditer(text))
+    if [int(marker.group(1)) for marker in markers] != list(range(1, count + 1)):
+        return None
+    ends = [marker.start() for marker in markers[1:]] + [len(text)]
+    return [text[marker.end():end].strip() or None for marker, end in zip(markers, ends)]
+
+def generate_feedback(processed_data):
+    """Generate personalized feedback using Gemini API.
+
+    Results are cached by a hash of the model name and rendered prompt, so an
+    identical attempt uploaded again is answered without calling Gemini.
+
+    Args:
+        processed_data (dict): Processed data containing performance metrics.
+
+    Returns:
+        str: Markdown-formatted feedback.
+
+    Raises:
+        FeedbackError: If Gemini fails, so the error never ends up in the report text.
+    """
+    _, prompt, stats = _prepare_prompt(processed_data)
+    key = content_key(MODEL_NAME, prompt)
+    if feedback_cache is not None:
+        cached = feedback_cache.get(key)
+        metrics.inc('feedback_cache_requests_total', result='miss' if cached is None else 'hit')
+        if cached is not None:
+            return cached
+
+    metrics.inc('prompt_tokens_total', stats['tokens'])
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        response = get_model().generate_content(prompt)
+        feedback = response.text
     except Exception as e:
-        return f"Error generating feedback: {str(e)}"
\ No newline at end of file
+        raise FeedbackError(f"Error generating feedback: {str(e)}") from e
+
+    if feedback_cache is not None:
+        feedback_cache.set(key, feedback)
+    return feedback
+
+async def generate_feedback_async(processed_data, client):
+    """Asynchronous generate_feedback using an AsyncFeedbackClient, sharing the same cache.
+
+    Args:
+        processed_data (dict): Processed data containing performance metrics.
+        client (AsyncFeedbackClient): Client that applies concurrency, rate limits and retries.
+
+    Returns:
+        str: Markdown-formatted feedback.
+
+    Raises:
+        FeedbackError: If Gemini fails after all retries.
+    """
+    _, prompt, stats = _prepare_prompt(processed_data)
+    key = content_key(MODEL_NAME, prompt)
+    if feedback_cache is not None:
+        cached = feedback_cache.get(key)
+        metrics.inc('feedback_cache_requests_total', result='miss' if cached is None else 'hit')
+        if cached is not None:
+            return cached
+
+    metrics.inc('prompt_tokens_total', stats['tokens'])
+    feedback = await client.generate(prompt)
+
+    if feedback_cache is not None:
+        feedback_cache.set(key, feedback)
+    return feedback
+
+# Students packed into one Gemini request in batch runs (1 = one request per student)
+FEEDBACK_BATCH_SIZE = int(os.getenv('FEEDBACK_BATCH_SIZE', '1'))
+# Seconds a partly filled batch waits for more students before it is sent anyway
+FEEDBACK_BATCH_WAIT = float(os.getenv('FEEDBACK_BATCH_WAIT', '0.5'))
+
+class FeedbackBatcher:
+    """
+    Packs several students' feedback requests into one Gemini call.
+
+    Requests that miss the feedback cache are queued; once batch_size are
+    waiting (or max_wait seconds after the first one) their contexts are sent
+    as one prompt and the response is split on its `=== REPORT n ===`
+    markers. Students whose report cannot be found in the response, or whose
+    batch call failed, are retried with ordinary single-student calls. Each
+    report is cached under its single-student prompt, so the cache is shared
+    with generate_feedback(). Must be used from the client's event loop.
+
+    Args:
+        client (AsyncFeedbackClient): Client that applies concurrency, rate limits and retries.
+        batch_size (int): Students per request; FEEDBACK_BATCH_SIZE by default.
+        max_wait (float): Seconds to wait for a batch to fill; FEEDBACK_BATCH_WAIT by default.
+    """
+
+    def __init__(self, client, batch_size=None, max_wait=None):
+        self.client = client
+        self.batch_size = batch_size or FEEDBACK_BATCH_SIZE
+        self.max_wait = max_wait if max_wait is not None else FEEDBACK_BATCH_WAIT
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def generate(self, processed_data):
+        """Feedback for one student; resolves when that student's batch has been answered."""
+        if self.batch_size <= 1:
+            return await generate_feedback_async(processed_data, self.client)
+
+        context, prompt, _ = _prepare_prompt(processed_data)
+        key = content_key(MODEL_NAME, prompt)
+        if feedback_cache is not None:
+            cached = feedback_cache.get(key)
+            metrics.inc('feedback_cache_requests_total', result='miss' if cached is None else 'hit')
+            if cached is not None:
+                return cached
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((context, prompt, key, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        try:
+            reports = [None] * len(batch)
+            if len(batch) > 1:
+                batch_prompt = build_batch_prompt([context for context, _, _, _ in batch])
+                metrics.inc('prompt_tokens_total', estimate_tokens(batch_prompt))
+                try:
+                    reports = split_batch_response(await self.client.generate(batch_prompt), len(batch)) or reports
+                except FeedbackError:
+                    pass
+                metrics.inc('feedback_batches_total', result='split' if all(reports) else 'fallback')
+
+            # Anything the batch did not answer goes out as ordinary single-student calls
+            missing = [i for i, report in enumerate(reports) if report is None]
+            for i in missing:
+                metrics.inc('prompt_tokens_total', estimate_tokens(batch[i][1]))
+            singles = await asyncio.gather(*(self.client.generate(batch[i][1]) for i in missing), return_exceptions=True)
+            for i, result in zip(missing, singles):
+                reports[i] = result
+
+            for (_, _, key, future), report in zip(batch, reports):
+                if future.done():
+                    continue
+                if isinstance(report, BaseException):
+                    future.set_exception(report)
+                    continue
+                if feedback_cache is not None:
+                    feedback_cache.set(key, report)
+                future.set_result(report)
+        except BaseException as e:
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            raise
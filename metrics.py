@@ -0,0 +1,205 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# METRICS_ENABLED=0 turns every call below into a cheap no-op
+ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+# METRICS_LOG=1 writes one structured JSON log line per generated report
+LOG_REPORTS = os.getenv('METRICS_LOG', '0') == '1'
+
+logger = logging.getLogger(__name__)
+if LOG_REPORTS:
+    # Nothing else configures logging, and the default last-resort handler drops INFO records.
+    # Report lines and the chart timings (logged on 'metrics.charts') go to stderr as-is.
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# name -> (type, help text) for the Prometheus exposition
+METRICS = {
+    'uploads_total': ('counter', "Report uploads accepted"),
+    'uploads_rejected_total': ('counter', "Uploads rejected before processing"),
+    'upload_bytes_total': ('counter', "Bytes received in accepted uploads"),
+    'reports_generated_total': ('counter', "Reports generated successfully"),
+    'report_failures_total': ('counter', "Report jobs that failed"),
+    'report_bytes_written_total': ('counter', "Bytes of PDF output written"),
+    'feedback_cache_requests_total': ('counter', "LLM feedback cache lookups by result"),
+    'chart_cache_requests_total': ('counter', "Rendered chart cache lookups by result"),
+    'prompts_built_total': ('counter', "LLM prompts built, by whether the token budget trimmed them"),
+    'prompt_tokens_total': ('counter', "Estimated prompt tokens sent to the LLM"),
+    'feedback_batches_total': ('counter', "Multi-student LLM requests, by whether the response split cleanly"),
+    'report_pool_busy_total': ('counter', "Reports turned away because the report worker queue was full"),
+    'report_stage_failures_total': ('counter', "Pipeline stages that raised an error"),
+    'report_stage_seconds': ('histogram', "Time spent in each report pipeline stage"),
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+# Per-report trace; a context variable so interleaved asyncio jobs each keep their own
+_trace = contextvars.ContextVar('metrics_trace', default=None)
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, value=1, **labels):
+    """Increment a counter."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, value, **labels):
+    """Record a histogram observation."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * len(STAGE_BUCKETS), 0.0, 0]
+        for i, bound in enumerate(STAGE_BUCKETS):
+            if value <= bound:
+                hist[0][i] += 1
+        hist[1] += value
+        hist[2] += 1
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL = _NullContext()
+
+class _Stage:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        observe('report_stage_seconds', elapsed, stage=self.name)
+        if exc_type is not None:
+            inc('report_stage_failures_total', stage=self.name)
+        trace = _trace.get()
+        if trace is not None:
+            trace['stages'][self.name] = round(trace['stages'].get(self.name, 0) + elapsed, 6)
+        return False
+
+def stage(name):
+    """Context manager timing one pipeline stage into report_stage_seconds{stage=name}."""
+    if not ENABLED:
+        return _NULL
+    return _Stage(name)
+
+class _Trace:
+    def __init__(self, fields):
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = _trace.set({'stages': {}, 'fields': {}})
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        trace = _trace.get()
+        _trace.reset(self._token)
+        record = dict(self.fields)
+        record.update(trace['fields'])
+        record.update(
+            event='report',
+            status='failed' if exc_type is not None else 'done',
+            seconds=round(time.perf_counter() - self.start, 6),
+            stages=trace['stages']
+        )
+        if exc_type is not None:
+            record['error'] = str(exc)
+        logger.info(json.dumps(record))
+        return False
+
+def trace(**fields):
+    """
+    Collect the stage timings of one report and log them as a JSON line on exit.
+
+    Only active when METRICS_LOG=1; the fields (e.g. report_id) are added to the record.
+    """
+    if not (ENABLED and LOG_REPORTS):
+        return _NULL
+    return _Trace(fields)
+
+def annotate(**fields):
+    """Add fields (e.g. prompt_tokens) to the JSON record of the report being traced, if any."""
+    trace = _trace.get()
+    if trace is not None:
+        trace['fields'].update(fields)
+
+def drain():
+    """Return and reset this process's metrics, for shipping from pool workers to the web process."""
+    global _counters, _histograms
+    with _lock:
+        snapshot = {'counters': _counters, 'histograms': _histograms}
+        _counters, _histograms = {}, {}
+    return snapshot
+
+def merge(snapshot):
+    """Add metrics drained from another process into this one."""
+    if not ENABLED or not snapshot:
+        return
+    with _lock:
+        for key, value in snapshot['counters'].items():
+            _counters[key] = _counters.get(key, 0) + value
+        for key, (buckets, total, count) in snapshot['histograms'].items():
+            hist = _histograms.get(key)
+            if hist is None:
+                hist = _histograms[key] = [[0] * len(STAGE_BUCKETS), 0.0, 0]
+            hist[0] = [a + b for a, b in zip(hist[0], buckets)]
+            hist[1] += total
+            hist[2] += count
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+def render():
+    """Render all metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (list(h[0]), h[1], h[2]) for key, h in _histograms.items()}
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        else:
+            for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(STAGE_BUCKETS, buckets):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {bucket_count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
@@ -1,10 +1,225 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Image, Spacer, PageBreak
-from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
+import functools
 import os
-import markdown
+import re
+import threading
+
+# Bump when the PDF layout or styles change, so stored PDFs are re-rendered
+PDF_LAYOUT_VERSION = '1'
+
+# Styles and ReportLab settings are built once per process by _engine()
+_engine_state = None
+_engine_lock = threading.Lock()
+
+def _engine():
+    """
+    Import ReportLab and build the shared styles on first use.
+
+    Returns a dict of the ReportLab pieces generate_pdf needs. Styles are only
+    read during a build, so one set is shared by every report and thread.
+    """
+    global _engine_state
+    with _engine_lock:
+        if _engine_state is None:
+            # Imported here so workers that never build a PDF don't pay for ReportLab at start-up
+            from reportlab import rl_config
+            from reportlab.lib.pagesizes import letter
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.lib.units import inch
+
+            # ReportLab's ASCII85 encoder is pure Python and was most of the build
+            # time for chart images; binary streams are also smaller
+            rl_config.useA85 = 0
+
+            # Define custom styles
+            styles = getSampleStyleSheet()
+            styles.add(ParagraphStyle(
+                name='CenteredTitle',
+                parent=styles['Title'],
+                alignment=1,  # Center alignment
+                fontSize=16,  # Reduced font size
+                spaceAfter=0.3*inch  # Reduced spacing
+            ))
+            styles.add(ParagraphStyle(
+                name='BodyTextIndented',
+                parent=styles['BodyText'],
+                leftIndent=0.25*inch,
+                fontSize=10,  # Reduced font size for compact text
+                spaceAfter=0.1*inch,  # Tighter spacing
+                spaceBefore=0.05*inch  # Minimal space before
+            ))
+            styles.add(ParagraphStyle(
+                name='SectionHeading',
+                parent=styles['Heading2'],
+                fontSize=12,  # Smaller heading size
+                spaceAfter=0.15*inch,  # Reduced spacing
+                spaceBefore=0.2*inch
+            ))
+            styles.add(ParagraphStyle(
+                name='SubHeading',
+                parent=styles['Heading3'],
+                fontSize=10.5,
+                spaceAfter=0.08*inch,
+                spaceBefore=0.12*inch
+            ))
+            styles.add(ParagraphStyle(
+                name='BulletIndented',
+                parent=styles['BodyTextIndented'],
+                leftIndent=0.5*inch,
+                bulletIndent=0.3*inch,
+                spaceAfter=0.04*inch,
+                spaceBefore=0
+            ))
+
+            _engine_state = {
+                'pagesize': letter,
+                'inch': inch,
+                'styles': styles
+            }
+    return _engine_state
+
+def _add_page_numbers(canvas, doc):
+    page_num = canvas.getPageNumber()
+    text = f"Page {page_num}"
+    canvas.setFont("Helvetica", 9)
+    canvas.drawRightString(doc.width + doc.leftMargin, 0.5 * _engine()['inch'], text)
+
+def _cover(styles, inch):
+    """Title block opening every report."""
+    from reportlab.platypus import Paragraph, Spacer
+    return [
+        Paragraph("Student Performance Feedback Report", styles['CenteredTitle']),
+        Spacer(1, 0.3 * inch)  # Reduced spacer
+    ]
+
+# Sections after which a page break keeps each on its own page
+PAGE_BREAK_SECTIONS = {
+    'introduction and performance breakdown',
+    'subject-wise, chapter-wise, difficulty-wise, and concept-wise performance',
+    'time vs. accuracy insights and actionable suggestions'
+}
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_BULLET = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+_RULE = re.compile(r'^\s*([-*_])(\s*\1){2,}\s*$')
+_CODE = re.compile(r'`([^`]+)`')
+# Strongest first, so ***x*** nests as <b><i>x</i></b> instead of crossing tags. Underscore
+# runs must not touch a word character, and __word__ (e.g. __init__) is left as written.
+_EMPHASIS = (
+    (re.compile(r'(?<![\w*])\*\*\*(?!\s)(.+?)(?<!\s)\*\*\*(?![\w*])|(?<!\w)___(?!\s)(.+?)(?<!\s)___(?!\w)'), 'b', 'i'),
+    (re.compile(r'\*\*(?!\s)(.+?)(?<!\s)\*\*|(?<!\w)__(?!\s)(?!\w+__(?!\w))(.+?)(?<!\s)__(?!\w)'), 'b'),
+    (re.compile(r'(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])|(?<!\w)_(?![\s_])(.+?)(?<![\s_])_(?!\w)'), 'i'),
+)
+
+def _tagged(tags):
+    opening = ''.join(f'<{tag}>' for tag in tags)
+    closing = ''.join(f'</{tag}>' for tag in reversed(tags))
+    return lambda m: f"{opening}{m.group(1) or m.group(2)}{closing}"
+
+_EMPHASIS = tuple((pattern, _tagged(tags)) for pattern, *tags in _EMPHASIS)
+
+def _inline(text):
+    """Escape text for a ReportLab Paragraph and turn bold, italic and code spans into its markup."""
+    text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    # Code spans are set aside first so emphasis markers inside them stay literal
+    code = []
+
+    def stash(match):
+        code.append(f'<font face="Courier">{match.group(1)}</font>')
+        return f'\x00{len(code) - 1}\x00'
+
+    text = _CODE.sub(stash, text)
+    for pattern, replacement in _EMPHASIS:
+        text = pattern.sub(replacement, text)
+    return re.sub(r'\x00(\d+)\x00', lambda m: code[int(m.group(1))], text) if code else text
+
+def _paragraph(markup, style, **kwargs):
+    """Paragraph for converted markup; falls back to plain text if odd Markdown produced tags ReportLab rejects."""
+    from reportlab.platypus import Paragraph
+    try:
+        return Paragraph(markup, style, **kwargs)
+    except ValueError:
+        return Paragraph(re.sub(r'<[^>]+>', '', markup), style, **kwargs)
+
+def _section_key(title):
+    return re.sub(r'<[^>]+>|[*_`#]', '', title).strip().lower()
+
+@functools.lru_cache(maxsize=256)
+def parse_feedback(feedback):
+    """
+    Parse Markdown feedback into a tuple of tokens in a single pass over its lines.
+
+    Tokens are ('heading', level, markup), ('paragraph', markup) and
+    ('bullet', depth, marker, markup), with inline bold, italic and code already
+    converted to ReportLab paragraph markup. Results are cached by text, so
+    feedback served from the LLM cache is only parsed once per process.
+    """
+    tokens = []
+    paragraph = []
+
+    def flush():
+        if paragraph:
+            tokens.append(('paragraph', _inline(' '.join(paragraph))))
+            paragraph.clear()
+
+    for line in feedback.splitlines():
+        stripped = line.strip()
+        if not stripped or _RULE.match(line):
+            flush()
+            continue
+        heading = _HEADING.match(stripped)
+        if heading:
+            flush()
+            tokens.append(('heading', len(heading.group(1)), _inline(heading.group(2))))
+            continue
+        bullet = _BULLET.match(line)
+        if bullet:
+            flush()
+            indent = len(bullet.group(1).expandtabs(4))
+            marker = bullet.group(2)
+            tokens.append(('bullet', indent // 2, marker if marker[0].isdigit() else None, _inline(bullet.group(3))))
+            continue
+        if tokens and tokens[-1][0] == 'bullet' and not paragraph and line[:1].isspace():
+            # Indented continuation of the previous list item
+            kind, depth, marker, markup = tokens[-1]
+            tokens[-1] = (kind, depth, marker, f"{markup} {_inline(stripped)}")
+            continue
+        paragraph.append(stripped)
+    flush()
+    return tuple(tokens)
+
+def _feedback_flowables(tokens, styles):
+    """Build fresh ReportLab flowables for parsed feedback tokens."""
+    from reportlab.platypus import PageBreak
+    from reportlab.lib.styles import ParagraphStyle
+
+    flowables = []
+    nested_styles = {}
+    break_after_section = False
+    for token in tokens:
+        if token[0] == 'heading':
+            _, level, markup = token
+            if level <= 2:
+                if break_after_section:
+                    flowables.append(PageBreak())
+                break_after_section = _section_key(markup) in PAGE_BREAK_SECTIONS
+                flowables.append(_paragraph(markup, styles['SectionHeading']))
+            else:
+                flowables.append(_paragraph(markup, styles['SubHeading']))
+        elif token[0] == 'bullet':
+            _, depth, marker, markup = token
+            style = styles['BulletIndented']
+            if depth:
+                if depth not in nested_styles:
+                    nested_styles[depth] = ParagraphStyle(
+                        f'BulletIndented{depth}', parent=style,
+                        leftIndent=style.leftIndent + depth * 18, bulletIndent=style.bulletIndent + depth * 18
+                    )
+                style = nested_styles[depth]
+            flowables.append(_paragraph(markup, style, bulletText=marker or ('\u2022' if not depth else '\u2013')))
+        else:
+            flowables.append(_paragraph(token[1], styles['BodyTextIndented']))
+    # The last section needs no break of its own: every chart starts on a new page
+    return flowables
 
 def generate_pdf(feedback, chart_paths, output_path='student_feedback_report.pdf'):
     """
@@ -13,101 +228,35 @@ def generate_pdf(feedback, chart_paths, output_path='student_feedback_report.pdf
 
     Args:
         feedback (str): Markdown-formatted feedback text.
-        chart_paths (dict): Dictionary of chart names to their file paths.
-        output_path (str): Path to save the generated PDF.
+        chart_paths (dict): Dictionary of chart names to image file paths, file-like PNG buffers
+            or ReportLab Drawings.
+        output_path (str or file): Path to save the generated PDF, or a binary file object
+            (e.g. io.BytesIO) to write it to without touching disk.
 
     Returns:
-        str: Path to the generated PDF.
+        str or file: output_path.
     """
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Image, Spacer, PageBreak, Flowable
+
+    engine = _engine()
+    styles = engine['styles']
+    inch = engine['inch']
+
     # Initialize the document
     doc = SimpleDocTemplate(
         output_path,
-        pagesize=letter,
+        pagesize=engine['pagesize'],
         leftMargin=0.75*inch,
         rightMargin=0.75*inch,
         topMargin=0.75*inch,
         bottomMargin=0.75*inch
     )
-    
-    # Define custom styles
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(
-        name='CenteredTitle',
-        parent=styles['Title'],
-        alignment=1,  # Center alignment
-        fontSize=16,  # Reduced font size
-        spaceAfter=0.3*inch  # Reduced spacing
-    ))
-    styles.add(ParagraphStyle(
-        name='BodyTextIndented',
-        parent=styles['BodyText'],
-        leftIndent=0.25*inch,
-        fontSize=10,  # Reduced font size for compact text
-        spaceAfter=0.1*inch,  # Tighter spacing
-        spaceBefore=0.05*inch  # Minimal space before
-    ))
-    styles.add(ParagraphStyle(
-        name='SectionHeading',
-        parent=styles['Heading2'],
-        fontSize=12,  # Smaller heading size
-        spaceAfter=0.15*inch,  # Reduced spacing
-        spaceBefore=0.2*inch
-    ))
-
-    story = []
-
-    # Add a title
-    title = Paragraph("Student Performance Feedback Report", styles['CenteredTitle'])
-    story.append(title)
-    story.append(Spacer(1, 0.3 * inch))  # Reduced spacer
-
-    # Convert Markdown feedback to plain text
-    feedback_html = markdown.markdown(feedback)  # Convert Markdown to HTML
-    feedback_text = ''.join(feedback_html.replace('<p>', '').replace('</p>', '\n')
-                           .replace('<strong>', '').replace('</strong>', '')
-                           .replace('<em>', '').replace('</em>', '')
-                           .replace('<br>', '\n'))
-    
-    # Split feedback into sections based on headings (assumes Markdown headings like ##)
-    sections = feedback_text.split('\n## ')
-    section_titles = ['Introduction and Performance Breakdown', 
-                     'Subject-wise, Chapter-wise, Difficulty-wise, and Concept-wise Performance', 
-                     'Time vs. Accuracy Insights and Actionable Suggestions']
-
-    # Process each section
-    for i, section in enumerate(sections):
-        if section.strip():
-            # Extract section title and content
-            section_lines = section.strip().split('\n', 1)
-            section_title = section_lines[0].replace('## ', '').strip()
-            section_content = section_lines[1].strip() if len(section_lines) > 1 else ''
-            
-            # Check if section matches one of the specified sections
-            if section_title in section_titles:
-                # Add section heading
-                heading = Paragraph(section_title, styles['SectionHeading'])
-                story.append(heading)
-                
-                # Split content into paragraphs
-                paragraphs = section_content.split('\n')
-                for para in paragraphs:
-                    if para.strip():  # Skip empty lines
-                        p = Paragraph(para, styles['BodyTextIndented'])
-                        story.append(p)
-                        story.append(Spacer(1, 0.05 * inch))  # Tighter spacer
-                
-                # Add page break after each specified section to ensure single-page layout
-                story.append(PageBreak())
-            else:
-                # Handle other sections with minimal spacing
-                heading = Paragraph(section_title, styles['SectionHeading'])
-                story.append(heading)
-                paragraphs = section_content.split('\n')
-                for para in paragraphs:
-                    if para.strip():
-                        p = Paragraph(para, styles['BodyTextIndented'])
-                        story.append(p)
-                        story.append(Spacer(1, 0.05 * inch))
+
+    # Flowables keep layout state while a document is built, so each report gets its own
+    story = _cover(styles, inch)
+
+    # Feedback sections become headings, paragraphs and bullet lists in one pass
+    story.extend(_feedback_flowables(parse_feedback(feedback), styles))
 
     # Add chart images, each on a new page (unchanged)
     for chart_name, chart_path in chart_paths.items():
@@ -115,23 +264,20 @@ def generate_pdf(feedback, chart_paths, output_path='student_feedback_report.pdf
         chart_title = Paragraph(chart_name, styles['Heading2'])
         story.append(chart_title)
         story.append(Spacer(1, 0.3 * inch))
-        img = Image(chart_path, width=6*inch, height=4*inch)
-        story.append(img)
+        if isinstance(chart_path, Flowable):
+            # Vector drawings from the reportlab chart backend are already 6x4 inches
+            story.append(chart_path)
+        else:
+            img = Image(chart_path, width=6*inch, height=4*inch)
+            story.append(img)
         story.append(Spacer(1, 0.5 * inch))
 
-    # Define page numbering
-    def add_page_numbers(canvas, doc):
-        page_num = canvas.getPageNumber()
-        text = f"Page {page_num}"
-        canvas.setFont("Helvetica", 9)
-        canvas.drawRightString(doc.width + doc.leftMargin, 0.5 * inch, text)
-
     # Build the PDF with page numbering
-    doc.build(story, onFirstPage=add_page_numbers, onLaterPages=add_page_numbers)
+    doc.build(story, onFirstPage=_add_page_numbers, onLaterPages=_add_page_numbers)
 
-    # Clean up temporary chart images
+    # Clean up temporary chart images written to disk; in-memory buffers need no cleanup
     for path in chart_paths.values():
-        if os.path.exists(path):
+        if isinstance(path, str) and os.path.exists(path):
             os.remove(path)
 
     return output_path
\ No newline at end of file
@@ -0,0 +1,281 @@
+import json
+import math
+import os
+import random
+import sqlite3
+import time
+
+class KLLSketch:
+    """
+    KLL streaming quantile sketch.
+
+    Values are kept in a stack of compactors. When a level fills up it is
+    sorted and every other item is promoted to the next level with double the
+    weight, so memory stays around O(k log(n/k)) items, updates are amortized
+    O(log n), and ranks are accurate to roughly 1.7/k of n. Sketches built
+    separately can be merged, and they round-trip through to_dict()/from_dict().
+
+    Args:
+        k (int): Accuracy parameter; larger keeps more items.
+    """
+
+    c = 2 / 3
+
+    def __init__(self, k=200):
+        self.k = k
+        self.n = 0
+        self.compactors = [[]]
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * self.c ** depth)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _compress(self):
+        for level, items in enumerate(self.compactors):
+            if len(items) >= self._capacity(level):
+                if level + 1 >= len(self.compactors):
+                    self._grow()
+                items.sort()
+                # An odd item out stays at this level so no weight is lost
+                kept = [items.pop()] if len(items) % 2 else []
+                # A random offset keeps the promoted half unbiased
+                self.compactors[level + 1].extend(items[random.getrandbits(1)::2])
+                self.compactors[level] = kept
+                self._size = sum(len(c) for c in self.compactors)
+                if self._size < self._max_size:
+                    break
+
+    def update(self, value):
+        """Add one value."""
+        self.compactors[0].append(value)
+        self.n += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other):
+        """Fold another sketch's values into this one."""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self._size = sum(len(c) for c in self.compactors)
+        while self._size >= self._max_size:
+            self._compress()
+
+    def rank(self, value):
+        """
+        Approximate fraction of values below `value`, counting ties as half.
+
+        Returns:
+            float or None: A value in [0, 1], or None for an empty sketch.
+        """
+        if not self.n:
+            return None
+        below = equal = 0
+        for level, items in enumerate(self.compactors):
+            weight = 1 << level
+            for item in items:
+                if item < value:
+                    below += weight
+                elif item == value:
+                    equal += weight
+        total = sum(len(items) << level for level, items in enumerate(self.compactors))
+        return (below + 0.5 * equal) / total
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0-1), or None for an empty sketch."""
+        if not self.n:
+            return None
+        weighted = sorted((item, 1 << level) for level, items in enumerate(self.compactors) for item in items)
+        target = q * sum(weight for _, weight in weighted)
+        cumulative = 0
+        for item, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return item
+        return weighted[-1][0]
+
+    def to_dict(self):
+        return {'k': self.k, 'n': self.n, 'compactors': self.compactors}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['k'])
+        sketch.n = data['n']
+        sketch.compactors = [list(items) for items in data['compactors']]
+        sketch._size = sum(len(c) for c in sketch.compactors)
+        sketch._max_size = sum(sketch._capacity(level) for level in range(len(sketch.compactors)))
+        return sketch
+
+def _accuracy_values(processed_data):
+    """Yield (group, key, accuracy) for every subject, chapter and difficulty plus the overall score."""
+    yield 'overall', 'overall', processed_data['overall']['accuracy']
+    for subject, m in processed_data['subjects'].items():
+        yield 'subjects', subject, m['accuracy']
+    for key, m in processed_data['chapter_metrics'].items():
+        yield 'chapters', key, m['accuracy']
+    for difficulty, m in processed_data['difficulty_metrics'].items():
+        yield 'difficulty', difficulty, m['accuracy']
+
+def _sketch_key(group, key):
+    return json.dumps([group, list(key) if isinstance(key, tuple) else key])
+
+class SketchStore:
+    """
+    Accuracy sketches per subject, chapter and difficulty, persisted in SQLite.
+
+    Each row holds one serialized KLLSketch, so memory per group is bounded no
+    matter how many students have been seen, and concurrent workers update the
+    same file under SQLite's write lock. Students observed under an id are
+    remembered, so an attempt that is processed again is not counted twice.
+
+    Args:
+        db_path (str): Path to the SQLite database.
+        k (int): Accuracy parameter of new sketches.
+        min_students (int): Students a group needs before percentiles are reported.
+    """
+
+    def __init__(self, db_path='sketches.db', k=200, min_students=10):
+        self.db_path = db_path
+        self.k = k
+        self.min_students = min_students
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sketches ("
+                "key TEXT PRIMARY KEY, n INTEGER NOT NULL, sketch TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS students (id TEXT PRIMARY KEY, added_at REAL NOT NULL)")
+        conn.close()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Store configured by SKETCH_DB_PATH (default sketches.db; empty disables it),
+        SKETCH_K and SKETCH_MIN_STUDENTS. Returns None when disabled.
+        """
+        db_path = os.getenv('SKETCH_DB_PATH', 'sketches.db')
+        if not db_path:
+            return None
+        return cls(
+            db_path,
+            k=int(os.getenv('SKETCH_K', '200')),
+            min_students=int(os.getenv('SKETCH_MIN_STUDENTS', '10'))
+        )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _load(self, conn, keys):
+        sketches = {}
+        for key in keys:
+            row = conn.execute("SELECT sketch FROM sketches WHERE key = ?", (key,)).fetchone()
+            sketches[key] = KLLSketch.from_dict(json.loads(row[0])) if row else KLLSketch(self.k)
+        return sketches
+
+    def _save(self, conn, sketches):
+        now = time.time()
+        conn.executemany(
+            "INSERT OR REPLACE INTO sketches (key, n, sketch, updated_at) VALUES (?, ?, ?, ?)",
+            [(key, sketch.n, json.dumps(sketch.to_dict()), now) for key, sketch in sketches.items()]
+        )
+
+    def _positions(self, values, sketches):
+        positions = {'overall': None, 'subjects': {}, 'chapters': {}, 'difficulty': {}}
+        for group, key, accuracy in values:
+            sketch = sketches[_sketch_key(group, key)]
+            if sketch.n < self.min_students:
+                position = None
+            else:
+                position = {'percentile': 100 * sketch.rank(accuracy), 'students': sketch.n}
+            if group == 'overall':
+                positions['overall'] = position
+            elif position is not None:
+                positions[group][key] = position
+        return positions
+
+    def percentiles(self, processed_data):
+        """
+        Where a student's accuracies fall among the students seen so far.
+
+        Returns:
+            dict: {'overall', 'subjects', 'chapters', 'difficulty'}, keyed like
+            processed_data, with {'percentile', 'students'} per group. Groups with
+            fewer than min_students students are left out ('overall' is None).
+        """
+        values = list(_accuracy_values(processed_data))
+        conn = self._connect()
+        try:
+            sketches = self._load(conn, {_sketch_key(group, key) for group, key, _ in values})
+        finally:
+            conn.close()
+        return self._positions(values, sketches)
+
+    def observe(self, processed_data, student_id=None):
+        """
+        Rank a student against the existing cohort, then add their accuracies.
+
+        Args:
+            processed_data (dict): Output of process_data().
+            student_id (str, optional): Identifies the attempt (cohort_index.attempt_key).
+                A student already observed under this id is only ranked, not added again.
+
+        Returns:
+            dict: The percentiles() result from before this student was added.
+        """
+        values = list(_accuracy_values(processed_data))
+        conn = self._connect()
+        try:
+            # Read-modify-write of the sketch rows under one write lock
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                sketches = self._load(conn, {_sketch_key(group, key) for group, key, _ in values})
+                positions = self._positions(values, sketches)
+                new = student_id is None or conn.execute(
+                    "INSERT OR IGNORE INTO students (id, added_at) VALUES (?, ?)", (student_id, time.time())
+                ).rowcount == 1
+                if new:
+                    for group, key, accuracy in values:
+                        sketches[_sketch_key(group, key)].update(accuracy)
+                    self._save(conn, sketches)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return positions
+
+    def merge(self, other):
+        """Fold every sketch of another SketchStore (e.g. from a separate batch run) into this one."""
+        source = other._connect()
+        try:
+            rows = source.execute("SELECT key, sketch FROM sketches").fetchall()
+            students = source.execute("SELECT id, added_at FROM students").fetchall()
+        finally:
+            source.close()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                sketches = self._load(conn, [key for key, _ in rows])
+                for key, data in rows:
+                    sketches[key].merge(KLLSketch.from_dict(json.loads(data)))
+                self._save(conn, sketches)
+                conn.executemany("INSERT OR IGNORE INTO students (id, added_at) VALUES (?, ?)", students)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
@@ -0,0 +1,158 @@
+from array import array
+from collections.abc import Sequence
+
+class QuestionStore(Sequence):
+    """
+    Compact, column-oriented store for per-question records.
+
+    Subject, chapter, difficulty and concept names are interned to integer
+    codes, and the remaining fields live in parallel typed arrays, so a
+    question costs a few dozen bytes instead of a dict, a concepts list and
+    their keys. Indexing and iteration return plain dicts with the keys
+    process_data always produced ('subject', 'chapter', 'difficulty',
+    'concepts', 'attempted', 'correct', 'time_taken'), so existing callers keep
+    working. columns() and to_frame() expose the arrays to NumPy and pandas
+    without copying them.
+    """
+
+    __slots__ = (
+        'subjects', 'chapters', 'difficulties', 'concepts', '_codes',
+        'subject_codes', 'chapter_codes', 'difficulty_codes', 'concept_offsets', 'concept_codes',
+        'attempted', 'correct', 'time_taken'
+    )
+
+    def __init__(self):
+        # Interned names; a code is an index into these lists
+        self.subjects = []
+        self.chapters = []
+        self.difficulties = []
+        self.concepts = []
+        self._codes = ({}, {}, {}, {})
+        self.subject_codes = array('I')
+        self.chapter_codes = array('I')
+        self.difficulty_codes = array('I')
+        # Question i's concepts are concept_codes[concept_offsets[i]:concept_offsets[i + 1]]
+        self.concept_offsets = array('I', [0])
+        self.concept_codes = array('I')
+        self.attempted = array('B')
+        self.correct = array('B')
+        self.time_taken = array('d')
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != '_codes'}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._codes = tuple(
+            {name: code for code, name in enumerate(names)}
+            for names in (self.subjects, self.chapters, self.difficulties, self.concepts)
+        )
+
+    def _intern(self, kind, names, name):
+        codes = self._codes[kind]
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def append(self, subject, chapter, difficulty, concepts, attempted, correct, time_taken):
+        """Add one question and return its index."""
+        self.subject_codes.append(self._intern(0, self.subjects, subject))
+        self.chapter_codes.append(self._intern(1, self.chapters, chapter))
+        self.difficulty_codes.append(self._intern(2, self.difficulties, difficulty))
+        for concept in concepts:
+            self.concept_codes.append(self._intern(3, self.concepts, concept))
+        self.concept_offsets.append(len(self.concept_codes))
+        self.attempted.append(1 if attempted else 0)
+        self.correct.append(1 if correct else 0)
+        self.time_taken.append(time_taken or 0)
+        return len(self.time_taken) - 1
+
+    def __len__(self):
+        return len(self.time_taken)
+
+    def _record(self, i):
+        concept_codes = self.concept_codes[self.concept_offsets[i]:self.concept_offsets[i + 1]]
+        return {
+            'subject': self.subjects[self.subject_codes[i]],
+            'chapter': self.chapters[self.chapter_codes[i]],
+            'difficulty': self.difficulties[self.difficulty_codes[i]],
+            'concepts': [self.concepts[code] for code in concept_codes],
+            'attempted': bool(self.attempted[i]),
+            'correct': bool(self.correct[i]),
+            'time_taken': self.time_taken[i]
+        }
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('question index out of range')
+        return self._record(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._record(i)
+
+    def __eq__(self, other):
+        if isinstance(other, (QuestionStore, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def columns(self):
+        """
+        NumPy views over the typed arrays (no copy).
+
+        data_processing.process_questions_columnar (COLUMNAR_PROCESSING=1)
+        aggregates over these, and to_frame() wraps them in a DataFrame.
+
+        Returns:
+            dict: 'subject_code', 'chapter_code', 'difficulty_code' (uint32),
+            'attempted', 'correct' (bool) and 'time_taken' (float64) arrays.
+        """
+        import numpy as np
+        return {
+            'subject_code': np.frombuffer(self.subject_codes, dtype=np.uint32),
+            'chapter_code': np.frombuffer(self.chapter_codes, dtype=np.uint32),
+            'difficulty_code': np.frombuffer(self.difficulty_codes, dtype=np.uint32),
+            'attempted': np.frombuffer(self.attempted, dtype=np.bool_),
+            'correct': np.frombuffer(self.correct, dtype=np.bool_),
+            'time_taken': np.frombuffer(self.time_taken, dtype=np.float64)
+        }
+
+    def to_frame(self, concepts=False):
+        """
+        One row per question as a pandas DataFrame.
+
+        Subject, chapter and difficulty become categoricals over the interned
+        codes and the numeric columns wrap the arrays from columns(). Pass
+        concepts=True to add the (per-row list) concepts column.
+        """
+        import pandas as pd
+        cols = self.columns()
+        frame = pd.DataFrame({
+            'subject': pd.Categorical.from_codes(cols['subject_code'], categories=self.subjects),
+            'chapter': pd.Categorical.from_codes(cols['chapter_code'], categories=self.chapters),
+            'difficulty': pd.Categorical.from_codes(cols['difficulty_code'], categories=self.difficulties),
+            'attempted': cols['attempted'],
+            'correct': cols['correct'],
+            'time_taken': cols['time_taken']
+        }, copy=False)
+        if concepts:
+            frame['concepts'] = [record['concepts'] for record in self]
+        return frame
+
+def time_outcomes(questions):
+    """
+    (time_taken, correct) for every question, in order.
+
+    Reads the typed arrays of a QuestionStore directly and falls back to the
+    dicts of reports pickled before it existed.
+    """
+    if isinstance(questions, QuestionStore):
+        return [(t, bool(c)) for t, c in zip(questions.time_taken, questions.correct)]
+    return [(q['time_taken'], bool(q['correct'])) for q in questions]
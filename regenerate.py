@@ -0,0 +1,93 @@
+import argparse
+import io
+import os
+from collections import Counter
+from artifact_store import ArtifactStore, ATTEMPT, PROCESSED_DATA, STAGES
+from report_pipeline import build_report, feedback_preview
+from report_store import ReportStore
+
+def regenerate(report_id, artifacts, reports=None, output_dir=None):
+    """
+    Rebuild one report from its stored attempt, reusing every stage whose inputs are unchanged.
+
+    The PDF goes to output_dir as student_feedback_report_<id>.pdf when given
+    (as batch.py names them), otherwise into the report store. When the
+    processed data has to be recomputed, the student keeps the percentiles the
+    report was first built with and is not added to the quantile sketches again.
+
+    Returns:
+        dict: Stage -> 'reused', 'computed' or (charts behind a reused PDF) 'skipped'.
+
+    Raises:
+        KeyError: If the report or its stored attempt is unknown.
+    """
+    manifest = artifacts.manifest(report_id)
+    attempt = artifacts.get(ATTEMPT, manifest['keys'][ATTEMPT]) if manifest and ATTEMPT in manifest['keys'] else None
+    if attempt is None:
+        raise KeyError(f"No stored attempt for report {report_id}")
+
+    # Keep the standing the report was first built with: ranking again would move with the
+    # cohort, change the prompt and defeat the stored feedback. Nothing is added to the sketches.
+    previous = artifacts.get(PROCESSED_DATA, manifest['keys'][PROCESSED_DATA]) if PROCESSED_DATA in manifest['keys'] else None
+    percentiles = previous.get('percentiles') if previous is not None else None
+
+    stages = {}
+    if output_dir is not None:
+        output = os.path.join(output_dir, f"student_feedback_report_{report_id}.pdf")
+    else:
+        output = io.BytesIO()
+    processed_data, feedback = build_report(
+        attempt, output, artifacts=artifacts, report_id=report_id, filename=manifest['filename'], stages=stages,
+        observe=False, percentiles=percentiles
+    )
+    if output_dir is None:
+        reports.save(
+            report_id, processed_data, filename=manifest['filename'], pdf=output.getvalue(),
+            feedback_preview=feedback_preview(feedback)
+        )
+    return stages
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Regenerate reports from stored artifacts, recomputing only stages whose inputs or code version changed."
+    )
+    parser.add_argument('report_ids', nargs='*', help="Reports to regenerate (web report ids or batch student ids)")
+    parser.add_argument('--all', action='store_true', help="Regenerate every report in the artifact store")
+    parser.add_argument('-o', '--output-dir', help="Write PDFs here instead of the report store (e.g. a batch output directory)")
+    parser.add_argument('--prune', action='store_true', help="Afterwards, delete artifacts no report uses any more")
+    args = parser.parse_args(argv)
+
+    artifacts = ArtifactStore.from_env()
+    if artifacts is None:
+        parser.error("ARTIFACT_DB_PATH is empty; there are no stored artifacts to regenerate from")
+    report_ids = artifacts.report_ids() if args.all else args.report_ids
+    if not report_ids and not args.prune:
+        parser.error("give report ids or --all")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    reports = None if args.output_dir else ReportStore.from_env()
+
+    counts = {stage: Counter() for stage in STAGES if stage != ATTEMPT}
+    failed = 0
+    for report_id in report_ids:
+        try:
+            stages = regenerate(report_id, artifacts, reports=reports, output_dir=args.output_dir)
+        except Exception as e:
+            failed += 1
+            print(f"{report_id}: failed - {e}")
+            continue
+        for stage, outcome in stages.items():
+            counts[stage][outcome] += 1
+
+    if report_ids:
+        print(f"Regenerated {len(report_ids) - failed} of {len(report_ids)} reports")
+        for stage, outcome in counts.items():
+            print(f"  {stage:<14} reused {outcome['reused']:>5}  computed {outcome['computed']:>5}  "
+                  f"skipped {outcome['skipped']:>5}")
+    if args.prune:
+        removed, size = artifacts.prune()
+        print(f"Pruned {removed} unused artifacts ({size / 1024 / 1024:.1f} MB)")
+    return 0 if failed == 0 else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
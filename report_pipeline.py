@@ -0,0 +1,323 @@
+import asyncio
+import contextvars
+import io
+import json
+import os
+from json_stream import iter_json_items
+from cache import content_key
+from data_processing import process_data, PROCESSING_VERSION
+from subject_registry import default_registry
+from llm_feedback import generate_feedback, build_prompt, MODEL_NAME
+import chart_generator
+from chart_generator import generate_charts, chart_fingerprint
+from pdf_generator import generate_pdf, PDF_LAYOUT_VERSION
+from report_store import ReportStore
+from cohort_index import CohortIndex, attempt_key
+from quantile_sketch import SketchStore
+from artifact_store import ArtifactStore, ATTEMPT, PROCESSED_DATA, FEEDBACK, CHARTS, PDF
+from report_workers import shared_pool
+import metrics
+
+def preload():
+    """
+    Import the heavy report dependencies and build the Gemini model up front.
+
+    Workers import these lazily on first use. Call this from a gunicorn master
+    started with --preload so forked workers inherit them already loaded. No
+    network clients or worker pools are created here, so it is fork-safe.
+    """
+    import pandas  # noqa: F401
+    import plotly.express  # noqa: F401
+    import plotly.graph_objects  # noqa: F401
+    import reportlab.platypus  # noqa: F401
+    from llm_feedback import get_model
+    get_model()
+
+def load_attempt(filepath):
+    """
+    Load a single student attempt from an uploaded JSON file.
+
+    The file is decoded incrementally, so only the first attempt of a large
+    export is ever held in memory.
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        # Handle both list and dict formats; take the first element if it's a list
+        data = next(iter_json_items(f), None)
+    if not isinstance(data, dict):
+        raise ValueError("Invalid JSON structure")
+    return data
+
+def _stage_keys(data):
+    """Artifact keys for the attempt and its processed data."""
+    attempt_key = content_key(ATTEMPT, json.dumps(data, sort_keys=True, separators=(',', ':')))
+    return attempt_key, content_key(PROCESSED_DATA, PROCESSING_VERSION, default_registry().fingerprint(), attempt_key)
+
+def _charts_key(processed_data):
+    """Artifact key for the report's charts: every chart's input fingerprint plus the backend."""
+    backend = os.getenv('CHART_BACKEND', 'plotly').lower()
+    return content_key(CHARTS, backend, *(chart_fingerprint(key, processed_data) for _, key, _ in chart_generator.CHARTS))
+
+def _reuse(artifacts, stage, key, stages):
+    """Stored output for this stage and key, or None; notes in stages whether it was reused."""
+    value = artifacts.get(stage, key) if artifacts is not None else None
+    if stages is not None:
+        stages[stage] = 'reused' if value is not None else 'computed'
+    return value
+
+def _write(output, pdf):
+    if isinstance(output, str):
+        with open(output, 'wb') as f:
+            f.write(pdf)
+    else:
+        output.write(pdf)
+
+def _pdf_bytes(output):
+    """The PDF just written to output, or None for a file object that cannot be read back."""
+    if isinstance(output, str):
+        with open(output, 'rb') as f:
+            return f.read()
+    return output.getvalue() if hasattr(output, 'getvalue') else None
+
+def _prepare(data, artifacts, keys, stages, observe=True, percentiles=None):
+    """process_data and percentile stages of build_report; fills keys with the attempt and processed-data keys."""
+    if artifacts is not None:
+        keys[ATTEMPT], keys[PROCESSED_DATA] = _stage_keys(data)
+        artifacts.put(ATTEMPT, keys[ATTEMPT], data)
+
+    processed_data = _reuse(artifacts, PROCESSED_DATA, keys.get(PROCESSED_DATA), stages)
+    if processed_data is None:
+        with metrics.stage('process_data'):
+            processed_data = process_data(data)
+        sketches = SketchStore.from_env() if percentiles is None else None
+        if percentiles is not None:
+            processed_data['percentiles'] = percentiles
+        elif sketches is not None:
+            # Rank against earlier students before feedback, so the prompt can mention it
+            with metrics.stage('percentiles'):
+                if observe:
+                    # Keyed by attempt, so reprocessing the same upload does not count the student again
+                    processed_data['percentiles'] = sketches.observe(processed_data, attempt_key(data))
+                else:
+                    processed_data['percentiles'] = sketches.percentiles(processed_data)
+        if artifacts is not None:
+            artifacts.put(PROCESSED_DATA, keys[PROCESSED_DATA], processed_data)
+
+    if artifacts is not None:
+        keys[FEEDBACK] = content_key(FEEDBACK, MODEL_NAME, build_prompt(processed_data))
+    return processed_data, _reuse(artifacts, FEEDBACK, keys.get(FEEDBACK), stages)
+
+def _build_pdf(processed_data, feedback, output, artifacts, keys, stages, renderer=None):
+    """Chart and PDF stages of build_report when no stored PDF matches."""
+    stored_charts = _reuse(artifacts, CHARTS, keys.get(CHARTS), stages)
+    if renderer is not None:
+        # Charts and PDF are built by a warm worker process; only the bytes come back
+        with metrics.stage('render_report'):
+            _, pdf, rendered = renderer.render(processed_data, feedback, charts=stored_charts)
+        _write(output, pdf)
+        if artifacts is not None:
+            if stored_charts is None and rendered is not None:
+                artifacts.put(CHARTS, keys[CHARTS], rendered)
+            artifacts.put(PDF, keys[PDF], pdf)
+        return
+
+    if stored_charts is not None:
+        chart_images = {name: io.BytesIO(png) for name, png in stored_charts.items()}
+    else:
+        with metrics.stage('generate_charts'):
+            chart_images = generate_charts(processed_data)
+        # Vector drawings are cheap to rebuild; only PNGs are worth keeping
+        if artifacts is not None and all(isinstance(image, io.BytesIO) for image in chart_images.values()):
+            artifacts.put(CHARTS, keys[CHARTS], {name: image.getvalue() for name, image in chart_images.items()})
+    with metrics.stage('generate_pdf'):
+        generate_pdf(feedback, chart_images, output)
+    pdf = _pdf_bytes(output) if artifacts is not None else None
+    if pdf is not None:
+        artifacts.put(PDF, keys[PDF], pdf)
+
+def _render(processed_data, feedback, output, artifacts, keys, stages, report_id, filename, renderer=None):
+    """Chart and PDF stages of build_report, then the report's artifact manifest."""
+    if artifacts is not None:
+        keys[CHARTS] = _charts_key(processed_data)
+        keys[PDF] = content_key(PDF, PDF_LAYOUT_VERSION, keys[FEEDBACK], keys[CHARTS])
+    pdf = _reuse(artifacts, PDF, keys.get(PDF), stages)
+    if pdf is not None:
+        # The stored PDF already contains the charts; none are loaded or built
+        if stages is not None:
+            stages[CHARTS] = 'skipped'
+        _write(output, pdf)
+    else:
+        _build_pdf(processed_data, feedback, output, artifacts, keys, stages, renderer)
+
+    if artifacts is not None and report_id is not None:
+        artifacts.record(report_id, keys, filename=filename)
+    metrics.inc('report_bytes_written_total', os.path.getsize(output) if isinstance(output, str) else output.tell())
+
+def build_report(data, output, feedback_fn=generate_feedback, artifacts=None, report_id=None,
+                 filename=None, stages=None, renderer=None, observe=True, percentiles=None):
+    """
+    Run the full report pipeline for one student attempt.
+
+    With an ArtifactStore, each stage first looks for an output stored under a
+    hash of its inputs and code version (PROCESSING_VERSION, the prompt,
+    CHART_LAYOUT_VERSION, PDF_LAYOUT_VERSION) and only runs when there is
+    none. Regenerating a report after a PDF template change therefore
+    re-renders the PDF without calling Gemini or Kaleido. Processed data that
+    is reused keeps the percentiles from when it was computed. When it is
+    recomputed, the student is ranked against the quantile sketches and, with
+    observe, added to them; the sketches count each attempt once however often
+    it is processed.
+
+    Args:
+        data (dict): Raw attempt JSON for a single student.
+        output (str or file): Path or binary file object to write the generated PDF to.
+        feedback_fn (callable): Maps processed data to feedback text.
+        artifacts (ArtifactStore, optional): Where stage outputs are reused from and stored.
+        report_id (str, optional): Record the artifacts used under this report id.
+        filename (str, optional): Upload name recorded with the report's artifacts.
+        stages (dict, optional): Filled with stage -> 'reused' or 'computed'; charts
+            are 'skipped' when the stored PDF is reused.
+        renderer (ReportWorkerPool, optional): Worker pool that builds the charts
+            and PDF instead of this process.
+        observe (bool): Add the student to the quantile sketches; False only ranks
+            them, as a rebuild should not change the cohort.
+        percentiles (dict, optional): Percentiles to use when processed data is
+            recomputed, instead of ranking the student again (e.g. the ones the
+            report was first built with, so the prompt and its feedback are reused).
+
+    Returns:
+        tuple: (processed_data, feedback) for the attempt.
+    """
+    keys = {}
+    processed_data, feedback = _prepare(data, artifacts, keys, stages, observe, percentiles)
+    if feedback is None:
+        with metrics.stage('generate_feedback'):
+            feedback = feedback_fn(processed_data)
+        if artifacts is not None:
+            artifacts.put(FEEDBACK, keys[FEEDBACK], feedback)
+    _render(processed_data, feedback, output, artifacts, keys, stages, report_id, filename, renderer)
+    return processed_data, feedback
+
+def _offload(executor, fn, *args):
+    """Run fn on executor in a copy of the current context, so its stages land in this job's metrics trace."""
+    return asyncio.get_running_loop().run_in_executor(executor, contextvars.copy_context().run, fn, *args)
+
+async def build_report_async(data, output, feedback_fn, executor=None, artifacts=None, report_id=None,
+                             filename=None, stages=None, renderer=None):
+    """
+    build_report for an event loop: feedback_fn is awaited, and the blocking
+    stages (processing, charts, PDF, artifact reads and writes) run on
+    `executor`, so the loop is free for other requests while they do.
+
+    Args:
+        feedback_fn (coroutine function): Maps processed data to feedback text,
+            e.g. FeedbackBatcher.generate.
+        executor (concurrent.futures.Executor, optional): Where blocking stages
+            run; the loop's default executor when omitted.
+        Other arguments as for build_report.
+    """
+    keys = {}
+    processed_data, feedback = await _offload(executor, _prepare, data, artifacts, keys, stages)
+    if feedback is None:
+        with metrics.stage('generate_feedback'):
+            feedback = await feedback_fn(processed_data)
+        if artifacts is not None:
+            await _offload(executor, artifacts.put, FEEDBACK, keys[FEEDBACK], feedback)
+    await _offload(executor, _render, processed_data, feedback, output, artifacts, keys, stages, report_id, filename,
+                   renderer)
+    return processed_data, feedback
+
+def feedback_preview(feedback):
+    """The first 500 characters of the feedback, as shown on the preview page."""
+    return feedback[:500] + "..." if len(feedback) > 500 else feedback
+
+def _save_report(payload, processed_data, feedback, output, student_key):
+    pdf_path = payload.get('pdf_path')
+    with metrics.stage('save_report'):
+        ReportStore.from_env().save(
+            payload['report_id'],
+            processed_data,
+            filename=payload['filename'],
+            pdf_path=pdf_path,
+            pdf=None if pdf_path else output.getvalue(),
+            feedback_preview=feedback_preview(feedback)
+        )
+    cohort = CohortIndex.from_env()
+    if cohort is not None:
+        with metrics.stage('update_cohort'):
+            # Keyed by the attempt, not the report, so re-uploads are not counted twice
+            cohort.add(student_key, processed_data)
+
+def _load_upload(upload_path):
+    with metrics.stage('load_attempt'):
+        return load_attempt(upload_path)
+
+def run_report_job(payload):
+    """
+    Job handler used by the background worker pool.
+
+    The finished report, including the PDF bytes, is saved to the server-side
+    report store under its report id; only the id is returned to the job queue.
+    Payloads queued with a 'pdf_path' write the PDF to that file instead.
+
+    Args:
+        payload (dict): Job payload with 'report_id', 'upload_path' and 'filename'.
+
+    Returns:
+        dict: {'report_id': ...} for the preview and download routes.
+    """
+    upload_path = payload['upload_path']
+    try:
+        with metrics.trace(report_id=payload['report_id']):
+            data = _load_upload(upload_path)
+            output = payload.get('pdf_path') or io.BytesIO()
+            processed_data, feedback = build_report(
+                data, output, artifacts=ArtifactStore.from_env(),
+                report_id=payload['report_id'], filename=payload['filename'], renderer=shared_pool()
+            )
+            _save_report(payload, processed_data, feedback, output, attempt_key(data))
+    except Exception:
+        metrics.inc('report_failures_total')
+        raise
+    finally:
+        # Clean up uploaded file
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+
+    metrics.inc('reports_generated_total')
+    return {'report_id': payload['report_id']}
+
+async def run_report_job_async(payload, feedback_fn, executor=None):
+    """
+    run_report_job for the ASGI front end (asgi_app.py).
+
+    Loading, processing, rendering and saving run on `executor`; only the
+    awaited Gemini call happens on the event loop, so a single process can
+    keep hundreds of uploads in flight while they wait on the model.
+
+    Args:
+        payload (dict): Job payload with 'report_id', 'upload_path' and 'filename'.
+        feedback_fn (coroutine function): Maps processed data to feedback text.
+        executor (concurrent.futures.Executor, optional): Where blocking stages run.
+
+    Returns:
+        dict: {'report_id': ...} for the preview and download routes.
+    """
+    upload_path = payload['upload_path']
+    try:
+        with metrics.trace(report_id=payload['report_id']):
+            data = await _offload(executor, _load_upload, upload_path)
+            output = payload.get('pdf_path') or io.BytesIO()
+            processed_data, feedback = await build_report_async(
+                data, output, feedback_fn, executor=executor, artifacts=ArtifactStore.from_env(),
+                report_id=payload['report_id'], filename=payload['filename'], renderer=shared_pool()
+            )
+            await _offload(executor, _save_report, payload, processed_data, feedback, output, attempt_key(data))
+    except Exception:
+        metrics.inc('report_failures_total')
+        raise
+    finally:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+
+    metrics.inc('reports_generated_total')
+    return {'report_id': payload['report_id']}
@@ -0,0 +1,191 @@
+import os
+import pickle
+import sqlite3
+import time
+from artifact_store import ArtifactStore, PDF
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id TEXT PRIMARY KEY,
+    filename TEXT,
+    pdf_path TEXT,
+    pdf BLOB,
+    feedback_preview TEXT,
+    processed_data BLOB,
+    created_at REAL NOT NULL,
+    expires_at REAL
+)
+"""
+
+# Artifacts younger than this are never pruned; reports still being built have not recorded theirs yet
+ARTIFACT_GRACE_SECONDS = 3600
+
+class ReportStore:
+    """
+    Server-side store for generated reports, keyed by report id.
+
+    Only the report id lives in the Flask session. Summary fields, the
+    pickled processed_data and the PDF bytes are kept here and loaded on
+    demand, so tuple keys survive without string conversion and downloads
+    need no file on disk. When an artifact store is given, a PDF it already
+    holds for the report is read from there rather than stored a second time,
+    and deleting or expiring a report also drops its stage outputs, so the
+    artifact store does not outgrow the reports it serves.
+
+    Args:
+        db_path (str): Path to the SQLite database.
+        ttl (float, optional): Seconds a report is kept; None keeps reports until deleted.
+        artifacts (ArtifactStore, optional): Where the reports' stage outputs are kept.
+    """
+
+    def __init__(self, db_path='reports.db', ttl=None, artifacts=None):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.artifacts = artifacts
+        conn = self._connect()
+        with conn:
+            conn.execute(_SCHEMA)
+            # Stores created before PDFs were kept in the database
+            if 'pdf' not in [row['name'] for row in conn.execute("PRAGMA table_info(reports)")]:
+                conn.execute("ALTER TABLE reports ADD COLUMN pdf BLOB")
+            conn.execute("CREATE INDEX IF NOT EXISTS reports_expires_at ON reports (expires_at)")
+        conn.close()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Store configured by REPORT_DB_PATH and REPORT_TTL (seconds, default one day).
+
+        Reports own their artifacts in the ARTIFACT_DB_PATH store, if enabled.
+        """
+        ttl = os.getenv('REPORT_TTL', '86400')
+        return cls(os.getenv('REPORT_DB_PATH', 'reports.db'), ttl=float(ttl) if ttl else None,
+                   artifacts=ArtifactStore.from_env())
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def save(self, report_id, processed_data, filename, pdf_path=None, feedback_preview=None, pdf=None):
+        """
+        Store a finished report, replacing any existing entry with the same id.
+
+        The PDF is either kept in the store as bytes (pdf) or referenced on disk (pdf_path).
+        Bytes the artifact store already holds as the report's PDF are not copied here.
+        """
+        if pdf is not None and self._pdf_key(report_id) is not None:
+            pdf = None
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        blob = pickle.dumps(processed_data, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO reports (id, filename, pdf_path, pdf, feedback_preview, processed_data, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (report_id, filename, pdf_path, pdf, feedback_preview, blob, now, expires_at)
+                )
+        finally:
+            conn.close()
+        self.purge_expired()
+
+    def get(self, report_id):
+        """
+        Look up a report's summary without loading its processed data.
+
+        Returns:
+            dict or None: {'id', 'filename', 'pdf_path', 'feedback_preview'}, or None
+            if the report is unknown or expired.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT id, filename, pdf_path, feedback_preview FROM reports "
+                "WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (report_id, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        return dict(row) if row is not None else None
+
+    def load_processed_data(self, report_id):
+        """Return the report's processed_data dict, or None if the report is unknown or expired."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT processed_data FROM reports WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (report_id, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        return pickle.loads(row['processed_data']) if row is not None else None
+
+    def load_pdf(self, report_id):
+        """Return the report's PDF bytes, or None if it is unknown, expired or kept on disk."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT pdf, pdf_path FROM reports WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (report_id, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        if row['pdf'] is None and not row['pdf_path']:
+            # Saved without bytes because the artifact store has them
+            key = self._pdf_key(report_id)
+            return self.artifacts.get(PDF, key) if key is not None else None
+        return row['pdf']
+
+    def _pdf_key(self, report_id):
+        """Artifact key of the report's PDF, or None without an artifact store or a recorded PDF."""
+        manifest = self.artifacts.manifest(report_id) if self.artifacts is not None else None
+        return manifest['keys'].get(PDF) if manifest is not None else None
+
+    def delete(self, report_id):
+        """Remove a report, its PDF file if it has one, and its stage artifacts."""
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute("SELECT pdf_path FROM reports WHERE id = ?", (report_id,)).fetchone()
+                conn.execute("DELETE FROM reports WHERE id = ?", (report_id,))
+        finally:
+            conn.close()
+        if row is not None:
+            _remove_file(row['pdf_path'])
+            self._forget_artifacts([report_id])
+
+    def purge_expired(self):
+        """Delete expired reports, their PDF files and stage artifacts. Returns the number removed."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                rows = conn.execute(
+                    "SELECT id, pdf_path FROM reports WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+                ).fetchall()
+                conn.execute("DELETE FROM reports WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        finally:
+            conn.close()
+        for row in rows:
+            _remove_file(row['pdf_path'])
+        self._forget_artifacts([row['id'] for row in rows])
+        return len(rows)
+
+    def _forget_artifacts(self, report_ids):
+        if self.artifacts is None or not report_ids:
+            return
+        for report_id in report_ids:
+            self.artifacts.forget(report_id)
+        self.artifacts.prune(min_age=ARTIFACT_GRACE_SECONDS)
+
+def _remove_file(path):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # Ignore errors if file is already deleted
@@ -0,0 +1,160 @@
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+
+class PoolBusy(RuntimeError):
+    """Raised by ReportWorkerPool.submit when the queue is full and the caller would not wait."""
+
+def _init_worker():
+    """
+    Pool initializer: pay every per-process setup cost once, before the first job.
+
+    Imports pandas, Plotly and ReportLab, builds the Gemini model, the PDF
+    stylesheet and (for the Plotly backend) a running Kaleido renderer.
+    """
+    from report_pipeline import preload
+    import chart_generator
+    import pdf_generator
+    preload()
+    pdf_generator._engine()
+    if os.getenv('CHART_BACKEND', 'plotly').lower() == 'plotly':
+        chart_generator._init_renderer()
+
+def _render_report(processed_data, feedback, charts):
+    """
+    Worker task: feedback (when not given), charts and the PDF for one student.
+
+    Returns:
+        tuple: (feedback, pdf_bytes, chart PNG bytes by name or None, metrics snapshot).
+    """
+    from chart_generator import generate_charts
+    from llm_feedback import generate_feedback
+    from pdf_generator import generate_pdf
+
+    if feedback is None:
+        with metrics.stage('generate_feedback'):
+            feedback = generate_feedback(processed_data)
+    rendered = None
+    if charts is not None:
+        chart_images = {name: io.BytesIO(png) for name, png in charts.items()}
+    else:
+        with metrics.stage('generate_charts'):
+            chart_images = generate_charts(processed_data)
+        # Vector drawings are rebuilt cheaply by the parent; only PNGs are sent back
+        if all(isinstance(image, io.BytesIO) for image in chart_images.values()):
+            rendered = {name: image.getvalue() for name, image in chart_images.items()}
+    output = io.BytesIO()
+    with metrics.stage('generate_pdf'):
+        generate_pdf(feedback, chart_images, output)
+    return feedback, output.getvalue(), rendered, metrics.drain()
+
+class ReportWorkerPool:
+    """
+    Long-lived worker processes that turn processed data into PDF bytes.
+
+    Each worker is warmed once by _init_worker, so reports no longer pay for
+    imports, the Gemini model, the PDF styles or a Kaleido start-up. A worker is
+    replaced after max_tasks jobs to cap the memory that Plotly, Kaleido and
+    ReportLab accumulate. At most workers + max_pending jobs are accepted at
+    once; beyond that submit() waits, or raises PoolBusy when asked not to, so
+    callers feel back-pressure instead of queueing without bound. The web app
+    (through shared_pool) and batch.py use the same class.
+
+    Args:
+        workers (int): Worker processes; REPORT_POOL_WORKERS or the CPU count by default.
+        max_tasks (int): Jobs per worker before it is recycled; REPORT_POOL_MAX_TASKS by default.
+        max_pending (int): Jobs allowed to wait for a free worker; REPORT_POOL_QUEUE by default.
+    """
+
+    def __init__(self, workers=None, max_tasks=None, max_pending=None):
+        self.workers = workers or int(os.getenv('REPORT_POOL_WORKERS', '0')) or os.cpu_count() or 1
+        self.max_tasks = max_tasks or int(os.getenv('REPORT_POOL_MAX_TASKS', '50'))
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv('REPORT_POOL_QUEUE') or 2 * self.workers)
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    @classmethod
+    def from_env(cls):
+        """Pool sized by REPORT_POOL_WORKERS, or None when it is unset or 0."""
+        workers = int(os.getenv('REPORT_POOL_WORKERS', '0') or 0)
+        return cls(workers=workers) if workers > 0 else None
+
+    def _new_executor(self):
+        # Recycling workers needs spawn; forking a process with live threads is unsafe anyway
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            max_tasks_per_child=self.max_tasks
+        )
+
+    def _release(self, future):
+        self._slots.release()
+        if not future.cancelled() and future.exception() is None:
+            metrics.merge(future.result()[3])
+
+    def submit(self, processed_data, feedback=None, charts=None, block=True, timeout=None):
+        """
+        Queue one report.
+
+        Args:
+            processed_data (dict): Output of process_data().
+            feedback (str, optional): Feedback text; generated in the worker when omitted.
+            charts (dict, optional): Chart name -> PNG bytes to reuse instead of rendering.
+            block (bool): Wait for room in the queue when it is full.
+            timeout (float, optional): Longest wait, in seconds, when blocking.
+
+        Returns:
+            concurrent.futures.Future: Resolves to (feedback, pdf_bytes, charts, metrics snapshot).
+
+        Raises:
+            PoolBusy: The queue stayed full.
+        """
+        if not self._slots.acquire(blocking=block, timeout=timeout if block else None):
+            metrics.inc('report_pool_busy_total')
+            raise PoolBusy(f"Report worker queue is full ({self.workers + self.max_pending} jobs)")
+        try:
+            with self._lock:
+                try:
+                    future = self._executor.submit(_render_report, processed_data, feedback, charts)
+                except BrokenProcessPool:
+                    # A worker died (e.g. out of memory); start a fresh pool and try once more
+                    self._executor.shutdown(wait=False)
+                    self._executor = self._new_executor()
+                    future = self._executor.submit(_render_report, processed_data, feedback, charts)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def render(self, processed_data, feedback=None, charts=None, timeout=None):
+        """Blocking submit(): returns (feedback, pdf_bytes, charts) once the report is built."""
+        feedback, pdf, rendered, _ = self.submit(processed_data, feedback, charts, timeout=timeout).result()
+        return feedback, pdf, rendered
+
+    def close(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_pool():
+    """
+    The process-wide pool from REPORT_POOL_WORKERS, created on first use, or
+    None when disabled or when called inside a worker process (e.g.
+    REPORT_WORKER_MODE=process), where a nested pool would only compete for
+    the same CPUs.
+    """
+    global _shared
+    if multiprocessing.parent_process() is not None:
+        return None
+    with _shared_lock:
+        if _shared is None:
+            _shared = ReportWorkerPool.from_env() or False
+    return _shared or None
@@ -0,0 +1,131 @@
+import json
+import os
+from collections import deque
+from functools import lru_cache
+from cache import content_key
+
+UNKNOWN = 'Unknown'
+
+# Used when SUBJECT_REGISTRY_PATH is not set; matches the original hardcoded mapping
+DEFAULT_SUBJECTS = [
+    {'name': 'Physics', 'ids': ['607018ee404ae53194e73d92'], 'keywords': ['physics', 'phys']},
+    {'name': 'Chemistry', 'ids': ['607018ee404ae53194e73d90'], 'keywords': ['chemistry', 'chem']},
+    {'name': 'Mathematics', 'ids': ['607018ee404ae53194e73d91'], 'keywords': ['mathematics', 'math', 'maths']}
+]
+
+def _build_matcher(keywords):
+    """
+    Aho-Corasick automaton over (keyword, priority) pairs.
+
+    Returns (goto, best): goto[state] maps a character to the next state with
+    failure transitions already folded in, and best[state] is the lowest
+    priority of any keyword ending at that state, or None.
+    """
+    goto, best, fail = [{}], [None], [0]
+    for keyword, priority in keywords:
+        state = 0
+        for char in keyword:
+            if char not in goto[state]:
+                goto.append({})
+                best.append(None)
+                fail.append(0)
+                goto[state][char] = len(goto) - 1
+            state = goto[state][char]
+        if keyword and (best[state] is None or priority < best[state]):
+            best[state] = priority
+
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        if best[fail[state]] is not None and (best[state] is None or best[fail[state]] < best[state]):
+            best[state] = best[fail[state]]
+        for char, child in goto[state].items():
+            fail[child] = goto[fail[state]].get(char, 0)
+            queue.append(child)
+        # Missing transitions fall back along the failure link
+        for char, target in goto[fail[state]].items():
+            goto[state].setdefault(char, target)
+    return goto, best
+
+class SubjectRegistry:
+    """
+    Subject and test-series metadata used by process_data.
+
+    Section titles are classified with an Aho-Corasick automaton built once
+    over every subject's keywords: a title is scanned a character at a time
+    no matter how many subjects are registered, and earlier subjects win
+    when several match (a title mentioning both 'physics' and 'chemistry' is
+    Physics). Lookups are also memoized per title, and subject ids resolve
+    through a dict.
+
+    Args:
+        subjects (list): Dicts with 'name', and optionally 'ids' (subject
+            ObjectIds), 'keywords' (case-insensitive title substrings) and
+            'total_marks'.
+        tests (dict, optional): Test ObjectId -> {'subjects': {name: total_marks}}
+            for test series whose subject totals differ from the defaults.
+        cache_size (int): Distinct titles memoized by classify().
+    """
+
+    def __init__(self, subjects, tests=None, cache_size=4096):
+        self.subjects = [dict(subject) for subject in subjects]
+        self.tests = tests or {}
+        self._names_by_id = {
+            subject_id: subject['name'] for subject in self.subjects for subject_id in subject.get('ids', [])
+        }
+        self._totals = {subject['name']: subject['total_marks'] for subject in self.subjects if subject.get('total_marks')}
+
+        self._goto, self._best = _build_matcher(
+            (keyword.lower(), priority)
+            for priority, subject in enumerate(self.subjects)
+            for keyword in subject.get('keywords', [])
+        )
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a registry from a JSON file with 'subjects' and optional 'tests' keys."""
+        with open(path) as f:
+            config = json.load(f)
+        return cls(config['subjects'], config.get('tests'))
+
+    @classmethod
+    def from_env(cls):
+        """Registry loaded from SUBJECT_REGISTRY_PATH, or the built-in three subjects when it is unset."""
+        path = os.getenv('SUBJECT_REGISTRY_PATH')
+        return cls.from_file(path) if path else cls(DEFAULT_SUBJECTS)
+
+    def _classify(self, title):
+        goto, best = self._goto, self._best
+        state, found = 0, None
+        for char in title.lower():
+            state = goto[state].get(char, 0)
+            priority = best[state]
+            if priority is not None and (found is None or priority < found):
+                found = priority
+                if found == 0:
+                    break
+        return self.subjects[found]['name'] if found is not None else UNKNOWN
+
+    def fingerprint(self):
+        """Hash of the registry's contents, for keying results that depend on it."""
+        return content_key(json.dumps({'subjects': self.subjects, 'tests': self.tests}, sort_keys=True))
+
+    def name_for_id(self, subject_id, default=UNKNOWN):
+        """Subject name for a subject ObjectId, or `default`."""
+        return self._names_by_id.get(subject_id, default)
+
+    def total_marks(self, subject, test_id=None, default=100):
+        """
+        Maximum marks for a subject: the test series' own total if the
+        registry has one, then the subject's total, then `default`.
+        """
+        test = self.tests.get(test_id) if test_id is not None else None
+        if test is not None and subject in test.get('subjects', {}):
+            return test['subjects'][subject]
+        return self._totals.get(subject, default)
+
+@lru_cache(maxsize=1)
+def default_registry():
+    """The process-wide registry from SubjectRegistry.from_env(), built on first use."""
+    return SubjectRegistry.from_env()
@@ -0,0 +1,34 @@
+import json
+import pytest
+import llm_feedback
+from batch import run_batch, unique_id
+from benchmarks.stubs import StubModel
+from benchmarks.synthetic import make_attempt
+
+def test_unique_id_suffixes_repeats():
+    seen = set()
+    assert [unique_id(i, seen) for i in ['a', 'a', 'b', 'a', 'a_2']] == ['a', 'a_2', 'b', 'a_3', 'a_2_2']
+
+@pytest.fixture
+def stub_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_feedback, 'feedback_cache', None)
+    monkeypatch.setattr(llm_feedback, 'get_model', lambda: StubModel())
+    monkeypatch.setenv('CHART_BACKEND', 'reportlab')
+    monkeypatch.setenv('FEEDBACK_BATCH_WAIT', '0')
+    for name in ('COHORT_DB_PATH', 'ARTIFACT_DB_PATH', 'SKETCH_DB_PATH'):
+        monkeypatch.setenv(name, str(tmp_path / f"{name.lower()}.db"))
+
+def test_attempts_sharing_an_id_get_their_own_reports(tmp_path, stub_env):
+    attempts = [make_attempt(questions_per_subject=3, seed=seed, attempt_id='dup') for seed in range(3)]
+    input_path = tmp_path / 'attempts.json'
+    input_path.write_text(json.dumps(attempts))
+    output_dir = tmp_path / 'out'
+
+    manifest = run_batch(str(input_path), str(output_dir), workers=2, feedback_batch=1, render_workers=0)
+
+    assert manifest['succeeded'] == 3
+    assert [e['student_id'] for e in manifest['reports']] == ['dup', 'dup_2', 'dup_3']
+    assert len({e['pdf_path'] for e in manifest['reports']}) == 3
+    assert sorted(p.name for p in output_dir.glob('*.pdf')) == [
+        'student_feedback_report_dup.pdf', 'student_feedback_report_dup_2.pdf', 'student_feedback_report_dup_3.pdf'
+    ]
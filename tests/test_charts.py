@@ -0,0 +1,24 @@
+import pytest
+from chart_generator import CHARTS
+from data_processing import process_data
+from vector_charts import DRAWINGS
+
+EDGE_ATTEMPTS = {
+    'empty attempt': {},
+    'subject without questions': {
+        'subjects': [{'subjectId': {'$oid': '607018ee404ae53194e73d92'}, 'totalAttempted': 0}],
+        'sections': [{'sectionId': {'title': 'Physics Single Correct'}, 'questions': []}]
+    },
+    'nothing attempted': {
+        'sections': [{'sectionId': {'title': 'Physics Single Correct'}, 'questions': [
+            {'questionId': {'level': 'easy', 'chapters': [{'title': 'Optics'}]}, 'timeTaken': 5}
+        ]}]
+    },
+}
+
+@pytest.mark.parametrize('attempt', EDGE_ATTEMPTS.values(), ids=EDGE_ATTEMPTS.keys())
+@pytest.mark.parametrize('title,key,build_figure', CHARTS, ids=[key for _, key, _ in CHARTS])
+def test_both_backends_draw_edge_attempts(attempt, title, key, build_figure):
+    processed_data = process_data(attempt)
+    assert build_figure(processed_data) is not None
+    assert DRAWINGS[key](processed_data) is not None
@@ -0,0 +1,30 @@
+from cohort_index import CohortIndex, attempt_key
+
+def processed(accuracy):
+    correct = accuracy // 10
+    return {
+        'chapter_metrics': {('Physics', 'Optics'): {'attempted': 10, 'correct': correct, 'accuracy': accuracy, 'avg_time': 30}},
+        'concept_metrics': {}
+    }
+
+def test_attempt_key_uses_the_attempt_id():
+    attempt = {'_id': {'$oid': '64f0c0ffee'}, 'totalMarkScored': 40}
+    assert attempt_key(attempt) == '64f0c0ffee'
+    assert attempt_key([attempt]) == '64f0c0ffee'
+
+def test_attempt_key_hashes_attempts_without_an_id():
+    attempt = {'totalMarkScored': 40, 'sections': [{'questions': []}]}
+    assert attempt_key(attempt) == attempt_key({'sections': [{'questions': []}], 'totalMarkScored': 40})
+    assert attempt_key(attempt) != attempt_key({'totalMarkScored': 41, 'sections': [{'questions': []}]})
+
+def test_adding_the_same_attempt_again_replaces_it(tmp_path):
+    cohort = CohortIndex(str(tmp_path / 'cohort.db'))
+    attempt = {'_id': {'$oid': 'a1'}}
+    cohort.add(attempt_key(attempt), processed(50))
+    cohort.add(attempt_key(attempt), processed(80))
+    cohort.add(attempt_key({'_id': {'$oid': 'b2'}}), processed(60))
+
+    assert cohort.student_count() == 2
+    [group] = cohort.rankings('chapter', limit=1)
+    assert group['students'] == 2
+    assert group['correct'] == 14
@@ -0,0 +1,32 @@
+import pytest
+from benchmarks.synthetic import make_attempt
+from data_processing import process_data
+
+EDGE_ATTEMPTS = {
+    'empty attempt': {},
+    'nothing attempted': {
+        'sections': [{'sectionId': {'title': 'Physics Single Correct'}, 'questions': [
+            {'questionId': {'level': 'easy', 'chapters': [{'title': 'Optics'}]}, 'timeTaken': 5}
+        ]}]
+    },
+}
+
+def assert_same(columnar, loop):
+    assert columnar == loop
+    # Charts and prompts list groups in this order
+    for key in ('chapter_metrics', 'difficulty_metrics', 'concept_metrics'):
+        assert list(columnar[key]) == list(loop[key])
+
+@pytest.mark.parametrize('seed', range(5))
+def test_columnar_path_matches_the_loop(seed):
+    attempt = make_attempt(questions_per_subject=40, concepts_per_question=3, seed=seed)
+    assert_same(process_data(attempt, columnar=True), process_data(attempt, columnar=False))
+
+@pytest.mark.parametrize('attempt', EDGE_ATTEMPTS.values(), ids=EDGE_ATTEMPTS.keys())
+def test_columnar_path_matches_the_loop_on_edge_attempts(attempt):
+    assert_same(process_data(attempt, columnar=True), process_data(attempt, columnar=False))
+
+def test_columnar_processing_env_flag(monkeypatch):
+    attempt = make_attempt(seed=1)
+    monkeypatch.setenv('COLUMNAR_PROCESSING', '1')
+    assert_same(process_data(attempt), process_data(attempt, columnar=False))
@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+import llm_feedback
+from benchmarks.stubs import StubModel, STUB_FEEDBACK, _BATCH_STUDENT
+from benchmarks.synthetic import make_attempt
+from data_processing import process_data
+from llm_client import AsyncFeedbackClient, FeedbackError
+from llm_feedback import FeedbackBatcher, split_batch_response
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(llm_feedback, 'feedback_cache', None)
+
+class NumberedModel(StubModel):
+    """Answers student n of a batch with 'Feedback n'; respond() can rewrite the batched answer."""
+
+    def __init__(self, respond=None, fail_batches=False):
+        super().__init__()
+        self.respond = respond or (lambda sections: ''.join(f"=== REPORT {n} ===\n{text}\n" for n, text in sections))
+        self.fail_batches = fail_batches
+        self.batch_calls = 0
+
+    def _answer(self, prompt):
+        students = _BATCH_STUDENT.findall(prompt)
+        if not students:
+            return 0, self.text
+        self.batch_calls += 1
+        if self.fail_batches:
+            raise ValueError("batch rejected")
+        return 0, self.respond([(int(n), f"Feedback {n}") for n in students])
+
+def students(count):
+    return [process_data(make_attempt(questions_per_subject=5, seed=seed)) for seed in range(count)]
+
+def run_batch(model, count=3, batch_size=3, max_wait=5):
+    async def run():
+        client = AsyncFeedbackClient(model, concurrency=8, requests_per_minute=60000, max_retries=0, native_async=True)
+        batcher = FeedbackBatcher(client, batch_size=batch_size, max_wait=max_wait)
+        return await asyncio.gather(*(batcher.generate(data) for data in students(count)), return_exceptions=True)
+    return asyncio.run(run())
+
+def test_split_reads_markers_in_order():
+    text = "Here you go.\n=== REPORT 1 ===\nFirst\n\n`=== REPORT 2 ===`\n  Second  \n=== REPORT 3 ===\n"
+    assert split_batch_response(text, 3) == ['First', 'Second', None]
+
+@pytest.mark.parametrize('text', [
+    "=== REPORT 1 ===\nFirst\n=== REPORT 3 ===\nThird",          # missing
+    "=== REPORT 2 ===\nSecond\n=== REPORT 1 ===\nFirst",          # out of order
+    "=== REPORT 1 ===\nFirst\n=== REPORT 1 ===\nAgain",           # repeated
+    "=== REPORT 1 ===\nFirst\n=== REPORT 2 ===\nSecond\n=== REPORT 3 ===\nExtra",
+    "No markers at all",
+])
+def test_split_rejects_unexpected_markers(text):
+    assert split_batch_response(text, 2) is None
+
+def test_marker_must_be_on_its_own_line():
+    assert split_batch_response("See === REPORT 1 === below", 1) is None
+
+def test_batch_is_split_back_per_student():
+    model = NumberedModel()
+    assert run_batch(model) == ['Feedback 1', 'Feedback 2', 'Feedback 3']
+    assert model.calls == 1
+
+def test_out_of_order_batch_falls_back_to_single_calls():
+    model = NumberedModel(respond=lambda sections: ''.join(
+        f"=== REPORT {n} ===\n{text}\n" for n, text in reversed(sections)
+    ))
+    assert run_batch(model) == [STUB_FEEDBACK] * 3
+    assert model.calls == 4
+
+def test_only_unanswered_students_are_retried_alone():
+    model = NumberedModel(respond=lambda sections: ''.join(
+        f"=== REPORT {n} ===\n{'' if n == 2 else text}\n" for n, text in sections
+    ))
+    assert run_batch(model) == ['Feedback 1', STUB_FEEDBACK, 'Feedback 3']
+    assert model.calls == 2
+
+def test_failed_batch_call_falls_back_to_single_calls():
+    model = NumberedModel(fail_batches=True)
+    assert run_batch(model) == [STUB_FEEDBACK] * 3
+    assert model.batch_calls == 1
+    assert model.calls == 4
+
+def test_partial_batch_is_sent_after_max_wait():
+    model = NumberedModel()
+    assert run_batch(model, count=2, batch_size=4, max_wait=0.01) == ['Feedback 1', 'Feedback 2']
+    assert model.calls == 1
+
+def test_a_failing_single_call_only_fails_its_student():
+    class Model(NumberedModel):
+        def _answer(self, prompt):
+            if not _BATCH_STUDENT.findall(prompt) and self.calls == 3:
+                raise ValueError("blocked")
+            return super()._answer(prompt)
+
+    results = run_batch(Model(fail_batches=True))
+    assert sum(isinstance(result, FeedbackError) for result in results) == 1
+    assert results.count(STUB_FEEDBACK) == 2
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+import pytest
+import job_queue
+from job_queue import JobQueue
+
+def double(payload):
+    if payload['n'] < 0:
+        raise ValueError('negative n')
+    return {'doubled': payload['n'] * 2}
+
+def wait_for(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in (job_queue.DONE, job_queue.FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+def insert_job(db_path, job_id, status, payload, worker_pid=None):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute(
+            "INSERT INTO jobs (id, status, payload, worker_pid, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, status, json.dumps(payload), worker_pid, time.time(), time.time())
+        )
+    conn.close()
+
+@pytest.mark.parametrize('mode', ['thread', 'process'])
+def test_submitted_jobs_finish_or_fail(tmp_path, mode):
+    queue = JobQueue(double, str(tmp_path / 'jobs.db'), workers=2, mode=mode)
+    try:
+        ok = queue.submit({'n': 21})
+        bad = queue.submit({'n': -1})
+        assert wait_for(queue, ok) == {'id': ok, 'status': 'done', 'result': {'doubled': 42}, 'error': None}
+        assert wait_for(queue, bad) == {'id': bad, 'status': 'failed', 'result': None, 'error': 'negative n'}
+    finally:
+        queue.shutdown()
+
+def test_async_mode_runs_coroutine_handlers(tmp_path):
+    async def handler(payload):
+        await asyncio.sleep(0)
+        return double(payload)
+
+    async def main():
+        queue = JobQueue(handler, str(tmp_path / 'jobs.db'), workers=2, mode='async')
+        queue.start()
+        job_ids = [queue.submit({'n': n}) for n in (1, 2, -3)]
+        try:
+            deadline = time.time() + 10
+            while any(queue.get(j)['status'] in ('queued', 'running') for j in job_ids) and time.time() < deadline:
+                await asyncio.sleep(0.01)
+            return [queue.get(j) for j in job_ids]
+        finally:
+            queue.shutdown()
+
+    first, second, third = asyncio.run(main())
+    assert first['result'] == {'doubled': 2}
+    assert second['result'] == {'doubled': 4}
+    assert (third['status'], third['error']) == ('failed', 'negative n')
+
+def test_unknown_job_and_invalid_mode(tmp_path):
+    queue = JobQueue(double, str(tmp_path / 'jobs.db'))
+    assert queue.get('missing') is None
+    with pytest.raises(ValueError):
+        JobQueue(double, str(tmp_path / 'jobs.db'), mode='greenlet')
+
+def test_a_job_is_only_claimed_once(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    JobQueue(double, db_path)
+    insert_job(db_path, 'j1', job_queue.QUEUED, {'n': 1})
+
+    assert job_queue._claim_job(db_path, 'j1') == {'n': 1}
+    assert job_queue._claim_job(db_path, 'j1') is None
+
+    # A claimed job is left alone, so the handler never runs twice
+    job_queue._execute_job(db_path, double, 'j1')
+    assert JobQueue(double, db_path).get('j1')['status'] == 'running'
+
+def test_start_requeues_jobs_whose_worker_died(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    JobQueue(double, db_path)
+    insert_job(db_path, 'orphan', job_queue.RUNNING, {'n': 5}, worker_pid=dead_pid())
+    insert_job(db_path, 'live', job_queue.RUNNING, {'n': 6}, worker_pid=os.getpid())
+    insert_job(db_path, 'waiting', job_queue.QUEUED, {'n': 7})
+
+    queue = JobQueue(double, db_path)
+    queue.start()
+    try:
+        assert wait_for(queue, 'orphan')['result'] == {'doubled': 10}
+        assert wait_for(queue, 'waiting')['result'] == {'doubled': 14}
+        # A job whose worker is still alive keeps running there
+        assert queue.get('live')['status'] == 'running'
+    finally:
+        queue.shutdown()
@@ -0,0 +1,24 @@
+import io
+import json
+import pytest
+from json_stream import iter_json_items
+
+NUMBERS = '[-1.5e10, 1.5, 0, -0.25, 12345678901234567890, 6.02E+23, 1e-7, true, null, {"a": -3.5e-2, "b": [10, 2.5]}]'
+
+def decode(text, chunk_size):
+    return list(iter_json_items(io.StringIO(text), chunk_size=chunk_size))
+
+@pytest.mark.parametrize('text', [NUMBERS, '1.5', '-1.5e10', '[-1.5e10]', '[1.5,-2.25e3]'])
+def test_every_chunk_size_decodes_numbers(text):
+    expected = json.loads(text)
+    expected = expected if isinstance(expected, list) else [expected]
+    for chunk_size in range(1, len(text) + 2):
+        assert decode(text, chunk_size) == expected, chunk_size
+
+def test_array_yields_each_item():
+    assert decode('[{"a": 1}, {"b": 2}]', 3) == [{'a': 1}, {'b': 2}]
+
+@pytest.mark.parametrize('text', ['', '[1, 2', '[1 2]', '{"a": 1} x'])
+def test_malformed_documents_raise(text):
+    with pytest.raises(ValueError):
+        decode(text, 4)
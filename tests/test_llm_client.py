@@ -0,0 +1,126 @@
+import asyncio
+import types
+import pytest
+import llm_client
+from llm_client import AsyncFeedbackClient, FeedbackError, TokenBucket, is_retryable
+
+class FakeClock:
+    """Stands in for time.monotonic and asyncio.sleep: sleeping just moves the clock."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+        self._sleep = asyncio.sleep
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+        await self._sleep(0)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Only llm_client's view of time; the event loop keeps the real clock for wait_for
+    monkeypatch.setattr(llm_client, 'time', types.SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(llm_client.asyncio, 'sleep', clock.sleep)
+    # Take the top of the jitter range, so backoff delays are exact
+    monkeypatch.setattr(llm_client.random, 'uniform', lambda low, high: high)
+    return clock
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+class FlakyModel:
+    """Raises the queued errors in turn, then answers every prompt."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return Response(f"feedback for {prompt}")
+
+class HangingModel:
+    calls = 0
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.Event().wait()
+
+def client(model, **options):
+    options = {'concurrency': 1, 'requests_per_minute': 6000, 'max_retries': 3, 'timeout': 5, 'backoff': 1.0,
+               'native_async': True, **options}
+    return AsyncFeedbackClient(model, **options)
+
+def test_token_bucket_paces_calls_after_the_burst(clock):
+    async def run():
+        bucket = TokenBucket(rate=2, capacity=2)
+        times = []
+        for _ in range(5):
+            await bucket.acquire()
+            times.append(clock.now)
+        return times
+
+    assert asyncio.run(run()) == [0, 0, 0.5, 1.0, 1.5]
+
+def test_token_bucket_refills_up_to_capacity(clock):
+    async def run():
+        bucket = TokenBucket(rate=1, capacity=2)
+        await bucket.acquire()
+        await bucket.acquire()
+        clock.now += 100
+        for _ in range(3):
+            await bucket.acquire()
+        return clock.now
+
+    # Only two tokens accumulate however long the bucket sat idle
+    assert asyncio.run(run()) == 101
+
+def test_is_retryable():
+    from google.api_core import exceptions
+
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(ConnectionResetError())
+    assert is_retryable(exceptions.TooManyRequests('quota'))
+    assert is_retryable(exceptions.ServiceUnavailable('down'))
+    assert not is_retryable(exceptions.InvalidArgument('bad prompt'))
+    assert not is_retryable(ValueError('blocked'))
+
+def test_retries_transient_errors_with_exponential_backoff(clock):
+    model = FlakyModel(ConnectionError('reset'), ConnectionError('reset'))
+    assert asyncio.run(client(model).generate('p')) == 'feedback for p'
+    assert model.calls == 3
+    assert [delay for delay in clock.sleeps if delay >= 1] == [1.0, 2.0]
+
+def test_raises_after_the_final_attempt(clock):
+    model = FlakyModel(*[ConnectionError('reset')] * 10)
+    with pytest.raises(FeedbackError) as raised:
+        asyncio.run(client(model, max_retries=2).generate('p'))
+    assert model.calls == 3
+    assert isinstance(raised.value.__cause__, ConnectionError)
+    assert [delay for delay in clock.sleeps if delay >= 1] == [1.0, 2.0]
+
+def test_permanent_errors_are_not_retried(clock):
+    model = FlakyModel(ValueError('blocked'))
+    with pytest.raises(FeedbackError, match='blocked'):
+        asyncio.run(client(model).generate('p'))
+    assert model.calls == 1
+
+def test_timeouts_are_retried(clock):
+    model = HangingModel()
+    with pytest.raises(FeedbackError):
+        asyncio.run(client(model, timeout=0.01, max_retries=1).generate('p'))
+    assert model.calls == 2
+
+def test_generate_many_keeps_order_and_returns_errors(clock):
+    model = FlakyModel(ValueError('blocked'))
+    results = asyncio.run(client(model, concurrency=2).generate_many(['a', 'b', 'c']))
+    assert isinstance(results[0], FeedbackError)
+    assert results[1:] == ['feedback for b', 'feedback for c']
@@ -0,0 +1,43 @@
+import io
+import pytest
+from pdf_generator import _inline, generate_pdf
+
+@pytest.mark.parametrize('text, markup', [
+    ('***Great job!***', '<b><i>Great job!</i></b>'),
+    ('___Great job!___', '<b><i>Great job!</i></b>'),
+    ('**bold *and italic* text**', '<b>bold <i>and italic</i> text</b>'),
+    ('*italic **and bold** text*', '<i>italic <b>and bold</b> text</i>'),
+    ('**bold** and *italic*', '<b>bold</b> and <i>italic</i>'),
+    ('__very important__', '<b>very important</b>'),
+    ('_stress_ this', '<i>stress</i> this'),
+])
+def test_nested_emphasis(text, markup):
+    assert _inline(text) == markup
+
+@pytest.mark.parametrize('text', [
+    'the __init__ method',
+    'check __main__ first',
+    'rename snake_case_name',
+    'x_1 and y_2',
+])
+def test_underscores_in_identifiers_are_literal(text):
+    assert _inline(text) == text
+
+def test_code_spans_keep_emphasis_markers():
+    assert _inline('call `__init__` or `a*b*c`') == (
+        'call <font face="Courier">__init__</font> or <font face="Courier">a*b*c</font>'
+    )
+
+def test_text_is_escaped():
+    assert _inline('x < y & **z**') == 'x &lt; y &amp; <b>z</b>'
+
+@pytest.mark.parametrize('feedback', [
+    '***Great job!***',
+    '## ***Well done***\n\n- ***Keep*** it up\n',
+    # Unbalanced markers still produce a report, as plain text
+    '***a** b*',
+])
+def test_generate_pdf_accepts_gemini_emphasis(feedback):
+    output = io.BytesIO()
+    generate_pdf(feedback, {}, output)
+    assert output.getvalue().startswith(b'%PDF-')
@@ -0,0 +1,103 @@
+import bisect
+import random
+import pytest
+from quantile_sketch import KLLSketch, SketchStore
+
+K = 200
+# Documented error is about 1.7/k of n; leave headroom for the randomized compaction
+MAX_RANK_ERROR = 3 / K
+
+@pytest.fixture(autouse=True)
+def seeded():
+    random.seed(1234)
+
+def true_rank(sorted_values, value):
+    below = bisect.bisect_left(sorted_values, value)
+    equal = bisect.bisect_right(sorted_values, value) - below
+    return (below + 0.5 * equal) / len(sorted_values)
+
+def assert_ranks_close(sketch, values):
+    ordered = sorted(values)
+    for q in [i / 20 for i in range(1, 20)]:
+        value = ordered[int(q * len(ordered))]
+        assert abs(sketch.rank(value) - true_rank(ordered, value)) <= MAX_RANK_ERROR, q
+
+def sketch_of(values, k=K):
+    sketch = KLLSketch(k)
+    for value in values:
+        sketch.update(value)
+    return sketch
+
+def test_rank_error_stays_within_bound():
+    values = [random.uniform(0, 100) for _ in range(50000)]
+    sketch = sketch_of(values)
+    assert sketch.n == len(values)
+    assert_ranks_close(sketch, values)
+    # Memory stays around O(k log(n/k)), far below n
+    assert sum(len(items) for items in sketch.compactors) < 10 * K
+
+@pytest.mark.parametrize('order', ['ascending', 'descending'])
+def test_sorted_input(order):
+    values = [float(i) for i in range(30000)]
+    if order == 'descending':
+        values.reverse()
+    sketch = sketch_of(values)
+    assert_ranks_close(sketch, values)
+    assert abs(sketch.quantile(0.5) - 15000) <= MAX_RANK_ERROR * len(values)
+
+def test_ties_count_as_half():
+    assert sketch_of([50.0] * 10000).rank(50.0) == 0.5
+    # Accuracies cluster on a few values: 0, 10, ..., 100
+    values = [10.0 * random.randrange(11) for _ in range(20000)]
+    sketch = sketch_of(values)
+    assert_ranks_close(sketch, values)
+    assert sketch.rank(-1) == 0
+    assert sketch.rank(101) == 1
+
+def test_merge_matches_a_single_sketch():
+    left = [random.gauss(60, 15) for _ in range(20000)]
+    right = [random.gauss(40, 10) for _ in range(5000)]
+    merged = sketch_of(left)
+    merged.merge(sketch_of(right))
+    assert merged.n == len(left) + len(right)
+    assert_ranks_close(merged, left + right)
+
+    empty = KLLSketch(K)
+    empty.merge(sketch_of(right))
+    assert_ranks_close(empty, right)
+
+def test_empty_sketch_and_round_trip():
+    assert KLLSketch(K).rank(1) is None
+    assert KLLSketch(K).quantile(0.5) is None
+    sketch = sketch_of([random.random() for _ in range(5000)])
+    restored = KLLSketch.from_dict(sketch.to_dict())
+    assert restored.n == sketch.n
+    assert restored.rank(0.5) == sketch.rank(0.5)
+    restored.update(0.5)
+    assert restored.n == sketch.n + 1
+
+def processed(accuracy):
+    return {
+        'overall': {'accuracy': accuracy},
+        'subjects': {'Physics': {'accuracy': accuracy}},
+        'chapter_metrics': {},
+        'difficulty_metrics': {}
+    }
+
+def test_store_ranks_before_adding_and_skips_seen_students(tmp_path):
+    store = SketchStore(str(tmp_path / 'sketches.db'), min_students=2)
+    assert store.observe(processed(40), 'a')['overall'] is None
+    store.observe(processed(60), 'b')
+    assert store.observe(processed(50), 'c')['overall'] == {'percentile': 50.0, 'students': 2}
+    # Seen before: ranked against the cohort but not added again
+    assert store.observe(processed(50), 'c')['overall']['students'] == 3
+    assert store.percentiles(processed(100))['overall'] == {'percentile': 100.0, 'students': 3}
+
+    other = SketchStore(str(tmp_path / 'other.db'), min_students=2)
+    other.observe(processed(70), 'd')
+    other.observe(processed(50), 'c')
+    store.merge(other)
+    # Sketches cannot subtract, so 'c' from both runs is counted twice; afterwards both ids are known
+    assert store.percentiles(processed(100))['overall']['students'] == 5
+    store.observe(processed(70), 'd')
+    assert store.percentiles(processed(100))['overall']['students'] == 5
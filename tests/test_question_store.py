@@ -0,0 +1,40 @@
+import pickle
+from question_store import QuestionStore, time_outcomes
+
+def make_store():
+    store = QuestionStore()
+    store.append('Physics', 'Optics', 'easy', ['Lenses', 'Mirrors'], True, True, 30)
+    store.append('Physics', 'Optics', 'tough', [], True, False, 90.5)
+    store.append('Chemistry', 'Bonding', 'easy', ['Lenses'], False, False, None)
+    return store
+
+def test_records_read_back_as_dicts():
+    store = make_store()
+    assert len(store) == 3
+    assert store[0] == {'subject': 'Physics', 'chapter': 'Optics', 'difficulty': 'easy',
+                        'concepts': ['Lenses', 'Mirrors'], 'attempted': True, 'correct': True, 'time_taken': 30}
+    assert store[-1]['concepts'] == ['Lenses']
+    assert store[-1]['time_taken'] == 0
+    assert store == list(store)
+
+def test_columns_view_the_arrays_without_copying():
+    store = make_store()
+    columns = store.columns()
+    assert columns['chapter_code'].tolist() == [0, 0, 1]
+    assert columns['attempted'].tolist() == [True, True, False]
+    assert columns['time_taken'].tolist() == [30, 90.5, 0]
+    assert not columns['time_taken'].flags.owndata
+
+def test_to_frame_and_pickling():
+    store = make_store()
+    frame = store.to_frame(concepts=True)
+    assert frame['subject'].tolist() == ['Physics', 'Physics', 'Chemistry']
+    assert frame['concepts'].tolist() == [['Lenses', 'Mirrors'], [], ['Lenses']]
+    assert len(QuestionStore().to_frame()) == 0
+
+    restored = pickle.loads(pickle.dumps(store))
+    assert restored == store
+    restored.append('Physics', 'Optics', 'easy', [], True, True, 10)
+    assert restored[3]['chapter'] == 'Optics'
+    assert len(restored.chapters) == 2
+    assert time_outcomes(store) == [(30, True), (90.5, False), (0, False)]
@@ -0,0 +1,109 @@
+import io
+import sqlite3
+from benchmarks.synthetic import make_attempt
+from report_pipeline import build_report
+
+def sketch_sizes(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(conn.execute("SELECT key, n FROM sketches"))
+    finally:
+        conn.close()
+
+def test_rebuilding_an_attempt_does_not_count_it_twice(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'sketches.db')
+    monkeypatch.setenv('SKETCH_DB_PATH', db_path)
+    monkeypatch.setenv('CHART_BACKEND', 'reportlab')
+    attempt = make_attempt(questions_per_subject=10, seed=3)
+
+    # No artifact store, so processed data is recomputed on every build
+    build_report(attempt, io.BytesIO(), feedback_fn=lambda processed_data: "## Introduction\nWell done.")
+    first = sketch_sizes(db_path)
+    build_report(attempt, io.BytesIO(), feedback_fn=lambda processed_data: "## Introduction\nWell done.")
+    assert sketch_sizes(db_path) == first
+    assert first['["overall", "overall"]'] == 1
+
+    build_report(make_attempt(questions_per_subject=10, seed=4), io.BytesIO(),
+                 feedback_fn=lambda processed_data: "## Introduction\nWell done.")
+    assert sketch_sizes(db_path)['["overall", "overall"]'] == 2
+
+def test_regenerating_after_a_processing_change_keeps_sketches_and_feedback(tmp_path, monkeypatch):
+    import report_pipeline
+    from artifact_store import ArtifactStore
+    from regenerate import regenerate
+
+    db_path = str(tmp_path / 'sketches.db')
+    monkeypatch.setenv('SKETCH_DB_PATH', db_path)
+    monkeypatch.setenv('SKETCH_MIN_STUDENTS', '1')
+    monkeypatch.setenv('CHART_BACKEND', 'reportlab')
+    artifacts = ArtifactStore(str(tmp_path / 'artifacts.db'))
+    for seed in range(3):
+        processed_data, _ = build_report(
+            make_attempt(questions_per_subject=10, seed=seed), str(tmp_path / f'{seed}.pdf'),
+            feedback_fn=lambda processed_data: "## Introduction\nWell done.", artifacts=artifacts, report_id=f'r{seed}'
+        )
+    before = sketch_sizes(db_path)
+
+    monkeypatch.setattr(report_pipeline, 'PROCESSING_VERSION', 'changed')
+    stages = regenerate('r0', artifacts, output_dir=str(tmp_path))
+    assert stages['process_data'] == 'computed'
+    # Same percentiles, so the same prompt and the stored feedback
+    assert stages['feedback'] == 'reused'
+    assert sketch_sizes(db_path) == before
+
+def test_build_without_observing_only_ranks(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'sketches.db')
+    monkeypatch.setenv('SKETCH_DB_PATH', db_path)
+    monkeypatch.setenv('SKETCH_MIN_STUDENTS', '1')
+    monkeypatch.setenv('CHART_BACKEND', 'reportlab')
+    build_report(make_attempt(questions_per_subject=10, seed=1), io.BytesIO(),
+                 feedback_fn=lambda processed_data: "## Introduction\nWell done.")
+    before = sketch_sizes(db_path)
+    processed_data, _ = build_report(make_attempt(questions_per_subject=10, seed=2), io.BytesIO(),
+                                     feedback_fn=lambda processed_data: "## Introduction\nWell done.", observe=False)
+    assert processed_data['percentiles']['overall']['students'] == 1
+    assert sketch_sizes(db_path) == before
+
+def test_reused_pdf_skips_the_charts(tmp_path, monkeypatch):
+    from artifact_store import ArtifactStore
+
+    monkeypatch.setenv('SKETCH_DB_PATH', '')
+    monkeypatch.setenv('CHART_BACKEND', 'reportlab')
+    artifacts = ArtifactStore(str(tmp_path / 'artifacts.db'))
+    attempt = make_attempt(questions_per_subject=10, seed=1)
+    runs = []
+    for _ in range(2):
+        stages = {}
+        output = io.BytesIO()
+        build_report(attempt, output, feedback_fn=lambda processed_data: "## Introduction\nWell done.",
+                     artifacts=artifacts, report_id='r1', stages=stages)
+        runs.append((stages, output.getvalue()))
+
+    assert runs[0][0]['charts'] == 'computed'
+    assert runs[1][0] == {'process_data': 'reused', 'feedback': 'reused', 'pdf': 'reused', 'charts': 'skipped'}
+    assert runs[1][1] == runs[0][1]
+
+def test_web_reports_keep_one_copy_of_their_pdf(tmp_path, monkeypatch):
+    import json
+    import llm_feedback
+    from benchmarks.stubs import StubModel
+    from report_pipeline import run_report_job
+    from report_store import ReportStore
+
+    monkeypatch.setattr(llm_feedback, 'feedback_cache', None)
+    monkeypatch.setattr(llm_feedback, 'get_model', lambda: StubModel())
+    monkeypatch.setenv('CHART_BACKEND', 'reportlab')
+    for name in ('REPORT_DB_PATH', 'ARTIFACT_DB_PATH', 'SKETCH_DB_PATH', 'COHORT_DB_PATH'):
+        monkeypatch.setenv(name, str(tmp_path / f"{name.lower()}.db"))
+    upload = tmp_path / 'attempt.json'
+    upload.write_text(json.dumps(make_attempt(questions_per_subject=5, seed=1)))
+
+    run_report_job({'report_id': 'r1', 'upload_path': str(upload), 'filename': 'attempt.json'})
+
+    reports = ReportStore.from_env()
+    conn = sqlite3.connect(str(tmp_path / 'report_db_path.db'))
+    try:
+        assert conn.execute("SELECT pdf FROM reports WHERE id = 'r1'").fetchone()[0] is None
+    finally:
+        conn.close()
+    assert reports.load_pdf('r1').startswith(b'%PDF')
@@ -0,0 +1,64 @@
+import time
+import report_store
+from artifact_store import ArtifactStore, ATTEMPT, PDF
+from report_store import ReportStore
+
+def make_stores(tmp_path, ttl=None):
+    artifacts = ArtifactStore(str(tmp_path / 'artifacts.db'))
+    return ReportStore(str(tmp_path / 'reports.db'), ttl=ttl, artifacts=artifacts), artifacts
+
+def build(reports, artifacts, report_id, attempt):
+    artifacts.put(ATTEMPT, attempt, {'attempt': attempt})
+    artifacts.put(PDF, attempt + '-pdf', b'%PDF')
+    artifacts.record(report_id, {ATTEMPT: attempt, PDF: attempt + '-pdf'})
+    reports.save(report_id, {}, filename='attempt.json', pdf=b'%PDF')
+
+def test_deleting_a_report_drops_its_artifacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_store, 'ARTIFACT_GRACE_SECONDS', 0)
+    reports, artifacts = make_stores(tmp_path)
+    build(reports, artifacts, 'r1', 'a1')
+    build(reports, artifacts, 'r2', 'a1')
+    build(reports, artifacts, 'r3', 'a3')
+
+    reports.delete('r3')
+    assert artifacts.manifest('r3') is None
+    assert artifacts.get(ATTEMPT, 'a3') is None
+    # Still used by r2
+    reports.delete('r1')
+    assert artifacts.get(ATTEMPT, 'a1') == {'attempt': 'a1'}
+    assert artifacts.report_ids() == ['r2']
+
+def test_expired_reports_drop_their_artifacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_store, 'ARTIFACT_GRACE_SECONDS', 0)
+    reports, artifacts = make_stores(tmp_path, ttl=0.01)
+    build(reports, artifacts, 'r1', 'a1')
+    time.sleep(0.02)
+    assert reports.purge_expired() == 1
+    assert artifacts.report_ids() == []
+    assert artifacts.stats() == {}
+
+def test_recent_artifacts_survive_pruning(tmp_path):
+    reports, artifacts = make_stores(tmp_path)
+    build(reports, artifacts, 'r1', 'a1')
+    # Stored by a report that is still being built
+    artifacts.put(ATTEMPT, 'a2', {'attempt': 'a2'})
+    reports.delete('r1')
+    assert artifacts.report_ids() == []
+    assert artifacts.get(ATTEMPT, 'a2') == {'attempt': 'a2'}
+
+def test_pdf_held_by_the_artifact_store_is_not_stored_twice(tmp_path):
+    reports, artifacts = make_stores(tmp_path)
+    build(reports, artifacts, 'r1', 'a1')
+    conn = reports._connect()
+    try:
+        assert conn.execute("SELECT pdf FROM reports WHERE id = 'r1'").fetchone()['pdf'] is None
+    finally:
+        conn.close()
+    assert reports.load_pdf('r1') == b'%PDF'
+
+def test_pdf_without_an_artifact_is_kept_in_the_report_store(tmp_path):
+    reports, artifacts = make_stores(tmp_path)
+    reports.save('r1', {}, filename='attempt.json', pdf=b'%PDF-1')
+    assert reports.load_pdf('r1') == b'%PDF-1'
+    assert ReportStore(str(tmp_path / 'reports.db')).load_pdf('r1') == b'%PDF-1'
+    assert reports.load_pdf('missing') is None
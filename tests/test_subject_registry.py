@@ -0,0 +1,67 @@
+import random
+import pytest
+from data_processing import process_data
+from subject_registry import DEFAULT_SUBJECTS, SubjectRegistry
+
+def keyword_classifier(title):
+    """The hardcoded classifier the registry replaced."""
+    title_lower = title.lower()
+    if any(keyword in title_lower for keyword in ['physics', 'phys']):
+        return 'Physics'
+    elif any(keyword in title_lower for keyword in ['chemistry', 'chem']):
+        return 'Chemistry'
+    elif any(keyword in title_lower for keyword in ['mathematics', 'math', 'maths']):
+        return 'Mathematics'
+    return 'Unknown'
+
+FRAGMENTS = ['Physics', 'PHYS', 'chem', 'Chemistry', 'math', 'Maths', 'Mathematics', 'Section',
+             'Single Correct', 'Numerical', 'ph', 'ch', 'ma', 'ys', 'em', 'th', 'A', ' ', '-', '2']
+
+def test_default_registry_matches_the_keyword_classifier():
+    registry = SubjectRegistry(DEFAULT_SUBJECTS)
+    rng = random.Random(7)
+    titles = [''.join(rng.choices(FRAGMENTS, k=rng.randint(0, 6))) for _ in range(5000)]
+    titles += ['Physics Single Correct', 'Chemistry Numerical', 'Mathematics', 'General Aptitude', '']
+    for title in titles:
+        assert registry.classify(title) == keyword_classifier(title), title
+
+@pytest.mark.parametrize('title,subject', [
+    ('Chemistry and Physics', 'Physics'),
+    ('Mathematical Chemistry', 'Chemistry'),
+    ('Math-Phys', 'Physics'),
+    ('Biophysics', 'Physics'),
+    ('Biochemistry', 'Chemistry'),
+])
+def test_earlier_subjects_win_overlapping_titles(title, subject):
+    assert SubjectRegistry(DEFAULT_SUBJECTS).classify(title) == subject
+
+def test_priority_follows_registry_order_not_keyword_position():
+    subjects = [
+        {'name': 'Biology', 'keywords': ['biology']},
+        {'name': 'Zoology', 'keywords': ['zoo', 'logy']},
+    ]
+    registry = SubjectRegistry(subjects)
+    # 'logy' completes before 'biology', and a keyword ending inside another keyword still counts
+    assert registry.classify('Zoology and Biology') == 'Biology'
+    assert registry.classify('Ecology') == 'Zoology'
+    assert SubjectRegistry(subjects[::-1]).classify('Biology') == 'Zoology'
+
+def test_total_marks_lookup_order():
+    registry = SubjectRegistry(
+        [{'name': 'Physics', 'total_marks': 120}, {'name': 'Chemistry'}],
+        tests={'t1': {'subjects': {'Physics': 80}}}
+    )
+    assert registry.total_marks('Physics', 't1') == 80
+    assert registry.total_marks('Physics', 't2') == 120
+    assert registry.total_marks('Chemistry', 't1') == 100
+
+def test_subjects_without_a_configured_total_default_to_100():
+    attempt = {
+        'test': {'totalMarks': 300},
+        'subjects': [
+            {'subjectId': {'$oid': '607018ee404ae53194e73d92'}},
+            {'subjectId': {'$oid': '607018ee404ae53194e73d90'}},
+        ]
+    }
+    processed = process_data(attempt, registry=SubjectRegistry(DEFAULT_SUBJECTS))
+    assert {name: s['total_marks'] for name, s in processed['subjects'].items()} == {'Physics': 100, 'Chemistry': 100}
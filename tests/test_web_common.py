@@ -0,0 +1,26 @@
+import os
+import jinja2
+import pytest
+from web_common import ordinal, standing_summary
+
+TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+@pytest.mark.parametrize('value,text', [
+    (0, '0th'), (1, '1st'), (2, '2nd'), (3, '3rd'), (4, '4th'), (11, '11th'), (12, '12th'), (13, '13th'),
+    (21, '21st'), (22.4, '22nd'), (42.6, '43rd'), (99.5, '100th'), (101, '101st'), (111, '111th'),
+])
+def test_ordinal(value, text):
+    assert ordinal(value) == text
+
+def test_standing_summary():
+    percentiles = {'overall': {'percentile': 85.2, 'students': 40}, 'subjects': {'Physics': {'percentile': 0.2, 'students': 40}}}
+    assert standing_summary(percentiles) == [('Overall', 'Top 15%'), ('Physics', 'Bottom 1%')]
+    assert standing_summary(None) == []
+
+def test_preview_template_uses_the_ordinal_filter():
+    # Both apps register ordinal; an unknown filter fails at compile time
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATES))
+    env.filters['ordinal'] = ordinal
+    env.get_template('preview.html')
+    with pytest.raises(jinja2.TemplateAssertionError):
+        jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATES)).get_template('preview.html')
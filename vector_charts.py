@@ -0,0 +1,299 @@
+import time
+from chart_generator import colors, get_performance_color
+from question_store import time_outcomes
+import metrics
+
+# Timings are written when METRICS_LOG=1
+logger = metrics.logger.getChild('charts')
+
+# Charts fill the same 6x4 inch box the PNG charts are scaled to
+WIDTH = 432
+HEIGHT = 288
+
+# Plotly's qualitative Pastel palette, used for categorical series
+PASTEL = ['#66C5CC', '#F6CF71', '#F89C74', '#DCB0F2', '#87C55F', '#9EB9F3', '#FE88B1', '#C9DB74', '#8BE0A4', '#B497E7']
+# Plotly's default discrete sequence, for per-subject series
+SERIES = ['#636EFA', '#EF553B', '#00CC96', '#AB63FA', '#FFA15A', '#19D3F3', '#FF6692', '#B6E880']
+
+def _color(hex_value):
+    from reportlab.lib.colors import HexColor
+    return HexColor(hex_value)
+
+def _legend(drawing, items, x, y):
+    """Legend whose swatches start at x, with the first entry at height y."""
+    from reportlab.graphics.charts.legends import Legend
+    legend = Legend()
+    legend.x = x
+    legend.y = y
+    legend.alignment = 'right'
+    legend.fontName = 'Helvetica'
+    legend.fontSize = 8
+    legend.dxTextSpace = 4
+    legend.columnMaximum = 12
+    legend.colorNamePairs = [(_color(color), str(name)) for color, name in items]
+    drawing.add(legend)
+
+def _axis_label(drawing, text, x, y, angle=0):
+    from reportlab.graphics.shapes import String, Group
+    label = String(0, 0, text, fontName='Helvetica', fontSize=9, textAnchor='middle')
+    group = Group(label)
+    group.translate(x, y)
+    group.rotate(angle)
+    drawing.add(group)
+
+def _bar_chart(labels, values, bar_colors, y_label, x_label=None, legend=None):
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+
+    drawing = Drawing(WIDTH, HEIGHT)
+    chart = VerticalBarChart()
+    chart.x, chart.y = 50, 60
+    chart.width = WIDTH - (150 if legend else 70)
+    chart.height = HEIGHT - 80
+    chart.data = [values or [0]]
+    chart.categoryAxis.categoryNames = [str(label) for label in labels] or ['']
+    chart.categoryAxis.labels.fontSize = 8
+    chart.categoryAxis.labels.boxAnchor = 'ne'
+    chart.categoryAxis.labels.angle = 30 if len(labels) > 4 else 0
+    chart.categoryAxis.labels.dy = -2
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 8
+    chart.valueAxis.visibleGrid = True
+    chart.valueAxis.gridStrokeColor = _color('#e5e5e5')
+    chart.barWidth = 10
+    chart.groupSpacing = 8
+    for i, color in enumerate(bar_colors):
+        chart.bars[(0, i)].fillColor = _color(color)
+    chart.bars.strokeColor = None
+    drawing.add(chart)
+    _axis_label(drawing, y_label, 18, chart.y + chart.height / 2, angle=90)
+    if x_label:
+        _axis_label(drawing, x_label, chart.x + chart.width / 2, 8)
+    if legend:
+        _legend(drawing, legend, chart.x + chart.width + 15, HEIGHT - 20)
+    return drawing
+
+def _pie_chart(labels, values, slice_colors):
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.graphics.charts.piecharts import Pie
+
+    drawing = Drawing(WIDTH, HEIGHT)
+    total = sum(values)
+    # Pie cannot draw an all-zero series; show an empty ring instead
+    pie = Pie()
+    pie.x, pie.y = 60, 24
+    pie.width = pie.height = HEIGHT - 48
+    pie.data = values if total else [1]
+    pie.labels = [f"{value / total * 100:.1f}%" if total and value else '' for value in values] if total else ['']
+    pie.simpleLabels = 1
+    pie.sideLabels = 0
+    pie.slices.strokeColor = _color('#ffffff')
+    pie.slices.strokeWidth = 1
+    pie.slices.fontSize = 8
+    pie.slices.labelRadius = 0.7
+    for i, color in enumerate(slice_colors if total else ['#e5e5e5']):
+        pie.slices[i].fillColor = _color(color)
+    drawing.add(pie)
+    _legend(drawing, list(zip(slice_colors, labels)), pie.x + pie.width + 40, HEIGHT - 40)
+    return drawing
+
+def _axis_range(values):
+    """Values for an axis to fit, widened around a single repeated value so the range is never empty."""
+    low, high = min(values), max(values)
+    return [low - 1, high + 1] if low == high else [low, high]
+
+def _scatter_chart(series, x_label, y_label, y_categories=None, sizes=None, legend=None):
+    """
+    Scatter plot of series [(color, [(x, y), ...]), ...] with value axes.
+
+    y_categories turns the y axis into named rows (y values are row indexes);
+    sizes maps each point to a marker radius like Plotly's size= option.
+    """
+    from reportlab.graphics.shapes import Drawing, Circle, String, Line
+    from reportlab.graphics.charts.axes import XValueAxis, YValueAxis
+
+    drawing = Drawing(WIDTH, HEIGHT)
+    left = 150 if y_categories else 55
+    right = WIDTH - (100 if legend else 20)
+    bottom, top = 45, HEIGHT - 15
+    xs = [x for _, points in series for x, _ in points] or [0, 1]
+    ys = [y for _, points in series for _, y in points] or [0, 1]
+
+    x_axis = XValueAxis()
+    x_axis.setPosition(left, bottom, right - left)
+    x_axis.labels.fontSize = 8
+    x_axis.configure([_axis_range(xs)])
+    drawing.add(x_axis)
+
+    if y_categories:
+        rows = len(y_categories)
+        step = (top - bottom) / max(rows, 1)
+        scale_y = lambda value: bottom + step * (value + 0.5)  # noqa: E731
+        for i, name in enumerate(y_categories):
+            drawing.add(String(left - 4, scale_y(i) - 3, str(name)[:32], fontName='Helvetica',
+                               fontSize=7 if rows > 15 else 8, textAnchor='end'))
+            drawing.add(Line(left, scale_y(i), right, scale_y(i), strokeColor=_color('#eeeeee'), strokeWidth=0.5))
+        drawing.add(Line(left, bottom, left, top, strokeWidth=1))
+    else:
+        y_axis = YValueAxis()
+        y_axis.setPosition(left, bottom, top - bottom)
+        y_axis.labels.fontSize = 8
+        y_axis.configure([_axis_range(ys)])
+        drawing.add(y_axis)
+        scale_y = y_axis.scale
+
+    for s, (color, points) in enumerate(series):
+        for p, (x, y) in enumerate(points):
+            radius = sizes[s][p] if sizes else 3
+            drawing.add(Circle(x_axis.scale(x), scale_y(y), radius, fillColor=_color(color),
+                               strokeColor=_color('#ffffff'), strokeWidth=0.5, fillOpacity=0.8))
+
+    _axis_label(drawing, x_label, (left + right) / 2, 10)
+    _axis_label(drawing, y_label, 12, (bottom + top) / 2, angle=90)
+    if legend:
+        _legend(drawing, legend, right + 15, top - 5)
+    return drawing
+
+def _marker_sizes(values, smallest=3, largest=12):
+    peak = max(values, default=0) or 1
+    return [smallest + (largest - smallest) * max(value, 0) / peak for value in values]
+
+# --- Chart 1: Subject-wise Accuracy Bar Chart ---
+def subject_accuracy_drawing(processed_data):
+    subjects = list(processed_data['subjects'].keys())
+    accuracies = [processed_data['subjects'][sub]['accuracy'] for sub in subjects]
+    return _bar_chart(subjects, accuracies, [get_performance_color(a) for a in accuracies], 'Accuracy (%)', 'Subject')
+
+# --- Chart 2: Difficulty-wise Attempt Distribution Pie Chart ---
+def difficulty_distribution_drawing(processed_data):
+    difficulties = list(processed_data['difficulty_metrics'].keys())
+    attempted_counts = [processed_data['difficulty_metrics'][d]['attempted'] for d in difficulties]
+    return _pie_chart(difficulties, attempted_counts, PASTEL)
+
+# --- Chart 3: Overall Attempt Status Pie Chart ---
+def attempt_status_drawing(processed_data):
+    overall = processed_data['overall']
+    correct = overall['correct']
+    incorrect = overall['attempted'] - correct
+    unattempted = overall['total_questions'] - overall['attempted']
+    return _pie_chart(
+        ['Correct', 'Incorrect', 'Unattempted'],
+        [max(correct, 0), max(incorrect, 0), max(unattempted, 0)],
+        [colors['correct'], colors['incorrect'], colors['unattempted']]
+    )
+
+# --- Chart 4: Subject-wise Marks Scored Bar Chart ---
+def subject_marks_drawing(processed_data):
+    subjects = list(processed_data['subjects'].keys())
+    marks = [processed_data['subjects'][sub]['marks_scored'] for sub in subjects]
+    shares = [
+        m / processed_data['subjects'][sub]['total_marks'] * 100 if processed_data['subjects'][sub]['total_marks'] else 0
+        for sub, m in zip(subjects, marks)
+    ]
+    return _bar_chart(subjects, marks, [get_performance_color(s) for s in shares], 'Marks Scored', 'Subject')
+
+# --- Chart 5: Time Distribution Across Subjects (Pie Chart) ---
+def time_distribution_drawing(processed_data):
+    subjects = list(processed_data['subjects'].keys())
+    time_taken = [processed_data['subjects'][sub]['time_taken'] / 60 for sub in subjects]  # Convert to minutes
+    return _pie_chart(subjects, time_taken, PASTEL)
+
+# --- Chart 6: Difficulty-wise Accuracy Bar Chart ---
+def difficulty_accuracy_drawing(processed_data):
+    difficulties = list(processed_data['difficulty_metrics'].keys())
+    accuracies = [processed_data['difficulty_metrics'][d]['accuracy'] for d in difficulties]
+    return _bar_chart(difficulties, accuracies, [get_performance_color(a) for a in accuracies], 'Accuracy', 'Difficulty')
+
+# --- Chart 7: Chapter-wise Accuracy Bar Chart, coloured by subject ---
+def chapter_accuracy_drawing(processed_data):
+    chapter_metrics = processed_data['chapter_metrics']
+    subjects = list(dict.fromkeys(sub for sub, _ in chapter_metrics))
+    subject_colors = {sub: SERIES[i % len(SERIES)] for i, sub in enumerate(subjects)}
+    return _bar_chart(
+        [chap for _, chap in chapter_metrics],
+        [m['accuracy'] for m in chapter_metrics.values()],
+        [subject_colors[sub] for sub, _ in chapter_metrics],
+        'Accuracy',
+        legend=[(subject_colors[sub], sub) for sub in subjects]
+    )
+
+# --- Chart 8: Concept-wise Accuracy Scatter Plot (Vertical) ---
+def concept_accuracy_drawing(processed_data):
+    concept_metrics = processed_data['concept_metrics']
+    concepts = list(dict.fromkeys(concept for _, concept in concept_metrics))
+    rows = {concept: i for i, concept in enumerate(concepts)}
+    subjects = list(dict.fromkeys(sub for sub, _ in concept_metrics))
+    sizes_by_key = dict(zip(concept_metrics, _marker_sizes([m['attempted'] for m in concept_metrics.values()])))
+    series, sizes = [], []
+    for i, sub in enumerate(subjects):
+        keys = [key for key in concept_metrics if key[0] == sub]
+        series.append((SERIES[i % len(SERIES)], [(concept_metrics[key]['accuracy'], rows[key[1]]) for key in keys]))
+        sizes.append([sizes_by_key[key] for key in keys])
+    return _scatter_chart(
+        series, 'Accuracy (%)', 'Concept', y_categories=concepts, sizes=sizes,
+        legend=[(color, sub) for (color, _), sub in zip(series, subjects)]
+    )
+
+# --- Chart 9: Time vs Performance Scatter Plot (Subject-wise) ---
+def time_vs_performance_drawing(processed_data):
+    subjects = list(processed_data['subjects'].keys())
+    accuracy_sizes = _marker_sizes([processed_data['subjects'][sub]['accuracy'] for sub in subjects], 4, 14)
+    series = [
+        (SERIES[i % len(SERIES)], [(processed_data['subjects'][sub]['time_taken'] / 60, processed_data['subjects'][sub]['marks_scored'])])
+        for i, sub in enumerate(subjects)
+    ]
+    return _scatter_chart(
+        series, 'Time Taken (min)', 'Marks Scored', sizes=[[size] for size in accuracy_sizes],
+        legend=[(color, sub) for (color, _), sub in zip(series, subjects)]
+    )
+
+# --- Chart 10: Time per Question Scatter Plot ---
+def time_per_question_drawing(processed_data):
+    outcomes = time_outcomes(processed_data['questions_data'])
+    correct = [(i, t) for i, (t, ok) in enumerate(outcomes, 1) if ok]
+    incorrect = [(i, t) for i, (t, ok) in enumerate(outcomes, 1) if not ok]
+    return _scatter_chart(
+        [(colors['incorrect'], incorrect), (colors['correct'], correct)],
+        'Question Number', 'Time Taken (sec)',
+        legend=[(colors['correct'], 'Correct'), (colors['incorrect'], 'Not correct')]
+    )
+
+# Same titles and order as chart_generator.CHARTS
+DRAWINGS = {
+    'subject_accuracy': subject_accuracy_drawing,
+    'difficulty_distribution': difficulty_distribution_drawing,
+    'attempt_status_distribution': attempt_status_drawing,
+    'subject_marks': subject_marks_drawing,
+    'time_distribution': time_distribution_drawing,
+    'difficulty_accuracy': difficulty_accuracy_drawing,
+    'chapter_accuracy': chapter_accuracy_drawing,
+    'concept_accuracy': concept_accuracy_drawing,
+    'time_vs_performance': time_vs_performance_drawing,
+    'time_per_question': time_per_question_drawing,
+}
+
+def generate_drawings(processed_data, charts, timings=None):
+    """
+    Build the report charts as native ReportLab drawings.
+
+    Drawings are vector flowables embedded straight into the PDF: no Kaleido
+    process, no PNG encoding, and output that stays sharp when printed.
+
+    Args:
+        processed_data (dict): Processed data containing performance metrics.
+        charts (list): chart_generator.CHARTS entries to draw, in page order.
+        timings (dict, optional): Filled with chart names to build time in seconds.
+
+    Returns:
+        dict: Chart names to reportlab.graphics.shapes.Drawing objects.
+    """
+    drawings = {}
+    chart_timings = {}
+    for name, key, _ in charts:
+        start = time.perf_counter()
+        drawings[name] = DRAWINGS[key](processed_data)
+        chart_timings[name] = time.perf_counter() - start
+    logger.info("Drew %d vector charts in %.3fs", len(drawings), sum(chart_timings.values()))
+    if timings is not None:
+        timings.update(chart_timings)
+    return drawings
@@ -0,0 +1,49 @@
+# Settings and view helpers shared by the Flask (app.py) and ASGI (asgi_app.py) front ends.
+# Kept free of either framework, and of the job queue and stores each front end builds.
+import os
+from cohort_index import CHAPTER, CONCEPT
+
+# Ensure uploads and reports directories exist
+UPLOAD_FOLDER = 'uploads'
+REPORTS_FOLDER = 'reports'
+for folder in [UPLOAD_FOLDER, REPORTS_FOLDER]:
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+COHORT_GROUPS = {'chapters': CHAPTER, 'concepts': CONCEPT}
+
+def ordinal(value):
+    """Round to a whole number with its English suffix: 1st, 2nd, 3rd, 11th, 22nd."""
+    n = round(value)
+    suffix = 'th' if 10 <= n % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
+    return f"{n}{suffix}"
+
+def standing_summary(percentiles):
+    """Phrase the student's overall and subject percentiles, e.g. ('Physics', 'Top 15%')."""
+    if not percentiles:
+        return []
+    positions = [('Overall', percentiles['overall'])] if percentiles['overall'] else []
+    positions += list(percentiles['subjects'].items())
+    summary = []
+    for name, position in positions:
+        percentile = position['percentile']
+        if percentile >= 50:
+            summary.append((name, f"Top {max(1, round(100 - percentile))}%"))
+        else:
+            summary.append((name, f"Bottom {max(1, round(percentile))}%"))
+    return summary
+
+def preview_stats(processed_data):
+    """Headline numbers shown on the preview page."""
+    overall = processed_data['overall']
+    subjects = processed_data['subjects']
+    return {
+        'overall_accuracy': overall['accuracy'],
+        'total_marks': f"{overall['marks_scored']}/{overall['total_marks']}",
+        'questions_attempted': f"{overall['attempted']}/{overall['total_questions']}",
+        'time_efficiency': round((overall['time_taken'] / overall['total_time']) * 100, 1) if overall['total_time'] > 0 else 0,
+        'subjects_count': len(subjects),
+        'strongest_subject': max(subjects.items(), key=lambda x: x[1]['accuracy'])[0] if subjects else 'N/A',
+        'weakest_subject': min(subjects.items(), key=lambda x: x[1]['accuracy'])[0] if subjects else 'N/A',
+        'standing': standing_summary(processed_data.get('percentiles'))
+    }